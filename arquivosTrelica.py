@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Módulo para a leitura e a gravação em massa de modelos e resultados de treliças
+planas, sem os dicionários literais de aTrelica.py:
+    - CSV: uma pasta com as tabelas nos.csv, elementos.csv, cargas.csv e apoios.csv;
+    - NPZ: um único arquivo .npz (sem compressão) com os arrays do ModeloTrelica;
+    - memmap: uma pasta com um arquivo .npy por array, carregados com np.load em
+      mmap_mode, sem cópia: os dados só são lidos do disco quando usados.
+
+Os leitores retornam um ModeloTrelica (modeloTrelica.py), que pode ser resolvido
+diretamente com calcular() ou convertido para as entradas de calculoTrelicaPlana
+com paraDicionarios(). Os resultados (ResultadosTrelica) são gravados nos mesmos
+formatos.
+
+Tabelas CSV (com uma linha de cabeçalho e separadas por vírgula):
+    - nos.csv: no, x, y
+    - elementos.csv: elem, noi, noj, E, A (os materiais e as seções das barras)
+    - cargas.csv: no, fx, fy (somente os nós com carga)
+    - apoios.csv: no, rx, ry (somente os nós com apoio)
+
+* Os rótulos dos nós e dos elementos devem ser inteiros nos arquivos.
+
+@autor: argenta
+"""
+import os
+import numpy as np
+from modeloTrelica import ModeloTrelica, ResultadosTrelica, MapaRotulos
+
+# Arrays gravados e os seus tipos, na ordem dos argumentos de ModeloTrelica
+CAMPOS = (('coords', np.float64), ('conect', np.int32), ('Es', np.float64), ('As', np.float64),
+          ('cargas', np.float64), ('apoios', np.int8), ('rotulosNos', np.int64),
+          ('rotulosElems', np.int64))
+
+CAMPOS_RESULTADOS = ('desloc', 'reacoes', 'deformacoes', 'tensoes', 'normais')
+
+def _rotulosInteiros(rotulos, tipo):
+    rotulos = np.asarray(rotulos)
+    if rotulos.dtype.kind not in 'iu':
+        raise ValueError(f'Os rótulos dos {tipo} devem ser inteiros para a gravação em arquivo!')
+    return rotulos.astype(np.int64, copy=False)
+
+def _arraysModelo(modelo):
+    return {'coords': modelo.coords, 'conect': modelo.conect, 'Es': modelo.Es, 'As': modelo.As,
+            'cargas': modelo.cargas, 'apoios': modelo.apoios,
+            'rotulosNos': _rotulosInteiros(modelo.rotulosNos, 'nós'),
+            'rotulosElems': _rotulosInteiros(modelo.rotulosElems, 'elementos')}
+
+def _arraysResultados(resultados):
+    return {campo: getattr(resultados, campo) for campo in CAMPOS_RESULTADOS}
+
+### CSV -----------------------------------------------------------------------
+
+def _leTabela(caminho, tipos, obrigatoria=False):
+    '''
+    Leitura de uma tabela CSV com cabeçalho e uma coluna por tipo em tipos, em
+    uma única passagem: cada coluna já é lida no seu tipo, e os rótulos inteiros
+    não passam por float64 (acima de 2**53 eles mudariam). Uma tabela opcional
+    ausente, ou uma tabela só com o cabeçalho, é lida como vazia.
+    '''
+    tipo = np.dtype([(f'c{i}', t) for i, t in enumerate(tipos)])
+    if not os.path.exists(caminho):
+        if obrigatoria:
+            raise FileNotFoundError(f'A tabela {caminho} não foi encontrada! Verifique a pasta do modelo.')
+        return [np.zeros(0, dtype=t) for t in tipos]
+    with open(caminho) as arquivo:
+        arquivo.readline()
+        if not arquivo.readline().strip():
+            #somente o cabeçalho (tabela gravada sem linhas): lida como vazia
+            return [np.zeros(0, dtype=t) for t in tipos]
+    try:
+        tabela = np.loadtxt(caminho, delimiter=',', skiprows=1, dtype=tipo, ndmin=1)
+    except ValueError as erro:
+        raise ValueError(f'A tabela {caminho} deve ter {len(tipos)} colunas, com os rótulos inteiros! ' +\
+                         f'Verifique o arquivo ({erro}).') from None
+    return [tabela[nome] for nome in tipo.names]
+
+def _gravaTabela(caminho, cabecalho, colunas, formatos):
+    '''
+    Gravação de uma tabela CSV com cabeçalho, com cada coluna no seu próprio tipo
+    (um array estruturado), sem a conversão dos rótulos inteiros para float64
+    de np.column_stack.
+    '''
+    colunas = [np.asarray(coluna) for coluna in colunas]
+    tabela = np.empty(len(colunas[0]), dtype=[(f'c{i}', coluna.dtype) for i, coluna in enumerate(colunas)])
+    for nome, coluna in zip(tabela.dtype.names, colunas):
+        tabela[nome] = coluna
+    np.savetxt(caminho, tabela, delimiter=',', header=cabecalho, comments='', fmt=formatos)
+
+def salvaCSV(modelo, pasta):
+    '''
+    Gravação do ModeloTrelica nas tabelas CSV da pasta.
+    '''
+    os.makedirs(pasta, exist_ok=True)
+    arrays = _arraysModelo(modelo)
+    nos, elems = arrays['rotulosNos'], arrays['rotulosElems']
+    (x, y), (noi, noj) = modelo.coords.T, nos[modelo.conect].T
+
+    _gravaTabela(os.path.join(pasta, 'nos.csv'), 'no,x,y', (nos, x, y), ['%d', '%.17g', '%.17g'])
+    _gravaTabela(os.path.join(pasta, 'elementos.csv'), 'elem,noi,noj,E,A',
+                 (elems, noi, noj, modelo.Es, modelo.As), ['%d', '%d', '%d', '%.17g', '%.17g'])
+
+    comCarga = np.flatnonzero(np.any(modelo.cargas != 0, axis=1))
+    _gravaTabela(os.path.join(pasta, 'cargas.csv'), 'no,fx,fy',
+                 (nos[comCarga], *modelo.cargas[comCarga].T), ['%d', '%.17g', '%.17g'])
+    comApoio = np.flatnonzero(np.any(modelo.apoios != 0, axis=1))
+    _gravaTabela(os.path.join(pasta, 'apoios.csv'), 'no,rx,ry',
+                 (nos[comApoio], *modelo.apoios[comApoio].T), '%d')
+
+def carregaCSV(pasta):
+    '''
+    Leitura do ModeloTrelica das tabelas CSV da pasta. Os rótulos são lidos como
+    inteiros e convertidos em posições de forma vetorizada, sem nenhum dicionário.
+    nos.csv e elementos.csv são obrigatórias; cargas.csv e apoios.csv, opcionais.
+    '''
+    rotulosNos, x, y = _leTabela(os.path.join(pasta, 'nos.csv'), (np.int64, float, float), obrigatoria=True)
+    rotulosElems, noi, noj, Es, As = _leTabela(os.path.join(pasta, 'elementos.csv'),
+                                               (np.int64, np.int64, np.int64, float, float), obrigatoria=True)
+    nosCarga, fx, fy = _leTabela(os.path.join(pasta, 'cargas.csv'), (np.int64, float, float))
+    nosApoio, rx, ry = _leTabela(os.path.join(pasta, 'apoios.csv'), (np.int64, np.int64, np.int64))
+
+    mapaNos = MapaRotulos(rotulosNos)
+    conect = mapaNos.indices(np.column_stack([noi, noj]))
+
+    cargasNos = np.zeros((len(rotulosNos), 2))
+    np.add.at(cargasNos, mapaNos.indices(nosCarga), np.column_stack([fx, fy]))
+    apoiosNos = np.zeros((len(rotulosNos), 2), dtype=np.int8)
+    apoiosNos[mapaNos.indices(nosApoio)] = np.column_stack([rx, ry])
+
+    return ModeloTrelica(np.column_stack([x, y]), conect, Es, As, cargasNos, apoiosNos, rotulosNos, rotulosElems)
+
+def salvaResultadosCSV(resultados, pasta):
+    '''
+    Gravação dos ResultadosTrelica nas tabelas resultadosNos.csv (no, ux, uy,
+    rx, ry) e resultadosElementos.csv (elem, deformacao, tensao, normal).
+    '''
+    os.makedirs(pasta, exist_ok=True)
+    modelo = resultados.modelo
+    _gravaTabela(os.path.join(pasta, 'resultadosNos.csv'), 'no,ux,uy,rx,ry',
+                 (_rotulosInteiros(modelo.rotulosNos, 'nós'), *resultados.desloc.T, *resultados.reacoes.T),
+                 ['%d'] + ['%.17g']*4)
+    _gravaTabela(os.path.join(pasta, 'resultadosElementos.csv'), 'elem,deformacao,tensao,normal',
+                 (_rotulosInteiros(modelo.rotulosElems, 'elementos'), resultados.deformacoes,
+                  resultados.tensoes, resultados.normais), ['%d'] + ['%.17g']*3)
+
+### NPZ -----------------------------------------------------------------------
+
+def salvaNPZ(modelo, arquivo):
+    '''
+    Gravação do ModeloTrelica em um arquivo .npz sem compressão.
+    '''
+    np.savez(arquivo, **_arraysModelo(modelo))
+
+def carregaNPZ(arquivo):
+    '''
+    Leitura do ModeloTrelica de um arquivo .npz: cada array é lido uma única vez,
+    já no tipo do modelo, sem conversões.
+    '''
+    with np.load(arquivo, allow_pickle=False) as dados:
+        return ModeloTrelica(*(dados[campo] for campo, _ in CAMPOS))
+
+def salvaResultadosNPZ(resultados, arquivo):
+    '''
+    Gravação dos ResultadosTrelica em um arquivo .npz sem compressão.
+    '''
+    np.savez(arquivo, **_arraysResultados(resultados))
+
+def carregaResultadosNPZ(arquivo, modelo):
+    '''
+    Leitura dos ResultadosTrelica do modelo de um arquivo .npz.
+    '''
+    with np.load(arquivo, allow_pickle=False) as dados:
+        return ResultadosTrelica(modelo, *(dados[campo] for campo in CAMPOS_RESULTADOS))
+
+### MEMMAP --------------------------------------------------------------------
+
+def salvaMemmap(modelo, pasta):
+    '''
+    Gravação do ModeloTrelica em uma pasta com um arquivo binário .npy por array,
+    no tipo e na ordem C do modelo, para a leitura mapeada em memória.
+    '''
+    os.makedirs(pasta, exist_ok=True)
+    arrays = _arraysModelo(modelo)
+    for campo, tipo in CAMPOS:
+        np.save(os.path.join(pasta, campo + '.npy'), np.ascontiguousarray(arrays[campo], dtype=tipo))
+
+def carregaMemmap(pasta, modo='r'):
+    '''
+    Leitura do ModeloTrelica da pasta com os arrays mapeados em memória (modo 'r'
+    somente leitura, 'r+' leitura e escrita ou 'c' cópia na escrita): os arrays
+    do modelo são vistas dos np.memmap, sem cópia.
+    '''
+    return ModeloTrelica(*(np.load(os.path.join(pasta, campo + '.npy'), mmap_mode=modo)
+                           for campo, _ in CAMPOS))
+
+def salvaResultadosMemmap(resultados, pasta):
+    '''
+    Gravação dos ResultadosTrelica em uma pasta com um arquivo .npy por array.
+    '''
+    os.makedirs(pasta, exist_ok=True)
+    for campo, valores in _arraysResultados(resultados).items():
+        np.save(os.path.join(pasta, campo + '.npy'), np.ascontiguousarray(valores, dtype=np.float64))
+
+def carregaResultadosMemmap(pasta, modelo, modo='r'):
+    '''
+    Leitura dos ResultadosTrelica do modelo mapeados em memória.
+    '''
+    return ResultadosTrelica(modelo, *(np.load(os.path.join(pasta, campo + '.npy'), mmap_mode=modo)
+                                       for campo in CAMPOS_RESULTADOS))
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Módulo para a medição do desempenho do cálculo de treliças planas com as treliças
+paramétricas de geradoresTrelica.py:
+    - tempo de cada fase de calculoTrelicaPlana (instrumentacao.FASES): entrada,
+      geometria, montagem, partição, forças, fatoração, solução, reações e 
+      recuperação dos resultados;
+    - pico de memória alocada (tracemalloc, em uma execução separada da dos tempos),
+      memória dos arrays principais, termos não nulos de Ku e condição estimada;
+    - conferência dos deslocamentos e dos esforços normais com uma cópia congelada
+      do algoritmo original, laço por elemento e np.linalg.solve (ou com o resíduo
+      relativo de Ku·Us = Fu, quando a solução densa não cabe na memória), para que
+      um ganho de velocidade não altere os resultados sem aviso;
+    - gravação dos resultados em JSON e comparação com uma execução anterior.
+
+Uso pela linha de comando, por exemplo:
+    python benchmarkTrelica.py --tipos pratt grade --tamanhos 100 10000 --saida atual.json
+    python benchmarkTrelica.py --tamanhos 100 10000 --comparar atual.json
+
+Os tamanhos padrão vão de 10 a 10000 barras. Para 10⁶ barras, passe o tamanho
+explicitamente e omita a solução densa e a medição de memória, por exemplo:
+    python benchmarkTrelica.py --tamanhos 1000000 --solucionadores cholesky --sem-memoria
+Acima de 4000 graus de liberdade livres a conferência com o algoritmo original é
+omitida e os resultados são conferidos pelo resíduo relativo.
+
+@autor: argenta
+"""
+import argparse
+import json
+import math
+import platform
+import subprocess
+import numpy as np
+import calculoTrelica as cal
+import geradoresTrelica as ger
+import instrumentacao as ins
+import solucionadores as sol
+
+FASES = ins.FASES
+
+def executaFases(dados, solucionador='densa', memoria=False):
+    '''
+    Executa calculoTrelicaPlana com a instrumentação de instrumentacao.py, que 
+    mede o tempo de cada fase (e, com memoria=True, o pico de memória), o resíduo
+    e a condição da solução.
+
+    Saída
+    -----
+        * estatisticas: a ins.Estatisticas preenchida;
+        * resultados: a tupla de saída de calculoTrelicaPlana.
+    '''
+    estatisticas = ins.Estatisticas(memoria=memoria, condicao=True)
+    resultados = cal.calculoTrelicaPlana(*dados, solucionador=solucionador, estatisticas=estatisticas)
+    return estatisticas, resultados
+
+def referenciaOriginal(coordNos, incElems, materiais, secoes, cargas, apoios):
+    '''
+    Solução de referência independente do código medido: cópia congelada do
+    algoritmo original de calculoTrelicaPlana, com o laço por elemento, a
+    matriz de rigidez de cada barra escrita termo a termo, a montagem densa
+    elemento a elemento, np.linalg.solve e a recuperação dos esforços normais
+    barra a barra. Não usa funcoesAuxiliares nem calculoTrelica, de modo que
+    uma regressão na geometria, na montagem, na partição ou na recuperação
+    vetorizadas aparece na conferência. Não deve ser alterada com o restante.
+
+    Saída
+    -----
+        * deslocamentos: dicionário do nó com a tupla (X, Y);
+        * normais: dicionário do elemento com o esforço normal.
+    '''
+    posNos = {no: pos for pos, no in enumerate(coordNos)}
+    nGLs = 2*len(coordNos)
+    Kest = np.zeros((nGLs, nGLs))
+    Fest = np.zeros(nGLs)
+    barras = {}
+    for elem, (noi, noj) in incElems.items():
+        (xi, yi), (xj, yj) = coordNos[noi], coordNos[noj]
+        comp = math.sqrt((xj - xi)**2 + (yj - yi)**2)
+        sen, cos = (yj - yi)/comp, (xj - xi)/comp
+        kax = materiais[elem]*secoes[elem]/comp
+        keg = kax*np.array([[ cos*cos,  cos*sen, -cos*cos, -cos*sen],
+                            [ cos*sen,  sen*sen, -cos*sen, -sen*sen],
+                            [-cos*cos, -cos*sen,  cos*cos,  cos*sen],
+                            [-cos*sen, -sen*sen,  cos*sen,  sen*sen]])
+        indi = [2*posNos[noi], 2*posNos[noi] + 1, 2*posNos[noj], 2*posNos[noj] + 1]
+        for lin in range(4):
+            for col in range(4):
+                Kest[indi[lin], indi[col]] += keg[lin, col]
+        barras[elem] = (indi, kax, sen, cos)
+    for no, (fx, fy) in cargas.items():
+        Fest[2*posNos[no]] += fx
+        Fest[2*posNos[no] + 1] += fy
+    GLsrest = [2*posNos[no] + d for no in apoios for d in range(2) if apoios[no][d] == 1]
+    restringidos = set(GLsrest)
+    GLslivr = [gl for gl in range(nGLs) if gl not in restringidos]
+
+    Ug = np.zeros(nGLs)
+    Ug[GLslivr] = np.linalg.solve(Kest[np.ix_(GLslivr, GLslivr)], Fest[GLslivr])
+    deslocamentos = {no: (Ug[2*pos], Ug[2*pos + 1]) for no, pos in posNos.items()}
+    normais = {elem: kax*(cos*(Ug[indi[2]] - Ug[indi[0]]) + sen*(Ug[indi[3]] - Ug[indi[1]]))
+               for elem, (indi, kax, sen, cos) in barras.items()}
+    return deslocamentos, normais
+
+def confereResultados(dados, resultados, estatisticas, maxReferencia=4000):
+    '''
+    Confere os deslocamentos e os esforços normais com a solução de referência
+    independente (referenciaOriginal), quando o número de graus de liberdade
+    livres não passa de maxReferencia, ou com o resíduo relativo de Ku·Us = Fu
+    medido pela instrumentação nos demais casos.
+
+    Saída
+    -----
+        * referencia: 'original' ou 'residuo';
+        * erro: o maior erro relativo dos deslocamentos e dos esforços normais,
+          ou o resíduo relativo.
+    '''
+    if estatisticas.contagens['nGLsLivres'] <= maxReferencia:
+        Uref, Nref = referenciaOriginal(*dados)
+        erros = []
+        for ref, calculados in ((Uref, resultados[0]), (Nref, resultados[4])):
+            valoresRef = np.array([ref[chave] for chave in ref], dtype=float)
+            #os nós fora dos elementos não aparecem nos resultados: deslocamento nulo
+            valores = np.array([calculados.get(chave, np.zeros_like(ref[chave])) for chave in ref], dtype=float)
+            escala = max(np.abs(valoresRef).max(initial=0.), np.finfo(float).tiny)
+            erros.append(np.abs(valores - valoresRef).max(initial=0.)/escala)
+        return 'original', float(max(erros))
+    return 'residuo', estatisticas.solucionador['residuo']
+
+def picoMemoria(dados, solucionador):
+    '''
+    Pico de memória alocada (bytes) em uma execução completa, o maior entre os 
+    picos das fases medidos com tracemalloc.
+    '''
+    return max(executaFases(dados, solucionador, memoria=True)[0].memoria.values())
+
+def executaBenchmark(tipos=ger.TIPOS, tamanhos=(10, 100, 1000, 10000), solucionadores=('densa', 'cholesky'),
+                     repeticoes=3, memoria=True, maxDensa=8000, maxReferencia=4000, tolerancia=1e-6,
+                     mostrar=True):
+    '''
+    Executa o benchmark para todas as combinações de tipo, tamanho (em barras) e
+    solucionador. A solução densa é omitida acima de maxDensa graus de liberdade.
+    Os tempos de cada fase são os menores entre as repetições.
+
+    Saída
+    -----
+        * registros: lista de dicionários, um por combinação.
+    '''
+    registros = []
+    for tipo in tipos:
+        for nBarras in tamanhos:
+            modelo = ger.geraTrelica(tipo, nBarras)
+            dados = modelo.paraDicionarios()
+            for solucionador in solucionadores:
+                if solucionador == 'densa' and 2*modelo.nNos > maxDensa:
+                    continue
+
+                tempos = {fase: np.inf for fase in FASES}
+                for _ in range(max(1, repeticoes)):
+                    estatisticas, resultados = executaFases(dados, solucionador)
+                    tempos = {fase: min(tempos[fase], estatisticas.tempos.get(fase, 0.)) for fase in FASES}
+                referencia, erro = confereResultados(dados, resultados, estatisticas, maxReferencia)
+
+                registro = {'tipo': tipo, 'nBarras': modelo.nElems, 'nNos': modelo.nNos,
+                            'nGLsLivres': estatisticas.contagens['nGLsLivres'],
+                            'nnzKu': estatisticas.contagens['nnzKu'], 'solucionador': solucionador,
+                            'tempos': tempos, 'total': sum(tempos.values()),
+                            'picoMemoria': picoMemoria(dados, solucionador) if memoria else None,
+                            'alocacoes': estatisticas.alocacoes,
+                            'condicao': estatisticas.solucionador['condicao'],
+                            'referencia': referencia, 'erro': erro, 'ok': bool(erro <= tolerancia)}
+                registros.append(registro)
+                if mostrar:
+                    print(_linha(registro))
+    return registros
+
+def _linha(registro):
+    memoria = registro['picoMemoria']
+    memoria = f'{memoria/2**20:9.1f} MiB' if memoria is not None else ' '*13
+    fases = ' '.join(f'{registro["tempos"][fase]:8.4f}' for fase in FASES)
+    return (f'{registro["tipo"]:7s} {registro["nBarras"]:9d} {registro["solucionador"]:9s} {fases} '
+            f'{registro["total"]:9.4f} {memoria} {registro["referencia"]:8s} {registro["erro"]:.1e}'
+            f'{"" if registro["ok"] else "  <-- ERRO"}')
+
+def _revisao():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def salvaJSON(registros, arquivo):
+    '''
+    Grava os registros em JSON com a revisão do git e a plataforma.
+    '''
+    with open(arquivo, 'w') as saida:
+        json.dump({'revisao': _revisao(), 'python': platform.python_version(), 'numpy': np.__version__,
+                   'maquina': platform.platform(), 'registros': registros}, saida, indent=1)
+
+def comparaJSON(registros, arquivo):
+    '''
+    Compara os registros com os de uma execução anterior gravada em JSON e
+    retorna a razão atual/anterior do tempo total e de cada fase por combinação.
+    '''
+    with open(arquivo) as entrada:
+        anteriores = {(r['tipo'], r['nBarras'], r['solucionador']): r for r in json.load(entrada)['registros']}
+
+    razoes = []
+    for registro in registros:
+        anterior = anteriores.get((registro['tipo'], registro['nBarras'], registro['solucionador']))
+        if anterior is None:
+            continue
+        #fases ausentes na execução anterior (de outra versão) ficam sem razão
+        razao = {fase: registro['tempos'][fase]/max(anterior['tempos'][fase], 1e-12) if fase in anterior['tempos']
+                 else float('nan') for fase in FASES}
+        razao['total'] = registro['total']/max(anterior['total'], 1e-12)
+        razoes.append({'tipo': registro['tipo'], 'nBarras': registro['nBarras'],
+                       'solucionador': registro['solucionador'], 'razoes': razao})
+    return razoes
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark do cálculo de treliças planas.')
+    parser.add_argument('--tipos', nargs='+', default=list(ger.TIPOS), choices=ger.TIPOS)
+    parser.add_argument('--tamanhos', nargs='+', type=int, default=[10, 100, 1000, 10000],
+                        help='quantidades aproximadas de barras')
+    parser.add_argument('--solucionadores', nargs='+', default=['densa', 'cholesky'], choices=sol.METODOS)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--sem-memoria', action='store_true', help='não mede o pico de memória')
+    parser.add_argument('--saida', help='arquivo JSON para gravar os resultados')
+    parser.add_argument('--comparar', help='arquivo JSON de uma execução anterior')
+    args = parser.parse_args()
+
+    print(f'{"tipo":7s} {"barras":>9s} {"solver":9s} ' + ' '.join(f'{fase[:8]:>8s}' for fase in FASES) +
+          f' {"total":>9s} {"memória":>13s} {"ref":8s} erro')
+    registros = executaBenchmark(args.tipos, args.tamanhos, args.solucionadores, args.repeticoes,
+                                 not args.sem_memoria)
+    if args.saida:
+        salvaJSON(registros, args.saida)
+    if args.comparar:
+        for r in comparaJSON(registros, args.comparar):
+            print(f'{r["tipo"]:7s} {r["nBarras"]:9d} {r["solucionador"]:9s} ' +
+                  ' '.join(f'{r["razoes"][fase]:8.2f}' for fase in FASES) + f' {r["razoes"]["total"]:9.2f}')
+    if not all(r['ok'] for r in registros):
+        raise SystemExit('Existem resultados diferentes da referência!')
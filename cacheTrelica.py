@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Módulo para o cache persistente em disco das soluções de calculoTrelicaPlana,
+endereçado pelo conteúdo das entradas, para as soluções repetidas de modelos
+idênticos (regeneração de relatórios, verificações de projeto refeitas):
+    - resumoEntrada(entrada), chaveEntradas(*entradas): resumo SHA-256 de cada
+      entrada normalizada e a chave que os combina;
+    - CacheTrelica(diretorio, ...): o cache em dois níveis, com limite de
+      tamanho e descarte dos arquivos usados há mais tempo (LRU);
+    - cacheTrelica(arg): normaliza o argumento cache de calculoTrelicaPlana
+      (None, uma CacheTrelica ou o caminho do diretório);
+    - calculoComCache(cache, ...): a solução de calculoTrelicaPlana com o cache.
+
+Níveis do cache:
+    - 'resultados': chave de todas as entradas e das opções do solucionador,
+      com os arrays de recuperaResultados, que dispensam qualquer cálculo;
+    - 'geometria': chave das entradas sem as cargas, com a estrutura montada
+      (Ku e Kr particionadas) em disco, que dispensa a montagem, e, no próprio
+      processo, a estrutura e o solucionador já fatorado dos modelos mais
+      recentes, que dispensam também a fatoração.
+
+Os arquivos são .npz gravados em um arquivo temporário e renomeados de forma
+atômica (os.replace), de modo que os leitores nunca veem um arquivo
+incompleto; o descarte é feito com o diretório travado (fcntl.flock, onde
+disponível) para o acesso simultâneo de vários processos, e apaga também os
+temporários antigos deixados por processos interrompidos durante a gravação.
+
+@autor: argenta
+"""
+import os
+import time
+import hashlib
+import tempfile
+import contextlib
+from collections import OrderedDict
+import numpy as np
+import scipy.sparse as sp
+import funcoesAuxiliares as fa
+import calculoTrelica as cal
+import solucionadores as sol
+import instrumentacao as ins
+
+try:
+    import fcntl
+except ImportError: #Windows: somente a renomeação atômica
+    fcntl = None
+
+VERSAO = 3 #alterar sempre que o formato dos arquivos ou o cálculo mudar
+NIVEIS = ('resultados', 'geometria')
+FOLGA = 0.9 #fração do tamanho máximo deixada pelo descarte das gravações
+
+def resumoEntrada(entrada):
+    '''
+    Função para o resumo (SHA-256) do conteúdo de uma entrada: os dicionários têm
+    as chaves pela sua representação e os valores numéricos normalizados para
+    float64 (1 e 1.0 dão o mesmo resumo) em um único array; os demais valores,
+    e os dicionários com valores não numéricos, pela sua representação. A ordem
+    dos itens dos dicionários faz parte do resumo.
+    '''
+    resumo = hashlib.sha256()
+    if isinstance(entrada, dict):
+        resumo.update(b'd' + repr(list(entrada)).encode())
+        try:
+            valores = np.array(list(entrada.values()), dtype=np.float64)
+            resumo.update(b'f' + str(valores.shape).encode() + valores.tobytes())
+        except (TypeError, ValueError): #rótulos de nós não numéricos ou valores irregulares
+            resumo.update(b'r' + repr(list(entrada.values())).encode())
+    else:
+        resumo.update(b'o' + repr(entrada).encode())
+    return resumo.digest()
+
+def chaveEntradas(*entradas, resumos=None):
+    '''
+    Função para a chave (hash SHA-256 em hexadecimal) do conteúdo das entradas,
+    combinando os resumos de cada uma (resumoEntrada), que podem ser dados já
+    calculados em resumos para as chaves de subconjuntos das mesmas entradas.
+    '''
+    resumos = [resumoEntrada(entrada) for entrada in entradas] if resumos is None else resumos
+    return hashlib.sha256(f'cacheTrelica-{VERSAO}'.encode() + b''.join(resumos)).hexdigest()
+
+class CacheTrelica:
+    '''
+    Classe do cache persistente em disco, com um subdiretório por nível.
+
+    Entrada
+    -------
+        * diretorio: o diretório do cache, criado se não existir;
+        * tamanhoMaximo: tamanho máximo em bytes de todos os arquivos, acima do
+          qual os usados há mais tempo são apagados (padrão: 256 MiB);
+        * preparadosMaximo: quantidade de estruturas fatoradas guardadas na
+          memória do processo;
+        * comprimir: gravação com np.savez_compressed;
+        * idadeTemporarios: idade em segundos a partir da qual um arquivo .tmp é
+          considerado abandonado por um processo interrompido e apagado no
+          descarte (padrão: 1 hora);
+        * limitarCada: quantidade de gravações entre as varreduras do diretório
+          pelo descarte, além das feitas quando o tamanho acumulado pelo próprio
+          processo passa do máximo (os arquivos dos outros processos só são
+          contados nas varreduras).
+
+    Atributos
+    ---------
+        * acertos, falhas: contagens por nível ('resultados', 'geometria' e
+          'memoria', a estrutura fatorada do processo).
+
+    '''
+    def __init__(self, diretorio, tamanhoMaximo=256*2**20, preparadosMaximo=8, comprimir=False,
+                 idadeTemporarios=3600., limitarCada=32):
+        self.diretorio = os.path.abspath(diretorio)
+        self.tamanhoMaximo = int(tamanhoMaximo)
+        self.preparadosMaximo = int(preparadosMaximo)
+        self.comprimir = comprimir
+        self.idadeTemporarios = float(idadeTemporarios)
+        self.limitarCada = max(1, int(limitarCada))
+        self._tamanho = None #tamanho do diretório na última varredura mais as gravações seguintes
+        self._gravacoes = 0
+        for nivel in NIVEIS:
+            os.makedirs(os.path.join(self.diretorio, nivel), exist_ok=True)
+        self._preparados = OrderedDict()
+        self.acertos = dict.fromkeys(NIVEIS + ('memoria',), 0)
+        self.falhas = dict.fromkeys(NIVEIS + ('memoria',), 0)
+
+    def _caminho(self, nivel, chave):
+        return os.path.join(self.diretorio, nivel, chave + '.npz')
+
+    @contextlib.contextmanager
+    def _trava(self):
+        '''
+        Trava exclusiva do diretório entre os processos.
+        '''
+        with open(os.path.join(self.diretorio, '.trava'), 'a+b') as arquivo:
+            if fcntl is not None:
+                fcntl.flock(arquivo, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+    def obtem(self, nivel, chave):
+        '''
+        Arrays guardados com a chave no nível, ou None. O acesso atualiza a data
+        de modificação do arquivo, que define a ordem do descarte.
+        '''
+        caminho = self._caminho(nivel, chave)
+        try:
+            with np.load(caminho, allow_pickle=False) as dados:
+                arrays = {nome: dados[nome] for nome in dados.files}
+        except (FileNotFoundError, OSError, ValueError): #ausente, descartado ou corrompido
+            self.falhas[nivel] += 1
+            return None
+        with contextlib.suppress(FileNotFoundError): #descartado por outro processo após a leitura
+            os.utime(caminho)
+        self.acertos[nivel] += 1
+        return arrays
+
+    def guarda(self, nivel, chave, **arrays):
+        '''
+        Gravação atômica dos arrays com a chave no nível, seguida do descarte dos
+        arquivos mais antigos acima do tamanho máximo. O diretório só é varrido
+        quando o tamanho acumulado passa do máximo ou a cada limitarCada gravações,
+        e o descarte vai até FOLGA do máximo, para que as gravações seguintes não
+        varram o diretório de novo.
+        '''
+        pasta = os.path.join(self.diretorio, nivel)
+        descritor, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+        try:
+            with os.fdopen(descritor, 'wb') as arquivo:
+                (np.savez_compressed if self.comprimir else np.savez)(arquivo, **arrays)
+                tamanho = arquivo.tell()
+            os.replace(temporario, self._caminho(nivel, chave))
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temporario)
+            raise
+        self._gravacoes += 1
+        if self._tamanho is not None:
+            self._tamanho += tamanho #as regravações são contadas em dobro, a favor do descarte
+        if self._tamanho is None or self._tamanho > self.tamanhoMaximo or \
+           self._gravacoes % self.limitarCada == 0:
+            self.limita(int(FOLGA*self.tamanhoMaximo))
+
+    def limita(self, tamanhoMaximo=None):
+        '''
+        Descarte dos arquivos usados há mais tempo até o total ficar abaixo do
+        tamanho máximo. Os temporários mais antigos que idadeTemporarios são
+        apagados sempre; os mais recentes, de gravações em andamento, entram no
+        total mas não são apagados. Retorna o tamanho final em bytes.
+        '''
+        tamanhoMaximo = self.tamanhoMaximo if tamanhoMaximo is None else tamanhoMaximo
+        limiteTemporarios = time.time() - self.idadeTemporarios
+        with self._trava():
+            arquivos, total = [], 0
+            for nivel in NIVEIS:
+                with os.scandir(os.path.join(self.diretorio, nivel)) as entradas:
+                    for entrada in entradas:
+                        with contextlib.suppress(FileNotFoundError):
+                            if entrada.name.endswith('.npz'):
+                                info = entrada.stat()
+                                arquivos.append((info.st_mtime, info.st_size, entrada.path))
+                                total += info.st_size
+                            elif entrada.name.endswith('.tmp'):
+                                info = entrada.stat()
+                                if info.st_mtime < limiteTemporarios: #abandonado
+                                    os.remove(entrada.path)
+                                else:
+                                    total += info.st_size
+            for _, tamanho, caminho in sorted(arquivos):
+                if total <= tamanhoMaximo:
+                    break
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(caminho)
+                total -= tamanho
+        self._tamanho = total
+        return total
+
+    def limpa(self):
+        '''
+        Remoção de todos os arquivos e das estruturas fatoradas do processo.
+        '''
+        self._preparados.clear()
+        self.limita(0)
+
+    def preparado(self, chave):
+        '''
+        Estrutura e solucionador fatorado do processo com a chave de geometria, ou None.
+        '''
+        if chave in self._preparados:
+            self._preparados.move_to_end(chave)
+            self.acertos['memoria'] += 1
+            return self._preparados[chave]
+        self.falhas['memoria'] += 1
+        return None
+
+    def guardaPreparado(self, chave, estrutura, solver):
+        self._preparados[chave] = (estrutura, solver)
+        self._preparados.move_to_end(chave)
+        while len(self._preparados) > self.preparadosMaximo:
+            self._preparados.popitem(last=False)
+
+_caches = {}
+
+def cacheTrelica(arg):
+    '''
+    Normalização do argumento cache de calculoTrelicaPlana: None desliga o cache,
+    uma CacheTrelica é usada como está e um caminho usa a CacheTrelica do
+    diretório, criada uma única vez por processo (para manter as estruturas
+    fatoradas entre as chamadas).
+    '''
+    if arg is None or isinstance(arg, CacheTrelica):
+        return arg
+    if isinstance(arg, (str, os.PathLike)):
+        diretorio = os.path.abspath(arg)
+        if diretorio not in _caches:
+            _caches[diretorio] = CacheTrelica(diretorio)
+        return _caches[diretorio]
+    raise ValueError('O argumento cache deve ser None, uma CacheTrelica ou um diretório! ' +\
+                     'Verifique as entradas.')
+
+### ESTRUTURA MONTADA EM ARRAYS -----------------------------------------------
+
+_CAMPOS_ESTRUTURA = ('conect', 'indis', 'comps', 'sens', 'coss', 'Es', 'As', 'GLslivr', 'GLsrest')
+_CAMPOS_RESULTADOS = ('Ug', 'Rg', 'defos', 'tenss', 'norms')
+_CAMPOS_BANDA = ('bandaAntes', 'perfilAntes', 'bandaDepois', 'perfilDepois', 'renumerado')
+
+def _arraysEstrutura(estrutura):
+    '''
+    A estrutura de montaEstrutura em arrays para o .npz, com Ku e Kr esparsas
+    pelos vetores do formato CSR e a banda e o perfil da renumeração, se houver.
+    '''
+    arrays = {campo: estrutura[campo] for campo in _CAMPOS_ESTRUTURA}
+    arrays['nGLs'] = np.array(estrutura['nGLs'])
+    if 'banda' in estrutura:
+        arrays['banda'] = np.array([estrutura['banda'][campo] for campo in _CAMPOS_BANDA])
+    for nome in ('Ku', 'Kr'):
+        K = estrutura[nome]
+        if sp.issparse(K):
+            K = sp.csr_matrix(K)
+            arrays.update({nome + '_data': K.data, nome + '_indices': K.indices, nome + '_indptr': K.indptr,
+                           nome + '_forma': np.array(K.shape)})
+        else:
+            arrays[nome] = K
+    return arrays
+
+def _estruturaArrays(arrays, coordNos, incElems):
+    '''
+    Reconstrução da estrutura de montaEstrutura a partir dos arrays do .npz.
+    '''
+    estrutura = {campo: arrays[campo] for campo in _CAMPOS_ESTRUTURA}
+    estrutura['nGLs'] = int(arrays['nGLs'])
+    if 'banda' in arrays:
+        estrutura['banda'] = dict(zip(_CAMPOS_BANDA, arrays['banda'].tolist()))
+        estrutura['banda']['renumerado'] = bool(estrutura['banda']['renumerado'])
+    for nome in ('Ku', 'Kr'):
+        if nome in arrays:
+            estrutura[nome] = arrays[nome]
+        else:
+            estrutura[nome] = sp.csr_matrix((arrays[nome + '_data'], arrays[nome + '_indices'],
+                                             arrays[nome + '_indptr']), shape=tuple(arrays[nome + '_forma']))
+    estrutura.update(posNos=fa.numeracaoNos(coordNos), elems=list(incElems), incElems=incElems)
+    return estrutura
+
+def calculoComCache(cache, coordNos, incElems, materiais, secoes, cargas, apoios, esparsa=None,
+                    solucionador=None, opcoesSolucionador=None, info=None, renumerar=None,
+                    estatisticas=None):
+    '''
+    Função da solução de calculoTrelicaPlana com o cache, com as mesmas entradas
+    e saídas. Em info, 'cache' indica o nível usado: 'resultados', 'memoria'
+    (estrutura fatorada do processo), 'geometria' (estrutura montada do disco)
+    ou None (solução completa).
+    '''
+    cache = cacheTrelica(cache)
+    esparsa, solucionador, renumerar = cal.escolheSolucionador(esparsa, solucionador, renumerar)
+    opcoes = (esparsa, solucionador, renumerar, sorted((opcoesSolucionador or {}).items()))
+    est = ins.estatisticas(estatisticas)
+
+    # Resultados completos
+    est.marca('cache')
+    #cada entrada é resumida uma única vez para as chaves dos dois níveis
+    resumos = [resumoEntrada(entrada) for entrada in (coordNos, incElems, materiais, secoes, apoios, opcoes)]
+    chaveResultados = chaveEntradas(resumos=resumos + [resumoEntrada(cargas)])
+    arrays = cache.obtem('resultados', chaveResultados)
+    if arrays is not None:
+        if info is not None:
+            info.update(cache='resultados')
+        estrutura = {'conect': arrays['conect'], 'posNos': fa.numeracaoNos(coordNos), 'elems': list(incElems)}
+        resultados = cal.dicionariosResultados(estrutura, *(arrays[campo] for campo in _CAMPOS_RESULTADOS))
+        est.finaliza()
+        return resultados
+
+    # Estrutura fatorada no processo, estrutura montada no disco ou montagem completa
+    chaveGeometria = chaveEntradas(resumos=resumos)
+    preparado = cache.preparado(chaveGeometria)
+    nivel = 'memoria'
+    if preparado is not None:
+        estrutura, solver = preparado
+    else:
+        arrays = cache.obtem('geometria', chaveGeometria)
+        if arrays is not None:
+            nivel = 'geometria'
+            estrutura = _estruturaArrays(arrays, coordNos, incElems)
+        else:
+            nivel = None
+            estrutura = cal.montaEstrutura(coordNos, incElems, materiais, secoes, apoios, esparsa, renumerar, est)
+            est.marca('cache')
+            cache.guarda('geometria', chaveGeometria, **_arraysEstrutura(estrutura))
+        est.marca('fatoracao')
+        solver = sol.Solucionador(estrutura['Ku'], solucionador, **(opcoesSolucionador or {}))
+        cache.guardaPreparado(chaveGeometria, estrutura, solver)
+
+    # Solução como em calculoTrelicaPlana
+    est.marca('forcas')
+    Fest = fa.vetorForcas(estrutura['posNos'], cargas, estrutura['nGLs'])
+    Fu, Fr = Fest[estrutura['GLslivr']], Fest[estrutura['GLsrest']]
+    est.marca('solucao')
+    tempoAnterior = solver.tempoSolucao
+    Us = solver.resolver(Fu)
+    est.verificaSolucao(estrutura['Ku'], Us, Fu, solver)
+    if info is not None:
+        #tempos desta chamada: o solver reaproveitado acumula as soluções anteriores
+        info.update(solver.relatorio(), **estrutura.get('banda', {}), cache=nivel,
+                    tempoSolucao=solver.tempoSolucao - tempoAnterior)
+        if nivel == 'memoria':
+            info['tempoFatoracao'] = 0.
+    est.marca('reacoes')
+    Re = estrutura['Kr'] @ Us - Fr
+    est.marca('recuperacao')
+    arrays = cal.recuperaResultados(estrutura, Us, Re)
+    resultados = cal.dicionariosResultados(estrutura, *arrays)
+    est.marca('cache')
+    cache.guarda('resultados', chaveResultados, conect=estrutura['conect'],
+                 **dict(zip(_CAMPOS_RESULTADOS, arrays)))
+    est.finaliza()
+    return resultados
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Módulo para a análise modal de treliças planas: frequências naturais e modos de
+vibração somente dos k modos mais baixos, sem a decomposição densa completa.
+
+O problema K·φ = ω²·M·φ é resolvido com o Lanczos do ARPACK (eigsh) no modo de
+deslocamento e inversão em torno de σ (padrão σ = 0): os autovalores mais
+próximos de σ são os maiores de (K - σM)⁻¹·M, que converge em poucas dezenas de
+substituições com uma única fatoração esparsa de K - σM.
+
+A estrutura é montada por cal.montaEstrutura, com a mesma numeração e partição
+dos graus de liberdade da análise estática.
+
+Unidades: com kN e cm, a massa específica deve estar em kN·s²/cm⁴ para as
+frequências em Hz.
+
+@autor: argenta
+"""
+import time
+import numpy as np
+import scipy.linalg as sla
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+import funcoesAuxiliares as fa
+import calculoTrelica as cal
+import solucionadores as sol
+
+def calculoModalTrelica(coordNos, incElems, materiais, secoes, apoios, densidades, nModos=10,
+                        massa='consistente', sigma=0., info=None):
+    '''
+    Função para a análise modal de quaisquer treliças planas pelo método dos
+    elementos finitos, com os mesmos dados de entrada de calculoTrelicaPlana.
+
+    Entrada
+    -------
+        * coordNos, incElems, materiais, secoes, apoios: como em calculoTrelicaPlana;
+        * massas específicas das barras: densidades, dicionário com o número do
+          elemento como chave e a massa específica como valor, ou um único valor
+          para todas as barras;
+        * quantidade de modos: nModos;
+        * matriz de massa: massa, 'consistente' ou 'concentrada';
+        * deslocamento espectral: sigma, ω² em torno do qual os modos são
+          procurados (padrão: 0, os modos mais baixos);
+        * relatório (opcional): info, dicionário preenchido com o método, os
+          tempos e a quantidade de graus de liberdade livres.
+
+    Saída
+    -----
+        * frequencias: array (nModos,) com as frequências naturais em Hz, em
+          ordem crescente;
+        * modos: lista com um dicionário por modo, com o número do nó como chave
+          e a tupla (deslocamento X, deslocamento Y) como valor, normalizados
+          pela massa (φᵀ·M·φ = 1).
+
+    '''
+    # Montagem da estrutura esparsa, com a verificação da estabilidade
+    estrutura = cal.montaEstrutura(coordNos, incElems, materiais, secoes, apoios, esparsa=True)
+
+    # Massas específicas dos elementos
+    if isinstance(densidades, dict):
+        rhos = np.array([densidades[elem] for elem in incElems], dtype=float)
+    else:
+        rhos = np.full(len(incElems), float(densidades))
+
+    omegas, Ug = modosEstrutura(estrutura, rhos, nModos, massa, sigma, info)
+
+    # Modos nos nós, na ordem de coordNos
+    nos = list(estrutura['posNos'])
+    modos = [dict(zip(nos, map(tuple, Ug[:, j].reshape(-1, 2).tolist()))) for j in range(Ug.shape[1])]
+    return omegas/(2*np.pi), modos
+
+def matrizMassa(estrutura, rhos, tipo='consistente'):
+    '''
+    Função para a montagem da matriz de massa dos graus de liberdade livres, na
+    mesma ordem de Ku: a consistente com os tripletos de todos os elementos, como
+    a matriz de rigidez, e a concentrada diretamente na diagonal.
+
+    Entrada
+    -------
+        * estrutura: dicionário criado por cal.montaEstrutura ou cal.montaEstruturaArrays;
+        * rhos: array (nElems,) com as massas específicas;
+        * tipo: 'consistente' ou 'concentrada'.
+
+    Saída
+    -----
+        * Mu: matriz de massa dos graus de liberdade livres no formato CSR.
+
+    '''
+    indis, nGLs = estrutura['indis'], estrutura['nGLs']
+    if tipo == 'concentrada':
+        #metade da massa de cada barra em cada grau de liberdade dos seus nós
+        massas = rhos*estrutura['As']*estrutura['comps']
+        diagonal = np.bincount(indis.ravel(), weights=np.repeat(massas/2., 4), minlength=nGLs)
+        return sp.diags(diagonal[estrutura['GLslivr']], format='csr')
+
+    megs = fa.matMassa_TPLote(rhos, estrutura['As'], estrutura['comps'], tipo)
+    Mest = fa.montaRigidezEsparsa(indis, megs, nGLs) #mesma montagem da rigidez
+    return fa.particionaRigidezEsparsa(Mest, estrutura['GLslivr'], estrutura['GLsrest'])[0]
+
+def modosEstrutura(estrutura, rhos, nModos=10, massa='consistente', sigma=0., info=None):
+    '''
+    Função para o cálculo dos nModos modos com ω² mais próximos de sigma com o
+    Lanczos em deslocamento e inversão. Para σ = 0, a fatoração de Ku é feita
+    pelo sol.Solucionador de Cholesky esparso; para σ ≠ 0, K - σM é indefinida
+    e é fatorada pela LU esparsa com pivoteamento. Estruturas com menos graus
+    de liberdade livres que nModos + 2 são resolvidas de forma densa.
+
+    Entrada
+    -------
+        * estrutura: dicionário criado por cal.montaEstrutura ou cal.montaEstruturaArrays;
+        * rhos: array (nElems,) com as massas específicas;
+        * nModos, massa, sigma, info: como em calculoModalTrelica.
+
+    Saída
+    -----
+        * omegas: array (nModos,) com as frequências angulares em rad/s, crescentes;
+        * Ug: array (nGLs, nModos) com os modos em todos os graus de liberdade,
+          normalizados pela massa e com zeros nos restringidos.
+
+    '''
+    Ku = sp.csr_matrix(estrutura['Ku'])
+    Mu = matrizMassa(estrutura, np.asarray(rhos, dtype=float), massa)
+    n = Ku.shape[0]
+    nModos = int(nModos)
+    if nModos < 1:
+        raise ValueError('A quantidade de modos deve ser de pelo menos 1! Verifique nModos.')
+    if nModos > n:
+        raise ValueError(f'A estrutura tem apenas {n} graus de liberdade livres, menos que {nModos} modos! ' +\
+                         'Verifique nModos.')
+
+    t0 = time.perf_counter()
+    if nModos >= n - 1:
+        #poucos graus de liberdade: espectro denso completo e os nModos mais próximos de sigma
+        lambdas, Phi = sla.eigh(Ku.toarray(), Mu.toarray())
+        proximos = np.argsort(np.abs(lambdas - sigma), kind='stable')[:nModos]
+        lambdas, Phi = lambdas[proximos], Phi[:, proximos]
+        metodo, tempoFatoracao = 'lapack-eigh', 0.
+    else:
+        #uma única fatoração de K - σM aplicada a cada iteração do Lanczos
+        if sigma == 0:
+            solver = sol.Solucionador(Ku, 'cholesky')
+            resolver, tempoFatoracao = solver.resolver, solver.tempoFatoracao
+        else:
+            t1 = time.perf_counter()
+            resolver = spla.splu(sp.csc_matrix(Ku - sigma*Mu)).solve
+            tempoFatoracao = time.perf_counter() - t1
+        OPinv = spla.LinearOperator((n, n), matvec=resolver, dtype=float)
+        lambdas, Phi = spla.eigsh(Ku, k=nModos, M=Mu, sigma=sigma, which='LM', OPinv=OPinv)
+        metodo = 'arpack-eigsh-shift-invert'
+
+    # Ordem crescente, normalização pela massa e sinal com o maior termo positivo
+    ordem = np.argsort(lambdas)
+    lambdas, Phi = lambdas[ordem], Phi[:, ordem]
+    Phi = Phi/np.sqrt(np.einsum('ij,ij->j', Phi, Mu @ Phi))
+    Phi *= np.sign(Phi[np.abs(Phi).argmax(axis=0), np.arange(Phi.shape[1])])
+    omegas = np.sqrt(np.clip(lambdas, 0., None))
+
+    Ug = np.zeros((estrutura['nGLs'], Phi.shape[1]))
+    Ug[estrutura['GLslivr']] = Phi
+    if info is not None:
+        info.update({'metodo': metodo, 'massa': massa, 'nGLsLivres': n, 'nModos': Phi.shape[1],
+                     'tempoFatoracao': tempoFatoracao, 'tempoTotal': time.perf_counter() - t0})
+    return omegas, Ug
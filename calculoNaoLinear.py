@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Módulo para a análise de treliças planas com grandes deslocamentos (não
+linearidade geométrica), com a formulação corrotacional das barras: a
+deformação é (l - L)/L com o comprimento atual l, o esforço normal atua na
+direção atual da barra e a rigidez tangente é a matRig_TP na direção atual
+somada à rigidez geométrica N/l·[[G, -G], [-G, G]].
+
+A carga é aplicada de forma incremental:
+    - controle='carga': incrementos iguais do fator de carga até 1;
+    - controle='arco': comprimento de arco cilíndrico de Crisfield, que
+      acompanha os pontos limite (como o salto das treliças abatidas) e termina
+      com uma correção no fator de carga 1.
+
+E em cada incremento o equilíbrio é iterado com:
+    - metodo='newton': Newton-Raphson completo, com nova tangente em cada iteração;
+    - metodo='newton-modificado': a fatoração da tangente é reaproveitada nas
+      iterações e nos incrementos seguintes, e só é refeita quando um incremento
+      precisa de mais de iterTangente iterações;
+    - metodo='bfgs': a mesma fatoração reaproveitada, com as atualizações BFGS de
+      Matthies e Strang aplicadas pela recursão de dois laços (somente com o
+      controle de carga).
+
+Com a tangente reaproveitada, cada iteração custa uma montagem das forças
+internas e uma substituição, sem nova fatoração.
+
+@autor: argenta
+"""
+import numpy as np
+import scipy.sparse as sp
+import funcoesAuxiliares as fa
+import calculoTrelica as cal
+import solucionadores as sol
+
+METODOS = ('newton', 'newton-modificado', 'bfgs')
+CONTROLES = ('carga', 'arco')
+
+class _Sistema:
+    '''
+    Forças internas e rigidez tangente dos graus de liberdade livres da
+    estrutura montada, com os índices dos tripletos livres calculados uma única
+    vez, e a fatoração atual da tangente.
+    '''
+    def __init__(self, estrutura, solucionador, opcoesSolucionador):
+        self.estrutura = estrutura
+        self.solucionador = solucionador
+        self.opcoesSolucionador = opcoesSolucionador or {}
+        self.coords = estrutura['coords']
+        self.nLivr = len(estrutura['GLslivr'])
+        self.fatoracoes = 0
+        self.solver = None
+        self.fatorado = None #esforços do estado da fatoração atual
+
+        #posição de cada grau de liberdade nos livres (-1 para os restringidos)
+        #e tripletos das matrizes dos elementos que caem em Ku
+        mapa = np.full(estrutura['nGLs'], -1)
+        mapa[estrutura['GLslivr']] = np.arange(self.nLivr)
+        livres = mapa[estrutura['indis']]
+        lins = np.repeat(livres, 4, axis=1).ravel()
+        cols = np.tile(livres, (1, 4)).ravel()
+        self.tripletos = (lins >= 0) & (cols >= 0)
+        self.lins, self.cols = lins[self.tripletos], cols[self.tripletos]
+
+    def esforcos(self, Ug):
+        '''
+        Geometria atual, deformações e esforços normais dos elementos e o vetor
+        de forças internas de todos os graus de liberdade.
+        '''
+        est = self.estrutura
+        conect = est['conect']
+        comps, sens, coss = fa.compSenCosLote(self.coords + Ug.reshape(-1, 2), conect)
+        
+        #alongamento l - L = (l² - L²)/(l + L), sem o cancelamento da subtração
+        #direta para os deslocamentos pequenos
+        d0 = self.coords[conect[:, 1]] - self.coords[conect[:, 0]]
+        du = Ug.reshape(-1, 2)[conect[:, 1]] - Ug.reshape(-1, 2)[conect[:, 0]]
+        alongs = np.einsum('ij,ij->i', du, 2*d0 + du)/(comps + est['comps'])
+        defos = alongs/est['comps']
+        norms = est['Es']*est['As']*defos
+        b = np.stack([-coss, -sens, coss, sens], axis=1)
+        Fint = np.bincount(est['indis'].ravel(), weights=(norms[:, None]*b).ravel(), minlength=est['nGLs'])
+        return {'comps': comps, 'sens': sens, 'coss': coss, 'defos': defos, 'norms': norms, 'Fint': Fint}
+
+    def fatora(self, esforcos):
+        '''
+        Montagem e fatoração da rigidez tangente dos graus de liberdade livres.
+        '''
+        est = self.estrutura
+        l, s, c = esforcos['comps'], esforcos['sens'], esforcos['coss']
+        kegs = fa.matRig_TPLote(est['Es'], est['As'], est['comps'], s, c) + \
+               fa.matRigGeo_TPLote(esforcos['norms'], l, s, c)
+        Kt = sp.coo_matrix((kegs.reshape(-1)[self.tripletos], (self.lins, self.cols)),
+                           shape=(self.nLivr, self.nLivr)).tocsr()
+        self.solver = sol.Solucionador(Kt, self.solucionador, **self.opcoesSolucionador)
+        self.fatoracoes += 1
+        self.fatorado = esforcos
+
+    def resolver(self, R):
+        return self.solver.resolver(R)
+
+def calculoTrelicaNaoLinear(coordNos, incElems, materiais, secoes, cargas, apoios, passos=10,
+                            metodo='newton', controle='carga', tol=1e-8, maxIter=30, iterTangente=8,
+                            maxPassos=None, solucionador='lu', opcoesSolucionador=None, info=None):
+    '''
+    Função para a solução de treliças planas com grandes deslocamentos pelo
+    método dos elementos finitos, com os mesmos dados de entrada de
+    calculoTrelicaPlana e as cargas aplicadas de forma incremental.
+
+    Entrada
+    -------
+        * coordNos, incElems, materiais, secoes, cargas, apoios: como em calculoTrelicaPlana;
+        * quantidade de incrementos: passos, iguais no controle de carga e, no
+          controle de arco, o inicial é o comprimento de arco do primeiro
+          incremento (a solução linear de 1/passos da carga);
+        * método das iterações: metodo, 'newton', 'newton-modificado' ou 'bfgs';
+        * controle dos incrementos: controle, 'carga' ou 'arco';
+        * tolerância: tol, do resíduo relativo ‖λ·Fu - Fint‖/‖λ·Fu‖;
+        * iterações máximas por incremento: maxIter;
+        * iterações sem nova tangente: iterTangente, nos métodos com a tangente
+          reaproveitada;
+        * incrementos máximos no controle de arco: maxPassos (padrão: 20·passos);
+        * solucionador, opcoesSolucionador: como em calculoTrelicaPlana, 'lu'
+          (padrão) ou 'densa', pois a tangente pode ser indefinida após os pontos
+          limite; o 'cholesky' só serve antes deles, pois com o CHOLMOD lança
+          np.linalg.LinAlgError no primeiro pivô negativo;
+        * relatório (opcional): info, dicionário preenchido com os fatores de
+          carga e as iterações de cada incremento, a quantidade de fatorações e o
+          caminho (fator de carga, deslocamentos de todos os graus de liberdade).
+
+    Saída
+    -----
+        * deslocamentos, RXY, deformacoes, tensoes, normais: como em
+          calculoTrelicaPlana, na configuração deformada com a carga total.
+
+    '''
+    if metodo not in METODOS:
+        raise ValueError(f'Método {metodo} desconhecido! Use um entre {METODOS}.')
+    if controle not in CONTROLES:
+        raise ValueError(f'Controle {controle} desconhecido! Use um entre {CONTROLES}.')
+    if metodo == 'bfgs' and controle == 'arco':
+        raise ValueError('O método bfgs é somente para o controle de carga! Use newton ou newton-modificado.')
+
+    # Entradas, partição e verificação da estabilidade, sem a matriz de rigidez
+    # linear: só a geometria inicial é acrescentada, e as tangentes são montadas
+    # pelo _Sistema
+    estrutura = cal.entradaEstrutura(coordNos, incElems, materiais, secoes, apoios)
+    estrutura['indis'] = fa.indexadoresConect(estrutura['conect'])
+    estrutura['comps'], estrutura['sens'], estrutura['coss'] = fa.compSenCosLote(estrutura['coords'],
+                                                                                 estrutura['conect'])
+    GLslivr, GLsrest = estrutura['GLslivr'], estrutura['GLsrest']
+    Fest = fa.vetorForcas(estrutura['posNos'], cargas, estrutura['nGLs'])
+    Fu = Fest[GLslivr]
+
+    sistema = _Sistema(estrutura, solucionador, opcoesSolucionador)
+    Ug = np.zeros(estrutura['nGLs'])
+    esforcos = sistema.esforcos(Ug)
+    sistema.fatora(esforcos)
+
+    atualiza = metodo == 'newton'
+    fatores, iteracoes, caminho = [], [], []
+    if controle == 'carga':
+        for k in range(1, int(passos) + 1):
+            Ug, esforcos, nIter = _equilibrio(sistema, Ug, esforcos, k/passos*Fu, metodo, tol, maxIter,
+                                              iterTangente)
+            fatores.append(k/passos)
+            iteracoes.append(nIter)
+            caminho.append((k/passos, Ug.copy()))
+    else:
+        Ug, esforcos = _comprimentoArco(sistema, Ug, esforcos, Fu, passos, atualiza, tol, maxIter,
+                                        iterTangente, maxPassos or 20*int(passos), fatores, iteracoes, caminho)
+
+    if info is not None:
+        info.update({'metodo': metodo, 'controle': controle, 'fatoresCarga': fatores,
+                     'iteracoes': iteracoes, 'fatoracoes': sistema.fatoracoes, 'caminho': caminho})
+
+    # Reações: forças internas menos as cargas aplicadas nos graus de liberdade restringidos
+    Rg = np.zeros(estrutura['nGLs'])
+    Rg[GLsrest] = esforcos['Fint'][GLsrest] - Fest[GLsrest]
+    defos = esforcos['defos']
+    tenss = estrutura['Es']*defos
+    return cal.dicionariosResultados(estrutura, Ug, Rg, defos, tenss, estrutura['As']*tenss)
+
+def _convergiu(R, Fu, tol):
+    return np.linalg.norm(R) <= tol*max(np.linalg.norm(Fu), np.finfo(float).tiny)
+
+def _equilibrio(sistema, Ug, esforcos, Fu, metodo, tol, maxIter, iterTangente):
+    '''
+    Iterações de equilíbrio com o fator de carga fixo, a partir de Ug. A
+    tangente é refeita no estado de cada iteração (newton) ou somente após iterTangente
+    iterações sem convergência ou quando o resíduo cresce (newton-modificado e bfgs).
+
+    Saída
+    -----
+        * Ug, esforcos: o estado em equilíbrio;
+        * nIter: a quantidade de iterações.
+    '''
+    GLslivr = sistema.estrutura['GLslivr']
+    Ug = Ug.copy()
+    pares = [] #pares (s, y, ρ) do BFGS
+    R = Fu - esforcos['Fint'][GLslivr]
+    semNovaTangente = 0
+    for nIter in range(maxIter + 1):
+        if _convergiu(R, Fu, tol):
+            return Ug, esforcos, nIter
+        if nIter == maxIter:
+            break
+
+        if metodo == 'newton':
+            if sistema.fatorado is not esforcos:
+                sistema.fatora(esforcos)
+        elif semNovaTangente >= iterTangente:
+            sistema.fatora(esforcos)
+            pares, semNovaTangente = [], 0
+        semNovaTangente += 1
+
+        dU = _bfgs(sistema, pares, R) if metodo == 'bfgs' else sistema.resolver(R)
+        Ug[GLslivr] += dU
+        esforcos = sistema.esforcos(Ug)
+        Rnovo = Fu - esforcos['Fint'][GLslivr]
+
+        #atualização BFGS com o passo dU e a variação das forças internas
+        if metodo == 'bfgs':
+            y = R - Rnovo
+            sy = dU @ y
+            if sy > 1e-12*np.linalg.norm(dU)*np.linalg.norm(y):
+                pares.append((dU, y, 1./sy))
+        
+        #resíduo crescente: a tangente reaproveitada é refeita na próxima iteração
+        if np.linalg.norm(Rnovo) > np.linalg.norm(R):
+            semNovaTangente = iterTangente
+        R = Rnovo
+    raise RuntimeError(f'O equilíbrio não convergiu em {maxIter} iterações! ' +\
+                       'Aumente passos ou maxIter, ou use metodo=newton ou controle=arco.')
+
+def _bfgs(sistema, pares, R):
+    '''
+    Direção BFGS H·R pela recursão de dois laços, com H₀ = Kt⁻¹ da fatoração atual.
+    '''
+    q = R.copy()
+    alfas = []
+    for s, y, rho in reversed(pares):
+        alfa = rho*(s @ q)
+        q -= alfa*y
+        alfas.append(alfa)
+    z = sistema.resolver(q)
+    for (s, y, rho), alfa in zip(pares, reversed(alfas)):
+        z += s*(alfa - rho*(y @ z))
+    return z
+
+def _comprimentoArco(sistema, Ug, esforcos, Fu, passos, atualiza, tol, maxIter, iterTangente, maxPassos,
+                     fatores, iteracoes, caminho):
+    '''
+    Comprimento de arco cilíndrico de Crisfield até o fator de carga 1, seguido
+    de uma correção com o fator de carga 1. Com atualiza=False, a tangente do
+    início do incremento é reaproveitada nas iterações e nos incrementos
+    seguintes, e só é refeita quando o incremento demora mais de iterTangente
+    iterações. Incrementos sem convergência são repetidos com metade do arco.
+    '''
+    GLslivr = sistema.estrutura['GLslivr']
+    lam = 0.
+    dUt = sistema.resolver(Fu)
+    arco = arcoMax = np.linalg.norm(dUt)/passos
+    arcoMax *= 4 #limite do crescimento do arco, para não saltar ramos do caminho
+    DUanterior = None
+    semNovaTangente = 0
+
+    for _ in range(maxPassos):
+        # Preditor na direção tangente, no sentido do incremento anterior
+        if semNovaTangente >= iterTangente or (atualiza and sistema.fatorado is not esforcos):
+            sistema.fatora(esforcos)
+            semNovaTangente = 0
+        dUt = sistema.resolver(Fu)
+        sinal = 1. if DUanterior is None or dUt @ DUanterior >= 0 else -1.
+        DU = sinal*arco/np.linalg.norm(dUt)*dUt
+        Dlam = sinal*arco/np.linalg.norm(dUt)
+
+        # Corretor com a restrição ‖ΔU‖ = arco
+        convergiu = False
+        for nIter in range(1, maxIter + 1):
+            Ui = Ug.copy()
+            Ui[GLslivr] += DU
+            esforcosI = sistema.esforcos(Ui)
+            R = (lam + Dlam)*Fu - esforcosI['Fint'][GLslivr]
+            if _convergiu(R, Fu, tol):
+                convergiu = True
+                break
+            if atualiza:
+                sistema.fatora(esforcosI)
+                dUt = sistema.resolver(Fu)
+            semNovaTangente += 1
+            dUr = sistema.resolver(R)
+
+            # Raiz da equação do 2º grau em δλ mais próxima do incremento atual
+            a = dUt @ dUt
+            b = 2*dUt @ (DU + dUr)
+            c = (DU + dUr) @ (DU + dUr) - arco**2
+            delta = b*b - 4*a*c
+            if delta < 0:
+                break
+            raizes = (-b + np.array([1., -1.])*np.sqrt(delta))/(2*a)
+            candidatos = [DU + dUr + r*dUt for r in raizes]
+            escolha = int(np.argmax([cand @ DU for cand in candidatos]))
+            DU, Dlam = candidatos[escolha], Dlam + raizes[escolha]
+
+        if not convergiu:
+            #repete o incremento com metade do arco e nova tangente
+            arco /= 2
+            semNovaTangente = iterTangente
+            if arco < 1e-12*np.linalg.norm(Ug):
+                break
+            continue
+
+        # Incremento aceito e novo arco conforme as iterações gastas
+        Ug, esforcos, DUanterior = Ui, esforcosI, DU
+        if semNovaTangente < iterTangente:
+            #a contagem vale para um incremento: só um incremento lento pede nova tangente
+            semNovaTangente = 0
+        lam += Dlam
+        fatores.append(lam)
+        iteracoes.append(nIter)
+        caminho.append((lam, Ug.copy()))
+        alvo = 4. if atualiza else float(iterTangente) #iterações desejadas por incremento
+        arco = min(arco*min(2., max(0.5, np.sqrt(alvo/max(nIter, 1)))), arcoMax)
+        if lam >= 1.:
+            # Correção final com o fator de carga 1 a partir do estado atual
+            Ug, esforcos, nIter = _equilibrio(sistema, Ug, esforcos, Fu, 'newton', tol, maxIter, iterTangente)
+            fatores.append(1.)
+            iteracoes.append(nIter)
+            caminho.append((1., Ug.copy()))
+            return Ug, esforcos
+    raise RuntimeError(f'O comprimento de arco não alcançou a carga total em {maxPassos} incrementos! ' +\
+                       'Aumente maxPassos ou passos.')
@@ -7,9 +7,14 @@ Módulo para a implementação dos procedimentos de cálculo de elementos finito
 """
 import numpy as np
 import funcoesAuxiliares as fa
+import solucionadores as sol
+import instrumentacao as ins
+import cacheTrelica as cac
 
 # Definição da função de solução
-def calculoTrelicaPlana(coordNos, incElems, materiais, secoes, cargas, apoios):
+def calculoTrelicaPlana(coordNos, incElems, materiais, secoes, cargas, apoios, esparsa=None,
+                        solucionador=None, opcoesSolucionador=None, info=None, renumerar=None,
+                        estatisticas=None, cache=None):
     '''
     Função para a solução de quaisquer treliças planas lineares pelo método dos
     elementos finitos conforme os argumentos que são os dados de entrada.
@@ -22,6 +27,34 @@ def calculoTrelicaPlana(coordNos, incElems, materiais, secoes, cargas, apoios):
         * seções transversais das barras: secoes
         * cargas dos nós da estrutura: cargas
         * apoios dos nós da estrutura: apoios
+        * montagem esparsa da matriz de rigidez (opcional): esparsa
+        * solucionador do sistema (opcional): solucionador, 'densa', 'cholesky',
+          'lu', 'gc' ou 'banda'
+        * opções do solucionador (opcional): opcoesSolucionador, dicionário com
+          tol, maxiter e precondicionador ('jacobi' ou 'ic') para o 'gc' e
+          tolPivo, o limite relativo dos pivôs nulos, para os métodos diretos
+        * relatório do solucionador (opcional): info, dicionário preenchido com o
+          solucionador, o backend, os tempos e as iterações
+        * renumeração dos graus de liberdade (opcional): renumerar, ordem reversa
+          de Cuthill-McKee dos nós para reduzir a banda de Ku, mantida a numeração
+          original se a banda não diminuir; a banda e o perfil antes e depois e
+          renumerado (se a nova ordem foi usada) vão para info
+        * instrumentação (opcional): estatisticas, uma ins.Estatisticas ou uma 
+          função callback(fase, dados) que recebe o tempo de cada fase, as 
+          alocações, as quantidades de graus de liberdade e de termos não nulos e
+          o resíduo da solução e, se pedida, a sua condição (instrumentacao.py)
+        * cache em disco (opcional): cache, uma cac.CacheTrelica ou o caminho do
+          seu diretório; as entradas idênticas a uma solução anterior devolvem os
+          resultados guardados e as que mudam somente as cargas reaproveitam a
+          estrutura montada (e, no mesmo processo, a fatoração) (cacheTrelica.py)
+    
+    Com esparsa=True a matriz de rigidez da estrutura é montada no formato CSR a
+    partir dos tripletos de todos os elementos, e a memória passa a depender do
+    número de barras e não do quadrado do número de graus de liberdade.
+    
+    Sem solucionador, usa-se a solução densa (a original) e, com esparsa=True, o
+    Cholesky esparso; sem esparsa, a montagem é esparsa para qualquer
+    solucionador que não seja o denso.
     
     Saída
     -----
@@ -31,210 +64,639 @@ def calculoTrelicaPlana(coordNos, incElems, materiais, secoes, cargas, apoios):
         * tensões nos elementos da estrutura: tensoes
         * esforços normais nos elementos da estrutura: normais
     
+    '''
+    if cache is not None:
+        return cac.calculoComCache(cache, coordNos, incElems, materiais, secoes, cargas, apoios, esparsa,
+                                   solucionador, opcoesSolucionador, info, renumerar, estatisticas)
+    
+    # Escolha do solucionador, do formato da matriz de rigidez e da renumeração
+    esparsa, solucionador, renumerar = escolheSolucionador(esparsa, solucionador, renumerar)
+    est = ins.estatisticas(estatisticas)
+    
+    # Montagem da estrutura: geometria, matriz de rigidez e partição
+    estrutura = montaEstrutura(coordNos, incElems, materiais, secoes, apoios, esparsa, renumerar, est)
+    GLslivr, GLsrest = estrutura['GLslivr'], estrutura['GLsrest']
+    
+    ### RESOLUÇÃO E SEPARAÇÃO -----------------------------------------------------
+    # Cálculo dos deslocamentos, reações de apoio e separação da solução nos elementos
+    
+    # Montagem do vetor de forças nodais da estrutura e separação para cálculo dos
+    # deslocamentos das reações de apoio
+    est.marca('forcas')
+    Fest = fa.vetorForcas(estrutura['posNos'], cargas, estrutura['nGLs'])
+    Fu = Fest[GLslivr]
+    Fr = Fest[GLsrest]
+    est.aloca(Fest=Fest)
+    
+    # Determinação dos deslocamentos com o solucionador escolhido
+    est.marca('fatoracao')
+    solver = sol.Solucionador(estrutura['Ku'], solucionador, **(opcoesSolucionador or {}))
+    est.marca('solucao')
+    Us = solver.resolver(Fu)
+    est.verificaSolucao(estrutura['Ku'], Us, Fu, solver)
+    if info is not None:
+        info.update(solver.relatorio(), **estrutura.get('banda', {}))
+    
+    # Determinação das reações de apoio
+    est.marca('reacoes')
+    Re = estrutura['Kr'] @ Us - Fr
+    
+    # Finalizando a função e retornado os resultados nos nós e nos elementos
+    est.marca('recuperacao')
+    resultados = resultadosEstrutura(estrutura, Us, Re)
+    est.finaliza()
+    return resultados
+
+def escolheSolucionador(esparsa=None, solucionador=None, renumerar=None):
+    '''
+    Função para a escolha padrão do solucionador, do formato da matriz de 
+    rigidez e da renumeração: sem solucionador, usa-se a solução densa (a 
+    original) e, com esparsa=True, o Cholesky esparso; sem esparsa, a montagem é
+    esparsa para qualquer solucionador que não seja o denso; sem renumerar, a 
+    renumeração de Cuthill-McKee é feita somente para o solucionador em banda.
+    '''
+    if solucionador is None:
+        solucionador = 'cholesky' if esparsa else 'densa'
+    if esparsa is None:
+        esparsa = solucionador != 'densa'
+    if renumerar is None:
+        renumerar = solucionador == 'banda'
+    return esparsa, solucionador, renumerar
+
+def montaEstrutura(coordNos, incElems, materiais, secoes, apoios, esparsa=False, renumerar=False,
+                   estatisticas=None):
+    '''
+    Função para a montagem da estrutura independente das cargas: geometria dos 
+    elementos, matriz de rigidez e sua separação nos graus de liberdade livres e 
+    restringidos. É a parte de calculoTrelicaPlana que pode ser reutilizada para
+    vários carregamentos. Antes da montagem, a estabilidade é verificada com 
+    fa.verificaEstabilidade, que lança um ValueError com os nós e elementos dos
+    mecanismos ou dos apoios insuficientes.
+    
+    Entrada
+    -------
+        * coordNos, incElems, materiais, secoes, apoios: como em calculoTrelicaPlana;
+        * esparsa: montagem da matriz de rigidez no formato esparso CSR;
+        * renumerar: renumeração de Cuthill-McKee dos graus de liberdade livres;
+        * estatisticas: instrumentação, como em calculoTrelicaPlana.
+    
+    Saída
+    -----
+        * estrutura: dicionário de montaEstruturaArrays acrescido da numeração dos
+          nós (posNos), dos rótulos dos elementos (elems) e das incidências (incElems).
+    
+    '''
+    est = ins.estatisticas(estatisticas)
+    
+    # Entradas em arrays, partição e verificação da estabilidade
+    entrada = entradaEstrutura(coordNos, incElems, materiais, secoes, apoios, est)
+    
+    estrutura = montaEstruturaArrays(entrada['coords'], entrada['conect'], entrada['Es'], entrada['As'],
+                                     entrada['GLslivr'], entrada['GLsrest'], esparsa, renumerar, est)
+    estrutura.update(posNos=entrada['posNos'], elems=entrada['elems'], incElems=incElems)
+    return estrutura
+
+def entradaEstrutura(coordNos, incElems, materiais, secoes, apoios, estatisticas=None):
+    '''
+    Função para a conversão dos dicionários de entrada em arrays e a verificação
+    da estabilidade, sem a montagem da matriz de rigidez: a primeira parte de
+    montaEstrutura, usada também pelas análises que montam as suas próprias
+    matrizes (calculoNaoLinear.py).
+    
+    Saída
+    -----
+        * entrada: dicionário com a numeração dos nós (posNos), as coordenadas
+          (coords), a conectividade (conect), os módulos de elasticidade (Es), as
+          áreas (As), a quantidade de graus de liberdade (nGLs), os graus de
+          liberdade livres e restringidos (GLslivr, GLsrest), os rótulos dos
+          elementos (elems) e as incidências (incElems).
+    
+    '''
+    est = ins.estatisticas(estatisticas)
+    
+    # Numeração dos nós, criada uma única vez, e coordenadas na ordem de coordNos
+    est.marca('entrada')
+    posNos = fa.numeracaoNos(coordNos)
+    coords = np.array(list(coordNos.values()), dtype=float).reshape(-1, 2)
+    
+    # Conectividade dos elementos pelas posições dos nós inicial e final
+    conect, _ = fa.indexadoresElems(posNos, incElems)
+    
+    # Levantando os dados de material e seção dos elementos
+    Es = np.array([materiais[elem] for elem in incElems], dtype=float) #módulos de elasticidade
+    As = np.array([secoes[elem] for elem in incElems], dtype=float) #áreas das seções transversais
+    
+    # Definição dos graus de liberdade livres e restringidos já pythonizados: inicia em zero
+    GLslivr, GLsrest = fa.particionaGLs(posNos, apoios, 2*len(coordNos))
+    
+    # Verificação rápida de mecanismos e apoios insuficientes antes da montagem
+    est.marca('estabilidade')
+    restritos = np.zeros(2*len(coordNos), dtype=bool)
+    restritos[GLsrest] = True
+    fa.verificaEstabilidade(coords, conect, restritos.reshape(-1, 2), list(coordNos), list(incElems))
+    
+    return {'posNos': posNos, 'coords': coords, 'conect': conect, 'Es': Es, 'As': As,
+            'nGLs': 2*len(coordNos), 'GLslivr': GLslivr, 'GLsrest': GLsrest,
+            'elems': list(incElems), 'incElems': incElems}
+
+def montaEstruturaArrays(coords, conect, Es, As, GLslivr, GLsrest, esparsa=False, renumerar=False,
+                         estatisticas=None, guardaKrr=False):
+    '''
+    Função para a montagem da estrutura a partir dos dados já em arrays, sem 
+    nenhum dicionário de entrada: é o núcleo de montaEstrutura e do ModeloTrelica.
+    
+    Entrada
+    -------
+        * coords: array (nNos, 2) com as coordenadas dos nós;
+        * conect: array (nElems, 2) com as posições dos nós inicial e final dos elementos;
+        * Es: array (nElems,) com os módulos de elasticidade;
+        * As: array (nElems,) com as áreas das seções transversais;
+        * GLslivr, GLsrest: arrays com os graus de liberdade livres e restringidos;
+        * esparsa: montagem da matriz de rigidez no formato esparso CSR;
+        * renumerar: reordenação dos graus de liberdade livres pela ordem reversa
+          de Cuthill-McKee dos nós, usada somente se reduzir a semibanda de Ku.
+          Ku é montada nessa ordem e, como GLslivr guarda a ordem, os resultados
+          voltam aos nós sem nenhuma conversão;
+        * estatisticas: instrumentação, como em calculoTrelicaPlana;
+        * guardaKrr: guarda também a parte Krr (restringidos × restringidos) da
+          matriz de rigidez, para a condensação estática.
+    
+    Saída
+    -----
+        * estrutura: dicionário com os indexadores (indis), a conectividade 
+          (conect), os comprimentos, senos e cossenos (comps, sens, coss), os 
+          módulos e áreas (Es, As), a quantidade de graus de liberdade (nGLs), os
+          graus de liberdade livres e restringidos (GLslivr, GLsrest), as partes
+          Ku e Kr da matriz de rigidez e, com a renumeração, a banda e o perfil de
+          Ku antes e depois da ordem de Cuthill-McKee e se ela foi usada 
+          (banda, com bandaAntes, perfilAntes, bandaDepois, perfilDepois e
+          renumerado).
+    
     '''
     ### MALHA DE ELEMENTOS FINITOS ------------------------------------------------
     # Determinação dos comprimentos, cossenos, senos e matrizes de rigidez dos 
-    # elementos e armazenamendo em dicionários
-    
-    # Criação dos dicionários vazios
-    comps = {} #comprimentos
-    sens = {} #senos
-    coss = {} #cossenos
-    kegs = {} #matrizes de rigidez
-    
-    # Correndo um laço nos elementos
-    for elem in incElems:
-        #buscando as coordenadas dos nós inicial e final
-        xi, yi = coordNos[incElems[elem][0]]
-        xj, yj = coordNos[incElems[elem][1]]
-        
-        #calculando o comprimento, seno e cosseno
-        comp, sen, cos = fa.compSenCos(xi, xj, yi, yj)
-        
-        #armazenando os valores calculados para o respectivo elemento
-        comps[elem] = comp
-        sens[elem] = sen
-        coss[elem] = cos
-        
-        #levantando os dados de material e seção do elemento
-        mat = materiais[elem] #módulo de elasticidade
-        sec = secoes[elem] #área da seção transversal
-        
-        #calculado a matriz de rigidez do elemento
-        keg = fa.matRig_TP(mat, sec, comp, sen, cos)
-        
-        #armazenando a matriz de rigidez do respectivo elemento
-        kegs[elem] = keg
+    # elementos de uma só vez, armazenados em arrays na ordem dos elementos
+    est = ins.estatisticas(estatisticas)
+    est.marca('geometria')
+    
+    # Indexadores dos graus de liberdade de cada elemento, já pythonizados
+    indis = fa.indexadoresConect(conect)
+    
+    # Calculando os comprimentos, senos e cossenos
+    comps, sens, coss = fa.compSenCosLote(coords, conect)
+    
+    # Calculando as matrizes de rigidez dos elementos
+    kegs = fa.matRig_TPLote(Es, As, comps, sens, coss)
+    est.aloca(kegs=kegs)
     
     
     ### ELEMENTOS FINITOS DA ESTRUTURA --------------------------------------------
-    # Criação automática dos indexadores para cada elemento, montagem da matriz
-    # de rigidez da estrutura, do vetor de forças nodais da estrutura e a
-    # criação dos graus de liberdade livres e restringidos
+    # Montagem da matriz de rigidez da estrutura com os indexadores de cada 
+    # elemento e separação da matriz de rigidez
     
     # Determinando a quantidade de graus de liberdade totais da estrutura
-    nGLs = len(coordNos)*2 #2 graus de liberdade por nó da estrutura
+    nGLs = len(coords)*2 #2 graus de liberdade por nó da estrutura
     
-    # Criando um dicionário vazio para o armazenamento dos indexadores
-    indis = {}
+    # Montagem da matriz da estrutura com as matrizes dos elementos nas posições
+    # dos indexadores
+    est.marca('montagem')
+    if esparsa:
+        Kest = fa.montaRigidezEsparsa(indis, kegs, nGLs)
+    else:
+        Kest = fa.montaRigidezDensa(indis, kegs, nGLs)
+    est.aloca(Kest=Kest)
     
-    # Inicializando o a matriz de rigidez e o vetor de forças nodais com zeros
-    Kest = np.zeros((nGLs, nGLs))
-    Fest = np.zeros(nGLs)
+    # Separação da matriz de rigidez para o cálculo dos deslocamentos das reações 
+    # de apoio
+    est.marca('particao')
+    if esparsa:
+        Ku, Kr = fa.particionaRigidezEsparsa(Kest, GLslivr, GLsrest)
+    else:
+        Ku = Kest[:, GLslivr]
+        Ku = Ku[GLslivr, :]
+
+        Kr = Kest[:, GLslivr]
+        Kr = Kr[GLsrest, :]
     
-    # Montagem da matriz da estrutura com as matrizes dos elementos
-    # Criação da listagem dos nós para a obtenção das posições
-    nosList = list(coordNos.keys())
-    for elem in incElems:
-        #busca dos nós inicial e final
-        noi, noj = incElems[elem]
-        
-        #definição das posições dos nós: deve iniciar em 1
-        posi = nosList.index(noi) + 1
-        posj = nosList.index(noj) + 1
-        
-        #criação dos indexadores
-        indi = np.array([2*posi - 1,
-                         2*posi,
-                         2*posj - 1,
-                         2*posj]) - 1 #já pythonizado: inicia em 0
-        #armazenando o indexados para o respectivo elemento
-        indis[elem] = indi
-        
-        #montagem da matriz de rigidez da estrutura
-        for lin in range(4): #4 linhas na matriz de rigidez de cada elemento
-            for col in range(4): #4 colunas na matriz de rigidez de cada elemento
-                #gerando a matriz de rigidez da estrutura
-                Kest[ indi[lin], indi[col] ] += kegs[elem][lin, col]
-
-    # Montagem do etor de forças nodais da estrutura
-    for no in cargas:
-        #posicionamento correto das cargas já pythonizado no índice: inicia em 0
-        Fest[ 2*(nosList.index(no) + 1) - 2 ] += cargas[no][0]
-        Fest[ 2*(nosList.index(no) + 1) - 1 ] += cargas[no][1]
+    # Renumeração dos graus de liberdade livres para reduzir a banda de Ku: a 
+    # ordem de Cuthill-McKee só é usada se reduzir a semibanda da numeração
+    # original, e Ku e Kr são permutadas sem uma nova partição de Kest
+    if renumerar:
+        GLsRCM = fa.renumeraGLs(GLslivr, fa.ordemRCM(conect, len(coords)))
+        ordemRCM = np.empty(nGLs, dtype=np.intp)
+        ordemRCM[GLsRCM] = np.arange(len(GLsRCM))
+        posicoes = ordemRCM[GLslivr] #posição de cada linha de Ku na ordem de Cuthill-McKee
+        bandaAntes, perfilAntes = sol.perfilBanda(Ku)
+        bandaDepois, perfilDepois = sol.perfilBanda(Ku, posicoes)
+        renumerado = bandaDepois < bandaAntes
+        if renumerado:
+            permutacao = np.argsort(posicoes)
+            GLslivr = GLsRCM
+            Ku = Ku[permutacao][:, permutacao] if esparsa else Ku[np.ix_(permutacao, permutacao)]
+            Kr = Kr[:, permutacao]
+    if est.ativa:
+        est.aloca(Ku=Ku, Kr=Kr)
+        est.conta(nNos=len(coords), nElems=len(conect), nGLs=nGLs, nGLsLivres=len(GLslivr),
+                  nGLsRestringidos=len(GLsrest), nnzKu=int(Ku.nnz if esparsa else np.count_nonzero(Ku)))
+
+    estrutura = {'conect': conect, 'indis': indis,
+                 'comps': comps, 'sens': sens, 'coss': coss, 'Es': Es, 'As': As,
+                 'nGLs': nGLs, 'GLslivr': GLslivr, 'GLsrest': GLsrest, 'Ku': Ku, 'Kr': Kr}
+    if guardaKrr:
+        estrutura['Krr'] = Kest[GLsrest][:, GLsrest] if esparsa else Kest[np.ix_(GLsrest, GLsrest)]
     
-    # Definição dos graus de liberdade livres e restringidos já pythonizados: inicia em zero
-    # Criação de listas vazias para o armazenamento de valores
-    GLslivr = []
-    GLsrest = []
-    
-    #correndo em todos os nós
-    for no in coordNos:
-        #buscando se existe algum apoio no nó e armazenando se o grau de liberdade
-        #restringido ou livre
-        if no in apoios.keys():
-            restX = apoios[no][0]
-            restY = apoios[no][1]
-            if restX == 1:
-                GLsrest.append(2*(nosList.index(no) + 1) - 2)
-            elif restX == 0:
-                GLslivr.append(2*(nosList.index(no) + 1) - 2)
-            else:
-                raise ValueError('Somente graus de liberdade livres ou ' +\
-                                 'restringidos em X! Verifique as entradas em apoio.')
-            if restY == 1:
-                GLsrest.append(2*(nosList.index(no) + 1) - 1)
-            elif restY == 0:
-                GLslivr.append(2*(nosList.index(no) + 1) - 1)
-            else:
-                raise ValueError('Somente graus de liberdade livres ou ' +\
-                                 'restringidos em Y! Verifique as entradas em apoio.')
-        #caso não exista armazena os graus de liberdade livres do nó
-        else:
-            GLslivr.append(2*(nosList.index(no) + 1) - 2)
-            GLslivr.append(2*(nosList.index(no) + 1) - 1)
+    # Banda e perfil de Ku na numeração original e na de Cuthill-McKee
+    if renumerar:
+        estrutura['banda'] = {'bandaAntes': bandaAntes, 'perfilAntes': perfilAntes,
+                              'bandaDepois': bandaDepois, 'perfilDepois': perfilDepois,
+                              'renumerado': bool(renumerado)}
+    return estrutura
+
+def resultadosEstrutura(estrutura, Us, Re):
+    '''
+    Função para a separação da solução nos nós e nos elementos no formato de 
+    dicionários de calculoTrelicaPlana: os resultados são calculados de uma só 
+    vez em arrays por recuperaResultados e cada nó é escrito uma única vez.
     
-    ### RESOLUÇÃO E SEPARAÇÃO -----------------------------------------------------
-    # Cálculo dos deslocamentos, reações de apoio e separação da solução nos elementos
+    Entrada
+    -------
+        * estrutura: dicionário criado por montaEstrutura;
+        * Us: deslocamentos dos graus de liberdade livres;
+        * Re: reações de apoio dos graus de liberdade restringidos.
     
-    # Separação da matriz de rigidez para o cálculo dos deslocamentos das reações 
-    # de apoio
-    Ku = Kest[:, GLslivr]
-    Ku = Ku[GLslivr, :]
+    Saída
+    -----
+        * UXY, RXY, defos, tenss, norms: como em calculoTrelicaPlana.
+    
+    '''
+    return dicionariosResultados(estrutura, *recuperaResultados(estrutura, Us, Re))
 
-    Kr = Kest[:, GLslivr]
-    Kr = Kr[GLsrest, :]
+def dicionariosResultados(estrutura, Ug, Rg, defos, tenss, norms):
+    '''
+    Função para a conversão dos resultados em arrays de recuperaResultados (de um
+    único caso) para os dicionários de calculoTrelicaPlana: os deslocamentos e as
+    reações, em tuplas (X, Y), são associados aos nós dos elementos, na ordem em
+    que aparecem nas incidências, e as deformações, tensões e esforços normais 
+    aos elementos.
+    '''
+    posicoes, rotulos = nosResultados(estrutura)
+    
+    # Deslocamentos e reações (X, Y) dos nós, com as tuplas criadas pelas colunas
+    # convertidas de uma só vez com tolist
+    UXY = Ug.reshape(-1, 2)[posicoes]
+    UXY = dict(zip(rotulos, zip(UXY[:, 0].tolist(), UXY[:, 1].tolist())))
+    RXY = Rg.reshape(-1, 2)[posicoes]
+    RXY = dict(zip(rotulos, zip(RXY[:, 0].tolist(), RXY[:, 1].tolist())))
+    
+    # Deformações, tensões e esforços normais dos elementos
+    elems = estrutura['elems']
+    defos = dict(zip(elems, np.asarray(defos).tolist()))
+    tenss = dict(zip(elems, np.asarray(tenss).tolist()))
+    norms = dict(zip(elems, np.asarray(norms).tolist()))
+    
+    return UXY, RXY, defos, tenss, norms
 
-    # Separação do vetor de forças nodais para cálculo dos deslocamentos das reações 
-    # de apoio
-    Fu = Fest[GLslivr]
-    Fr = Fest[GLsrest]
+def nosResultados(estrutura):
+    '''
+    Função para as posições e os rótulos dos nós que aparecem nos elementos, cada
+    um uma única vez e na ordem das incidências, calculados na primeira chamada e
+    guardados na estrutura para as soluções seguintes.
+    '''
+    if 'nosResultados' not in estrutura:
+        conect = estrutura['conect'].ravel()
+        _, primeiros = np.unique(conect, return_index=True)
+        posicoes = conect[np.sort(primeiros)]
+        nos = list(estrutura['posNos'])
+        estrutura['nosResultados'] = (posicoes, [nos[pos] for pos in posicoes.tolist()])
+    return estrutura['nosResultados']
+
+def recuperaResultados(estrutura, Us, Re):
+    '''
+    Função para a recuperação dos resultados em arrays, sem dicionários: monta os
+    vetores completos de deslocamentos e reações e calcula as deformações, 
+    tensões e esforços normais de todos os elementos de uma só vez.
+    
+    Entrada
+    -------
+        * estrutura: dicionário criado por montaEstrutura ou montaEstruturaArrays;
+        * Us: deslocamentos dos graus de liberdade livres, (nLivr,) ou (nLivr, nCasos);
+        * Re: reações de apoio dos graus de liberdade restringidos, (nRest,) ou (nRest, nCasos).
     
-    # Determinação dos deslocamentos
-    Us = np.linalg.solve(Ku, Fu)
+    Saída
+    -----
+        * Ug: deslocamentos de todos os graus de liberdade, (nGLs,) ou (nGLs, nCasos);
+        * Rg: reações de todos os graus de liberdade, (nGLs,) ou (nGLs, nCasos);
+        * defos, tenss, norms: deformações, tensões e esforços normais dos 
+          elementos, (nElems,) ou (nElems, nCasos).
     
-    # Determinação das reações de apoio
-    Re = np.matmul(Kr, Us) - Fr
-    
-    # Montagem do vetor de deslocamentos completo: com os deslocamentos iguais a zero
-    Ug = np.zeros(nGLs)
-    Ug[GLslivr] = Us
-    
-    # Montagem do vetor de reações completo: com as reações iguais a zero
-    Rg = np.zeros(nGLs)
-    Rg[GLsrest] = Re
-    
-    # Convertendo os deslocamentos para o formato (deslocamento X, deslocamento U) e
-    # associando ao respectivo nó, as reações para (reação X, reação Y) e associando
-    # ao respectivo nó e criando os vetores de deslocamentos dos elementos usando 
-    # os indexadores e a matriz de decomposição iniciando com um dicionários vazios
-    # para armazenamento
-    UXY = {}
-    RXY = {}
-    ues = {}
-    for elem in incElems:
-        #separando os deslocamentos no elemento no sistema global
-        ug = Ug[indis[elem]] #deslocamentos no elemento
+    '''
+    Us = np.asarray(Us, dtype=float)
+    casos = Us.shape[1:]
+    
+    # Vetores completos com os valores iguais a zero nos demais graus de liberdade
+    Ug = np.zeros((estrutura['nGLs'],) + casos)
+    Ug[estrutura['GLslivr']] = Us
+    Rg = np.zeros((estrutura['nGLs'],) + casos)
+    Rg[estrutura['GLsrest']] = Re
+    
+    # Deslocamentos dos elementos com um único índice e projeção no eixo da barra
+    forma = (-1,) + (1,)*len(casos)
+    ue = Ug[estrutura['indis']] #(nElems, 4, ...)
+    alongs = estrutura['coss'].reshape(forma)*(ue[:, 2] - ue[:, 0]) +\
+             estrutura['sens'].reshape(forma)*(ue[:, 3] - ue[:, 1])
+    
+    # Deformações, tensões e esforços normais
+    defos = alongs/estrutura['comps'].reshape(forma)
+    tenss = estrutura['Es'].reshape(forma)*defos
+    norms = estrutura['As'].reshape(forma)*tenss
+    
+    return Ug, Rg, defos, tenss, norms
+
+def calculoTrelicaPlanaCasos(coordNos, incElems, materiais, secoes, casos, apoios, esparsa=None,
+                             solucionador=None, opcoesSolucionador=None, info=None,
+                             renumerar=None, estatisticas=None):
+    '''
+    Função para a solução de uma treliça plana linear para vários casos de carga
+    de uma só vez: a estrutura é montada e a matriz Ku é fatorada uma única vez,
+    e todos os vetores de forças são resolvidos como um bloco.
+    
+    Entrada
+    -------
+        * coordNos, incElems, materiais, secoes, apoios: como em calculoTrelicaPlana;
+        * casos de carga: casos, dicionário com o nome do caso como chave e o 
+          dicionário de cargas do caso (no formato de cargas) como valor, ou uma
+          matriz (nGLs, nCasos) com as forças nodais de cada caso nos graus de 
+          liberdade da estrutura (2p para X e 2p + 1 para Y do nó na posição p de 
+          coordNos), cujos casos são nomeados 0, 1, 2..., ou um vetor (nGLs,) 
+          para um único caso;
+        * esparsa, solucionador, opcoesSolucionador, info, renumerar, estatisticas:
+          como em calculoTrelicaPlana.
+    
+    Saída
+    -----
+        * resultados: dicionário com o nome do caso como chave e a tupla 
+          (deslocamentos, RXY, deformacoes, tensoes, normais) como valor.
+    
+    '''
+    # Escolha do solucionador, do formato da matriz de rigidez e da renumeração
+    esparsa, solucionador, renumerar = escolheSolucionador(esparsa, solucionador, renumerar)
+    est = ins.estatisticas(estatisticas)
+    
+    # Montagem da estrutura uma única vez para todos os casos
+    estrutura = montaEstrutura(coordNos, incElems, materiais, secoes, apoios, esparsa, renumerar, est)
+    
+    # Matriz de forças nodais com um caso por coluna
+    est.marca('forcas')
+    if isinstance(casos, dict):
+        nomes = list(casos)
+        Fest = np.zeros((estrutura['nGLs'], len(nomes)))
+        for j, nome in enumerate(nomes):
+            Fest[:, j] = fa.vetorForcas(estrutura['posNos'], casos[nome], estrutura['nGLs'])
+    else:
+        Fest = np.asarray(casos, dtype=float)
+        if Fest.ndim == 1 and len(Fest) == estrutura['nGLs']:
+            Fest = Fest[:, None] #um único caso
+        elif Fest.ndim != 2 or Fest.shape[0] != estrutura['nGLs']:
+            raise ValueError(f'A matriz de forças deve ter a forma ({estrutura["nGLs"]}, nCasos) ou ' +\
+                             f'({estrutura["nGLs"]},), e não {Fest.shape}! Verifique as entradas em casos.')
+        nomes = list(range(Fest.shape[1]))
+    est.aloca(Fest=Fest)
+    est.conta(nCasos=len(nomes))
+    
+    # Fatoração única e solução de todos os casos em bloco
+    est.marca('fatoracao')
+    solver = sol.Solucionador(estrutura['Ku'], solucionador, **(opcoesSolucionador or {}))
+    est.marca('solucao')
+    Fu = Fest[estrutura['GLslivr'], :]
+    Us = solver.resolver(Fu)
+    est.verificaSolucao(estrutura['Ku'], Us, Fu, solver)
+    est.marca('reacoes')
+    Re = estrutura['Kr'] @ Us - Fest[estrutura['GLsrest'], :]
+    if info is not None:
+        info.update(solver.relatorio(), **estrutura.get('banda', {}))
+    
+    # Recuperação dos resultados de todos os casos de uma só vez e separação
+    # de cada caso
+    est.marca('recuperacao')
+    Ug, Rg, defos, tenss, norms = recuperaResultados(estrutura, Us, Re)
+    resultados = {nome: dicionariosResultados(estrutura, Ug[:, j], Rg[:, j], defos[:, j],
+                                             tenss[:, j], norms[:, j])
+                  for j, nome in enumerate(nomes)}
+    est.finaliza()
+    return resultados
+
+class ModeloPreparado:
+    '''
+    Classe para as soluções repetidas de uma mesma estrutura com cargas 
+    diferentes, como nas cargas móveis e linhas de influência: a montagem e a 
+    fatoração de calculoTrelicaPlana são feitas uma única vez na criação e cada
+    chamada de resolver faz somente as substituições e a separação dos resultados.
+    
+    Os dicionários de entrada são guardados por referência junto com uma cópia
+    do seu conteúdo; se algum deles for alterado no próprio lugar, o modelo se
+    invalida e é preparado novamente na próxima solução.
+    
+    Entrada
+    -------
+        * coordNos, incElems, materiais, secoes, apoios: como em calculoTrelicaPlana;
+        * esparsa, solucionador, opcoesSolucionador, renumerar: como em calculoTrelicaPlana;
+        * verificar: verificação das alterações das entradas a cada solução.
+    
+    Atributos
+    ---------
+        * estrutura: dicionário criado por montaEstrutura;
+        * solver: o solucionador com a fatoração de Ku;
+        * preparacoes: quantidade de vezes que o modelo foi preparado;
+        * ultimaSolucao: 'woodbury' ou 'completa', conforme a última chamada de 
+          resolverAlterado.
+    
+    '''
+    def __init__(self, coordNos, incElems, materiais, secoes, apoios, esparsa=None,
+                 solucionador=None, opcoesSolucionador=None, verificar=True, renumerar=None):
+        self.entradas = (coordNos, incElems, materiais, secoes, apoios)
+        self.esparsa, self.solucionador, self.renumerar = escolheSolucionador(esparsa, solucionador,
+                                                                              renumerar)
+        self.opcoesSolucionador = opcoesSolucionador or {}
+        self.verificar = verificar
+        self.preparacoes = 0
+        self.ultimaSolucao = None
+        self.preparar()
+
+    def preparar(self):
+        '''
+        Montagem da estrutura e fatoração de Ku com as entradas atuais.
+        '''
+        self.estrutura = montaEstrutura(*self.entradas, self.esparsa, self.renumerar)
+        self.solver = sol.Solucionador(self.estrutura['Ku'], self.solucionador,
+                                       **self.opcoesSolucionador)
+        self.copias = copiaEntradas(*self.entradas)
+        self.preparacoes += 1
         
-        #separando as reações no elemento no sistema global
-        rg = Rg[indis[elem]] #reações no elemento
+        #posições das barras e dos graus de liberdade livres e restringidos
+        #para as soluções com barras alteradas
+        estrutura = self.estrutura
+        self.posElems = {elem: pos for pos, elem in enumerate(estrutura['elems'])}
+        self.mapaLivres = np.full(estrutura['nGLs'], -1)
+        self.mapaLivres[estrutura['GLslivr']] = np.arange(len(estrutura['GLslivr']))
+        self.mapaRest = np.full(estrutura['nGLs'], -1)
+        self.mapaRest[estrutura['GLsrest']] = np.arange(len(estrutura['GLsrest']))
+        nosResultados(estrutura) #nós dos dicionários de resultados, uma única vez
+
+    def valido(self):
+        '''
+        Verifica se as entradas continuam iguais às da preparação.
+        '''
+        return entradasIguais(self.entradas, self.copias)
+
+    def resolver(self, cargas):
+        '''
+        Solução da estrutura preparada para o dicionário de cargas, com as saídas
+        de calculoTrelicaPlana.
+        '''
+        return dicionariosResultados(self.estrutura, *self.resolverArrays(cargas))
+
+    def resolverArrays(self, cargas):
+        '''
+        Solução da estrutura preparada para o dicionário de cargas com as saídas
+        em arrays de recuperaResultados (Ug, Rg, defos, tenss, norms), na ordem de
+        coordNos e de incElems, sem a conversão para dicionários: para os laços
+        das linhas de influência e das cargas móveis.
+        '''
+        if self.verificar and not self.valido():
+            self.preparar()
         
-        #armazenando os deslocamentos do elemento nos respetivos graus de liberdade
-        # X, Y dos respectivos nós
-        UXY[incElems[elem][0]] = (ug[0], ug[1]) #nó inicial
-        UXY[incElems[elem][1]] = (ug[2], ug[3]) #nó final
+        estrutura = self.estrutura
+        Fest = fa.vetorForcas(estrutura['posNos'], cargas, estrutura['nGLs'])
+        Us = self.solver.resolver(Fest[estrutura['GLslivr']])
+        Re = estrutura['Kr'] @ Us - Fest[estrutura['GLsrest']]
+        return recuperaResultados(estrutura, Us, Re)
+
+    def resolverAlterado(self, cargas, materiais=None, secoes=None, maxAlterados=None):
+        '''
+        Solução da estrutura com os materiais e/ou as seções de algumas barras 
+        alterados, sem remontar nem refatorar Ku: cada barra contribui com o termo
+        de posto um EA/L·b·bᵀ, e a alteração ΔK = B·D·Bᵀ das k barras é corrigida
+        com a fórmula de Sherman-Morrison-Woodbury
         
-        #armazenando as reações do elemento nos respetivos graus de liberdade
-        # X, Y dos respectivos nós
-        RXY[incElems[elem][0]] = (rg[0], rg[1]) #nó inicial
-        RXY[incElems[elem][1]] = (rg[2], rg[3]) #nó final
+            U = Z - W·(I + D·Bᵀ·W)⁻¹·D·Bᵀ·Z,  com Z = Ku⁻¹·Fu e W = Ku⁻¹·B,
         
-        #conversão dos deslocamentos para o sistema local com a matriz de 
-        #decomposição transposta
-        DecT = np.array([[coss[elem], sens[elem], 0, 0],
-                         [0, 0, coss[elem], sens[elem]]])
+        que custa k + 1 substituições com a fatoração existente. O modelo 
+        preparado não é alterado.
         
-        # print(DecT) #--> para conferência!
+        Entrada
+        -------
+            * cargas: dicionário de cargas;
+            * materiais: dicionário somente com os elementos alterados e os novos
+              módulos de elasticidade;
+            * secoes: dicionário somente com os elementos alterados e as novas áreas;
+            * maxAlterados: quantidade máxima de barras alteradas para a correção;
+              acima dela é feita a solução completa, com nova montagem e fatoração.
+              Padrão: 5% das barras (no mínimo 1).
         
-        #armazenando os deslocamentos no elementodeslocamentos
-        ues[elem] = np.matmul(DecT, ug)
-    
-    
-    ### RESULTADOS FINAIS NOS ELEMENTOS -------------------------------------------
-    # Determinação das deformações, tensões e esforços normais nos elementos, iniciando
-    # com dicionários vazios para armazenamento
-    defos = {}
-    tenss = {}
-    norms = {}
-    
-    #correndo em todos os elementos
-    for elem in incElems:
-        #criando a matriz das derivadas das funções de interpolação
-        B = np.array([-1./comps[elem], 1./comps[elem]])
+        Saída
+        -----
+            * UXY, RXY, defos, tenss, norms: como em calculoTrelicaPlana.
         
-        #calculando e armazenando a deformação no elemento
-        defos[elem] = np.matmul(B, ues[elem])
+        '''
+        if self.verificar and not self.valido():
+            self.preparar()
         
-        #calculando e armazenando a tensão no elemento usando o módulo de elasticidade
-        tenss[elem] = materiais[elem]*defos[elem]
+        materiais = materiais or {}
+        secoes = secoes or {}
+        estrutura = self.estrutura
+        alterados = list(dict.fromkeys([*materiais, *secoes]))
+        if maxAlterados is None:
+            maxAlterados = max(1, len(estrutura['elems'])//20)
         
-        #calculando e armazenando os esforços normais no elemento usando a área
-        #da seção transversal
-        norms[elem] = secoes[elem]*tenss[elem]
-    
-    
-    # Finalizando a função e retornado
-    return UXY, RXY, defos, tenss, norms
+        # Muitas barras alteradas: solução completa com as entradas atualizadas
+        if len(alterados) > maxAlterados:
+            coordNos, incElems, materiaisBase, secoesBase, apoios = self.entradas
+            estrutura = montaEstrutura(coordNos, incElems, {**materiaisBase, **materiais},
+                                       {**secoesBase, **secoes}, apoios, self.esparsa,
+                                       self.renumerar)
+            solver = sol.Solucionador(estrutura['Ku'], self.solucionador, **self.opcoesSolucionador)
+            Fest = fa.vetorForcas(estrutura['posNos'], cargas, estrutura['nGLs'])
+            Us = solver.resolver(Fest[estrutura['GLslivr']])
+            Re = estrutura['Kr'] @ Us - Fest[estrutura['GLsrest']]
+            self.ultimaSolucao = 'completa'
+            return resultadosEstrutura(estrutura, Us, Re)
+        
+        # Posições das barras alteradas e novas propriedades
+        try:
+            pos = np.array([self.posElems[elem] for elem in alterados], dtype=int)
+        except KeyError as erro:
+            raise ValueError(f'O elemento {erro.args[0]} não existe! Verifique as entradas em incElems.') from None
+        Es, As = estrutura['Es'].copy(), estrutura['As'].copy()
+        Es[pos] = [materiais.get(elem, Es[p]) for elem, p in zip(alterados, pos)]
+        As[pos] = [secoes.get(elem, As[p]) for elem, p in zip(alterados, pos)]
+        
+        # Variações das rigidezes axiais e vetores b das barras alteradas
+        comps, sens, coss = estrutura['comps'][pos], estrutura['sens'][pos], estrutura['coss'][pos]
+        D = (Es[pos]*As[pos] - estrutura['Es'][pos]*estrutura['As'][pos])/comps
+        bs = np.stack([-coss, -sens, coss, sens], axis=1)
+        
+        # Matrizes B (graus de liberdade livres) e Br (restringidos) com uma 
+        # coluna por barra alterada
+        nLivr, nRest = len(estrutura['GLslivr']), len(estrutura['GLsrest'])
+        B = np.zeros((nLivr, len(pos)))
+        Br = np.zeros((nRest, len(pos)))
+        colunas = np.repeat(np.arange(len(pos)), 4)
+        gls = estrutura['indis'][pos].ravel()
+        livr, rest = self.mapaLivres[gls], self.mapaRest[gls]
+        ehLivre = livr >= 0
+        B[livr[ehLivre], colunas[ehLivre]] = bs.ravel()[ehLivre]
+        Br[rest[~ehLivre], colunas[~ehLivre]] = bs.ravel()[~ehLivre]
+        
+        # Correção de Sherman-Morrison-Woodbury com a fatoração existente
+        Fest = fa.vetorForcas(estrutura['posNos'], cargas, estrutura['nGLs'])
+        Z = self.solver.resolver(Fest[estrutura['GLslivr']])
+        W = self.solver.resolver(B)
+        capac = np.eye(len(pos)) + D[:, None]*(B.T @ W)
+        Us = Z - W @ np.linalg.solve(capac, D*(B.T @ Z))
+        
+        # Reações com a parte restringida também alterada
+        Re = estrutura['Kr'] @ Us + Br @ (D*(B.T @ Us)) - Fest[estrutura['GLsrest']]
+        
+        self.ultimaSolucao = 'woodbury'
+        return resultadosEstrutura({**estrutura, 'Es': Es, 'As': As}, Us, Re)
+
+def _copiaValor(valor):
+    if isinstance(valor, np.ndarray):
+        return np.array(valor, copy=True)
+    if isinstance(valor, (list, tuple)):
+        return type(valor)(_copiaValor(item) for item in valor)
+    return valor
+
+def _valoresIguais(valor, copia):
+    if isinstance(valor, np.ndarray) or isinstance(copia, np.ndarray):
+        return np.array_equal(valor, copia)
+    if isinstance(valor, (list, tuple)) and isinstance(copia, (list, tuple)):
+        return len(valor) == len(copia) and all(map(_valoresIguais, valor, copia))
+    return valor == copia
+
+def copiaEntradas(*dicionarios):
+    '''
+    Função para criar uma cópia do conteúdo de dicionários de entrada, usada para
+    detectar as alterações feitas no próprio lugar: os dicionários, os valores
+    mutáveis (listas e arrays do NumPy, copiados com np.array) e as tuplas que
+    os contenham são copiados, e os demais valores (números) são imutáveis.
+    A comparação com entradasIguais usa os valores exatos, sem as colisões de
+    uma impressão digital por hash (hash(-1.0) == hash(-2.0) no CPython).
+    '''
+    return tuple({chave: _copiaValor(valor) for chave, valor in d.items()} for d in dicionarios)
+
+def entradasIguais(dicionarios, copias):
+    '''
+    Função para verificar se os dicionários de entrada continuam iguais às cópias
+    de copiaEntradas: comparação dos dicionários com ==, feita em C, e, com os
+    valores em arrays do NumPy (sem um valor lógico único para ==), item a item
+    com np.array_equal.
+    '''
+    try:
+        return all(d == copia for d, copia in zip(dicionarios, copias))
+    except ValueError: #valores em arrays do NumPy
+        return all(list(d) == list(copia) and all(map(_valoresIguais, d.values(), copia.values()))
+                   for d, copia in zip(dicionarios, copias))
 
 # testando o módulo de cálculo da treliça
 if __name__ == '__main__':
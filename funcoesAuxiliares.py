@@ -6,11 +6,35 @@ Criado na Quinta, dia 20 de Março de 2020, às 11:17:21
 Módulo para as funções auxiliares:
     - compSenCos(x1, x2, y1, y2): cálculo do comprimento, seno e cosseno de elementos com 2 nós;
     - matRig_TP(E, A, L, s, c): cálculo da matriz de rigidez do elemento de treliça plano;
+    - compSenCosLote(coords, conect): comprimentos, senos e cossenos de todos os elementos de uma só vez;
+    - matRig_TPLote(E, A, L, s, c): matrizes de rigidez de todos os elementos de treliça plano de uma só vez;
+    - matRigGeo_TPLote(N, l, s, c): matrizes de rigidez geométrica de todos os elementos (grandes deslocamentos);
+    - matMassa_TPLote(rho, A, L, tipo): matrizes de massa concentrada ou consistente de todos os elementos;
+    - numeracaoNos(coordNos): mapa dos rótulos dos nós para as suas posições na estrutura;
+    - glsNos(posNos, nos): graus de liberdade X e Y de uma sequência de nós;
+    - indexadoresElems(posNos, incElems): conectividade e indexadores de todos os elementos;
+    - indexadoresConect(conect): indexadores dos elementos a partir da conectividade;
+    - vetorForcas(posNos, cargas, nGLs): vetor de forças nodais da estrutura;
+    - particionaGLs(posNos, apoios, nGLs): graus de liberdade livres e restringidos;
+    - ordemRCM(conect, nNos): ordem reversa de Cuthill-McKee dos nós pela conectividade;
+    - renumeraGLs(GLs, ordemNos): reordenação dos graus de liberdade pela nova ordem dos nós;
+    - montaRigidezDensa(indis, kegs, nGLs): montagem da matriz de rigidez densa da estrutura;
+    - montaRigidezEsparsa(indis, kegs, nGLs): montagem da matriz de rigidez da estrutura no formato esparso CSR;
+    - particionaRigidezEsparsa(Kest, GLslivr, GLsrest): separação esparsa da matriz de rigidez em Ku e Kr;
+    - problemasEstabilidade(coords, conect, restritos): verificação rápida de mecanismos e apoios insuficientes;
+    - verificaEstabilidade(coords, conect, restritos): a mesma verificação, com ValueError se houver problemas;
+
+    - visual_TP_colecoes(...): visualização vetorizada com coleções do matplotlib e gravação direta em arquivo;
 
 @autor: argenta
 """
 import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.csgraph as csg
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PolyCollection
 
 ### FUNÇÕES AUXILIARES DE TRELIÇAS PLANAS -------------------------------------
 
@@ -62,6 +86,530 @@ def matRig_TP(E, A, L, s, c):
     
     return keg
 
+def compSenCosLote(coords, conect):
+    '''
+    Versão vetorizada da função compSenCos: calcula os comprimentos, senos e 
+    cossenos de todos os elementos em uma única passagem do NumPy.
+    
+    Entrada
+    -------
+        * coords: array (nNos, 2) com as coordenadas x e y dos nós da estrutura;
+        * conect: array (nElems, 2) com as posições (iniciando em 0) dos nós 
+          inicial e final de cada elemento nas linhas de coords.
+    
+    Saída
+    -----
+        * comps: array (nElems,) com os comprimentos dos elementos;
+        * sens: array (nElems,) com os senos dos ângulos dos elementos com o eixo x;
+        * coss: array (nElems,) com os cossenos dos ângulos dos elementos com o eixo x.
+    
+    '''
+    coords = np.asarray(coords, dtype=float)
+    conect = np.asarray(conect)
+    
+    #projeções das barras nos eixos x e y
+    dxy = coords[conect[:, 1]] - coords[conect[:, 0]]
+    
+    comps = np.hypot(dxy[:, 0], dxy[:, 1])
+    sens = dxy[:, 1]/comps
+    coss = dxy[:, 0]/comps
+    return comps, sens, coss
+
+def matRig_TPLote(E, A, L, s, c):
+    '''
+    Versão vetorizada da função matRig_TP: calcula as matrizes de rigidez 
+    globais de todos os elementos de treliça plana como uma pilha (nElems, 4, 4).
+    
+    Cada matriz é o produto EA/L·b·bᵀ, com b = [-c, -s, c, s].
+    
+    Entradas
+    --------
+        * E: array (nElems,) com os módulos de elasticidade;
+        * A: array (nElems,) com as áreas das seções transversais;
+        * L: array (nElems,) com os comprimentos dos elementos;
+        * s: array (nElems,) com os senos dos ângulos dos elementos;
+        * c: array (nElems,) com os cossenos dos ângulos dos elementos.
+    
+    Saída
+    -----
+        * kegs: array (nElems, 4, 4) com as matrizes de rigidez dos elementos no sistema global.
+    
+    '''
+    s = np.asarray(s, dtype=float)
+    c = np.asarray(c, dtype=float)
+    
+    #vetores de projeção no eixo da barra e rigidezes axiais
+    b = np.stack([-c, -s, c, s], axis=1)
+    kax = np.asarray(E, dtype=float)*np.asarray(A, dtype=float)/np.asarray(L, dtype=float)
+    
+    kegs = kax[:, None, None]*b[:, :, None]*b[:, None, :]
+    return kegs
+
+def matRigGeo_TPLote(N, l, s, c):
+    '''
+    Função para calcular as matrizes de rigidez geométrica de todos os elementos
+    de treliça plana como uma pilha (nElems, 4, 4), que somadas às de 
+    matRig_TPLote formam a rigidez tangente da análise com grandes deslocamentos:
+    
+        kgeo = N/l·[[G, -G], [-G, G]],  com G = [[s², -c·s], [-c·s, c²]],
+    
+    a rigidez da rotação da barra tracionada perpendicular ao seu eixo atual.
+    
+    Entradas
+    --------
+        * N: array (nElems,) com os esforços normais atuais;
+        * l: array (nElems,) com os comprimentos atuais dos elementos;
+        * s: array (nElems,) com os senos atuais dos ângulos dos elementos;
+        * c: array (nElems,) com os cossenos atuais dos ângulos dos elementos.
+    
+    Saída
+    -----
+        * kgeos: array (nElems, 4, 4) com as matrizes de rigidez geométrica no sistema global.
+    
+    '''
+    s = np.asarray(s, dtype=float)
+    c = np.asarray(c, dtype=float)
+    
+    #vetores perpendiculares ao eixo atual da barra: G = n·nᵀ com n = [-s, c]
+    p = np.stack([s, -c, -s, c], axis=1)
+    kperp = np.asarray(N, dtype=float)/np.asarray(l, dtype=float)
+    
+    kgeos = kperp[:, None, None]*p[:, :, None]*p[:, None, :]
+    return kgeos
+
+def matMassa_TPLote(rho, A, L, tipo='consistente'):
+    '''
+    Função para calcular as matrizes de massa de todos os elementos de treliça
+    plana como uma pilha (nElems, 4, 4), com a massa total m = ρ·A·L da barra.
+    
+    As duas matrizes são invariantes com a rotação da barra, e por isso não 
+    dependem do seno e do cosseno:
+        - 'concentrada': m/2 em cada grau de liberdade (diagonal);
+        - 'consistente': m/6·[[2, 0, 1, 0], [0, 2, 0, 1], [1, 0, 2, 0], [0, 1, 0, 2]],
+          com as funções de forma lineares nas duas direções.
+    
+    Entradas
+    --------
+        * rho: array (nElems,) com as massas específicas;
+        * A: array (nElems,) com as áreas das seções transversais;
+        * L: array (nElems,) com os comprimentos dos elementos;
+        * tipo: 'consistente' ou 'concentrada'.
+    
+    Saída
+    -----
+        * megs: array (nElems, 4, 4) com as matrizes de massa dos elementos.
+    
+    '''
+    massas = np.asarray(rho, dtype=float)*np.asarray(A, dtype=float)*np.asarray(L, dtype=float)
+    if tipo == 'consistente':
+        base = np.array([[2., 0., 1., 0.],
+                         [0., 2., 0., 1.],
+                         [1., 0., 2., 0.],
+                         [0., 1., 0., 2.]])/6.
+    elif tipo == 'concentrada':
+        base = np.eye(4)/2.
+    else:
+        raise ValueError(f'Matriz de massa {tipo} desconhecida! Use consistente ou concentrada.')
+    return massas[:, None, None]*base
+
+def numeracaoNos(coordNos):
+    '''
+    Função para criar a numeração dos nós da estrutura: um dicionário que leva
+    o rótulo de cada nó (que pode ser qualquer) à sua posição, iniciando em 0, 
+    na ordem de coordNos. Os graus de liberdade do nó na posição p são 2p (X) e
+    2p + 1 (Y).
+    
+    Deve ser criada uma única vez por modelo e substitui as buscas lineares 
+    nosList.index(no), de modo que cada consulta custa O(1).
+    
+    Entrada
+    -------
+        * coordNos: dicionário das coordenadas dos nós.
+    
+    Saída
+    -----
+        * posNos: dicionário com o rótulo do nó como chave e a posição como valor.
+    
+    '''
+    return {no: pos for pos, no in enumerate(coordNos)}
+
+def glsNos(posNos, nos):
+    '''
+    Função para obter os graus de liberdade, já pythonizados, de uma sequência 
+    de nós a partir da numeração dos nós.
+    
+    Entradas
+    --------
+        * posNos: numeração dos nós criada por numeracaoNos;
+        * nos: sequência com os rótulos dos nós.
+    
+    Saída
+    -----
+        * gls: array (len(nos), 2) com os graus de liberdade X e Y de cada nó.
+    
+    '''
+    try:
+        pos = np.fromiter((posNos[no] for no in nos), dtype=np.intp, count=len(nos))
+    except KeyError as erro:
+        raise ValueError(f'O nó {erro.args[0]} não existe! Verifique as entradas em coordNos.') from None
+    
+    return np.stack([2*pos, 2*pos + 1], axis=1)
+
+def indexadoresElems(posNos, incElems):
+    '''
+    Função para criar a conectividade dos elementos pelas posições dos nós e os
+    indexadores de todos os elementos de uma só vez.
+    
+    Entradas
+    --------
+        * posNos: numeração dos nós criada por numeracaoNos;
+        * incElems: dicionário das incidências dos elementos.
+    
+    Saída
+    -----
+        * conect: array (nElems, 2) com as posições dos nós inicial e final de cada elemento;
+        * indis: array (nElems, 4) com os indexadores de cada elemento, iniciando em 0.
+    
+    '''
+    nos = [no for noi_noj in incElems.values() for no in noi_noj]
+    gls = glsNos(posNos, nos).reshape(-1, 4)
+    conect = gls[:, ::2]//2
+    return conect, gls
+
+def indexadoresConect(conect):
+    '''
+    Função para criar os indexadores de todos os elementos a partir da 
+    conectividade pelas posições dos nós.
+    
+    Entrada
+    -------
+        * conect: array (nElems, 2) com as posições dos nós inicial e final de cada elemento.
+    
+    Saída
+    -----
+        * indis: array (nElems, 4) com os indexadores de cada elemento, iniciando em 0.
+    
+    '''
+    conect = np.asarray(conect, dtype=np.intp)
+    return np.stack([2*conect[:, 0], 2*conect[:, 0] + 1,
+                     2*conect[:, 1], 2*conect[:, 1] + 1], axis=1)
+
+def vetorForcas(posNos, cargas, nGLs):
+    '''
+    Função para montar o vetor de forças nodais da estrutura.
+    
+    Entradas
+    --------
+        * posNos: numeração dos nós criada por numeracaoNos;
+        * cargas: dicionário das cargas dos nós;
+        * nGLs: quantidade de graus de liberdade totais da estrutura.
+    
+    Saída
+    -----
+        * Fest: array (nGLs,) com as forças nodais da estrutura.
+    
+    '''
+    Fest = np.zeros(nGLs)
+    if cargas:
+        gls = glsNos(posNos, list(cargas))
+        np.add.at(Fest, gls.ravel(), np.array(list(cargas.values()), dtype=float).ravel())
+    return Fest
+
+def particionaGLs(posNos, apoios, nGLs):
+    '''
+    Função para a definição dos graus de liberdade livres e restringidos da 
+    estrutura, já pythonizados e em ordem crescente.
+    
+    Entradas
+    --------
+        * posNos: numeração dos nós criada por numeracaoNos;
+        * apoios: dicionário dos apoios dos nós, com 1 para restringido e 0 para
+          livre; os nós que não estão em posNos são ignorados;
+        * nGLs: quantidade de graus de liberdade totais da estrutura.
+    
+    Saída
+    -----
+        * GLslivr: array com os graus de liberdade livres;
+        * GLsrest: array com os graus de liberdade restringidos.
+    
+    '''
+    restrito = np.zeros(nGLs, dtype=bool)
+    #como no cálculo original, os apoios em nós fora de coordNos são ignorados
+    apoios = {no: cond for no, cond in apoios.items() if no in posNos}
+    if apoios:
+        gls = glsNos(posNos, list(apoios))
+        conds = np.array(list(apoios.values()))
+        for direcao, eixo in enumerate('XY'):
+            if not np.isin(conds[:, direcao], (0, 1)).all():
+                raise ValueError('Somente graus de liberdade livres ou ' +\
+                                 f'restringidos em {eixo}! Verifique as entradas em apoio.')
+        restrito[gls.ravel()] = conds.ravel() == 1
+    
+    GLslivr = np.flatnonzero(~restrito)
+    GLsrest = np.flatnonzero(restrito)
+    return GLslivr, GLsrest
+
+def ordemRCM(conect, nNos):
+    '''
+    Função para calcular a ordem reversa de Cuthill-McKee dos nós a partir do 
+    grafo de conectividade dos elementos, que reduz a banda e o perfil da matriz
+    de rigidez da estrutura.
+    
+    Entradas
+    --------
+        * conect: array (nElems, 2) com as posições dos nós inicial e final de cada elemento;
+        * nNos: quantidade de nós da estrutura.
+    
+    Saída
+    -----
+        * ordemNos: array (nNos,) com as posições dos nós na nova ordem.
+    
+    '''
+    conect = np.asarray(conect)
+    grafo = sp.coo_matrix((np.ones(len(conect)), (conect[:, 0], conect[:, 1])),
+                          shape=(nNos, nNos)).tocsr()
+    grafo = (grafo + grafo.T).tocsr()
+    return np.asarray(csg.reverse_cuthill_mckee(grafo, symmetric_mode=True), dtype=np.intp)
+
+def renumeraGLs(GLs, ordemNos):
+    '''
+    Função para reordenar os graus de liberdade pela nova ordem dos nós, 
+    mantendo X antes de Y em cada nó. Os rótulos e as posições dos nós não mudam:
+    somente a ordem das linhas e colunas na partição da matriz de rigidez.
+    
+    Entradas
+    --------
+        * GLs: array com os graus de liberdade (por exemplo, os livres);
+        * ordemNos: array com as posições dos nós na nova ordem.
+    
+    Saída
+    -----
+        * GLs: array com os mesmos graus de liberdade na nova ordem.
+    
+    '''
+    GLs = np.asarray(GLs)
+    classificacao = np.empty(len(ordemNos), dtype=np.intp)
+    classificacao[ordemNos] = np.arange(len(ordemNos))
+    chaves = 2*classificacao[GLs//2] + GLs%2
+    return GLs[np.argsort(chaves, kind='stable')]
+
+def montaRigidezDensa(indis, kegs, nGLs):
+    '''
+    Função para montar a matriz de rigidez densa da estrutura somando as 
+    matrizes de todos os elementos nas posições dos seus indexadores.
+    
+    Entradas
+    --------
+        * indis: array (nElems, 4) com os indexadores de cada elemento, iniciando em 0;
+        * kegs: array (nElems, 4, 4) com as matrizes de rigidez dos elementos no sistema global;
+        * nGLs: quantidade de graus de liberdade totais da estrutura.
+    
+    Saída
+    -----
+        * Kest: array (nGLs, nGLs) com a matriz de rigidez da estrutura.
+    
+    '''
+    indis = np.asarray(indis)
+    Kest = np.zeros((nGLs, nGLs))
+    np.add.at(Kest, (indis[:, :, None], indis[:, None, :]), kegs)
+    return Kest
+
+def montaRigidezEsparsa(indis, kegs, nGLs):
+    '''
+    Função para montar a matriz de rigidez da estrutura no formato esparso, a 
+    partir dos indexadores e das matrizes de rigidez de todos os elementos de uma
+    só vez: os tripletos (linha, coluna, valor) no formato COO são gerados para
+    todos os elementos e convertidos para o formato CSR, que soma as entradas
+    repetidas dos graus de liberdade compartilhados.
+    
+    A memória ocupada cresce com o número de barras (16 entradas por elemento) e
+    não com o quadrado do número de graus de liberdade como na matriz densa.
+    
+    Entradas
+    --------
+        * indis: array (nElems, 4) com os indexadores de cada elemento, iniciando em 0,
+          ou (nElems, m) para superelementos com m graus de liberdade;
+        * kegs: array (nElems, 4, 4) ou (nElems, m, m) com as matrizes de rigidez 
+          dos elementos no sistema global;
+        * nGLs: quantidade de graus de liberdade totais da estrutura.
+    
+    Saída
+    -----
+        * Kest: a matriz de rigidez da estrutura no formato scipy.sparse CSR.
+    
+    '''
+    indis = np.asarray(indis)
+    kegs = np.asarray(kegs, dtype=float)
+    
+    #linhas e colunas de cada uma das m² entradas das matrizes dos elementos
+    m = indis.shape[1]
+    lins = np.repeat(indis, m, axis=1).ravel()
+    cols = np.tile(indis, (1, m)).ravel()
+    vals = kegs.reshape(-1)
+    
+    #a conversão de COO para CSR soma as entradas duplicadas
+    Kest = sp.coo_matrix((vals, (lins, cols)), shape=(nGLs, nGLs)).tocsr()
+    
+    return Kest
+
+def particionaRigidezEsparsa(Kest, GLslivr, GLsrest):
+    '''
+    Função para separar a matriz de rigidez esparsa da estrutura nas partes 
+    relativas aos graus de liberdade livres (Ku) e às reações de apoio (Kr), 
+    mantendo o formato esparso CSR.
+    
+    Entradas
+    --------
+        * Kest: matriz de rigidez da estrutura no formato esparso;
+        * GLslivr: graus de liberdade livres, iniciando em 0;
+        * GLsrest: graus de liberdade restringidos, iniciando em 0.
+    
+    Saída
+    -----
+        * Ku: matriz de rigidez dos graus de liberdade livres (CSR);
+        * Kr: matriz de rigidez das linhas restringidas com as colunas livres (CSR).
+    
+    '''
+    Kest = sp.csr_matrix(Kest)
+    
+    #separando primeiro as colunas livres, que são comuns às duas partes
+    Kcols = Kest[:, GLslivr]
+    Ku = Kcols[GLslivr, :].tocsr()
+    Kr = Kcols[GLsrest, :].tocsr()
+    
+    return Ku, Kr
+
+def problemasEstabilidade(coords, conect, restritos, rotulosNos=None, rotulosElems=None, maxRelatados=10):
+    '''
+    Função para a verificação rápida, antes da montagem, da estabilidade da 
+    treliça, em tempo O(nós + elementos):
+        - elementos de comprimento nulo;
+        - nós sem rigidez em alguma direção: sem elementos, com todos os 
+          elementos colineares e sem apoio na direção perpendicular, ou com o 
+          apoio na mesma direção dos elementos;
+        - grupos de nós ligados entre si (componentes conexas da incidência) 
+          com menos de 2·nós barras mais restrições ou com os apoios incapazes de
+          impedir os três movimentos de corpo rígido (menos de 3 restrições, 
+          todas paralelas ou todas concorrentes em um ponto).
+    
+    São condições necessárias: uma estrutura aprovada ainda pode ter um 
+    mecanismo interno, mas as causas comuns de Ku singular são detectadas.
+    
+    Entradas
+    --------
+        * coords: array (nNos, 2) com as coordenadas dos nós;
+        * conect: array (nElems, 2) com as posições dos nós inicial e final;
+        * restritos: array (nNos, 2) com 1 (ou True) para os graus de liberdade restringidos;
+        * rotulosNos, rotulosElems: rótulos usados nas mensagens (padrão: as posições);
+        * maxRelatados: quantidade máxima de rótulos em cada mensagem.
+    
+    Saída
+    -----
+        * problemas: lista com a descrição de cada problema encontrado (vazia se
+          nenhum).
+    
+    '''
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    conect = np.asarray(conect, dtype=np.intp).reshape(-1, 2)
+    restritos = np.asarray(restritos).reshape(-1, 2) != 0
+    nNos = len(coords)
+    rotulosNos = np.arange(nNos) if rotulosNos is None else np.asarray(rotulosNos, dtype=object)
+    rotulosElems = np.arange(len(conect)) if rotulosElems is None else np.asarray(rotulosElems, dtype=object)
+    
+    def lista(rotulos):
+        rotulos = list(rotulos)
+        texto = ', '.join(str(r) for r in rotulos[:maxRelatados])
+        return texto + (f' e mais {len(rotulos) - maxRelatados}' if len(rotulos) > maxRelatados else '')
+    
+    problemas = []
+    if nNos == 0:
+        return problemas
+    
+    #elementos de comprimento nulo, relativos às dimensões da estrutura
+    deltas = coords[conect[:, 1]] - coords[conect[:, 0]]
+    comps = np.hypot(deltas[:, 0], deltas[:, 1])
+    escala = max(np.ptp(coords, axis=0).max(), np.finfo(float).tiny)
+    nulos = comps <= 1e-12*escala
+    if np.any(nulos):
+        problemas.append(f'Elementos de comprimento nulo: {lista(rotulosElems[nulos])}.')
+    
+    ### RIGIDEZ DE CADA NÓ ---------------------------------------------------------
+    # Soma de e·eᵀ das direções unitárias e dos elementos de cada nó, normalizada
+    # pelo traço e acrescida dos apoios: é singular se o nó não tem rigidez em 
+    # alguma direção
+    e = deltas/np.where(nulos, 1., comps)[:, None]
+    e[nulos] = 0.
+    nos = conect.ravel()
+    Sxx = np.bincount(nos, weights=np.repeat(e[:, 0]**2, 2), minlength=nNos)
+    Sxy = np.bincount(nos, weights=np.repeat(e[:, 0]*e[:, 1], 2), minlength=nNos)
+    Syy = np.bincount(nos, weights=np.repeat(e[:, 1]**2, 2), minlength=nNos)
+    traco = Sxx + Syy
+    traco[traco == 0] = 1.
+    Sxx, Sxy, Syy = Sxx/traco + restritos[:, 0], Sxy/traco, Syy/traco + restritos[:, 1]
+    singulares = Sxx*Syy - Sxy**2 <= 1e-10
+    
+    grau = np.bincount(nos, minlength=nNos)
+    soltos = singulares & (grau == 0)
+    if np.any(soltos):
+        problemas.append(f'Nós sem elementos e sem apoio nas duas direções: {lista(rotulosNos[soltos])}.')
+    if np.any(singulares & ~soltos):
+        problemas.append('Nós sem rigidez em alguma direção (elementos colineares ou apoio na direção ' +\
+                         f'dos elementos): {lista(rotulosNos[singulares & ~soltos])}.')
+    
+    ### GRUPOS DE NÓS LIGADOS ENTRE SI ---------------------------------------------
+    # Componentes conexas da incidência com as contagens de nós, barras e restrições
+    grafo = sp.coo_matrix((np.ones(len(conect)), (conect[:, 0], conect[:, 1])), shape=(nNos, nNos))
+    nGrupos, grupos = csg.connected_components(grafo, directed=False)
+    nosGrupo = np.bincount(grupos, minlength=nGrupos)
+    barrasGrupo = np.bincount(grupos[conect[:, 0]], minlength=nGrupos)
+    restrGrupo = np.bincount(grupos, weights=restritos.sum(axis=1), minlength=nGrupos).astype(int)
+    
+    # Movimentos de corpo rígido nos graus de liberdade restringidos, com as 
+    # coordenadas relativas ao centro de cada grupo: translações X e Y e rotação
+    centros = np.column_stack([np.bincount(grupos, weights=coords[:, i], minlength=nGrupos)
+                               for i in (0, 1)])/nosGrupo[:, None]
+    pos, direcao = np.nonzero(restritos)
+    rel = (coords[pos] - centros[grupos[pos]])/escala
+    movimentos = np.column_stack([direcao == 0, direcao == 1,
+                                  np.where(direcao == 0, -rel[:, 1], rel[:, 0])]).astype(float)
+    ordem = np.argsort(grupos[pos], kind='stable')
+    limites = np.searchsorted(grupos[pos][ordem], np.arange(nGrupos + 1))
+    
+    relatados = 0
+    for g in np.flatnonzero(nosGrupo > 1):
+        faltam = 2*nosGrupo[g] - barrasGrupo[g] - restrGrupo[g]
+        if restrGrupo[g] >= 3:
+            valores = np.linalg.svd(movimentos[ordem[limites[g]:limites[g + 1]]], compute_uv=False)
+            if faltam <= 0 and valores[-1] > 1e-9*valores[0]:
+                continue
+        if relatados == maxRelatados:
+            problemas.append('Existem mais grupos de nós instáveis.')
+            break
+        relatados += 1
+        
+        descricao = f'O grupo de {nosGrupo[g]} nós ligados entre si com os nós ' +\
+                    f'{lista(rotulosNos[grupos == g])}'
+        if restrGrupo[g] < 3:
+            problemas.append(f'{descricao} tem {restrGrupo[g]} restrições de apoio e precisa de pelo menos 3.')
+        elif faltam > 0:
+            problemas.append(f'{descricao} tem {barrasGrupo[g]} barras e {restrGrupo[g]} restrições de ' +\
+                             f'apoio, {faltam} a menos que o mínimo de 2·nós = {2*nosGrupo[g]}.')
+        else:
+            problemas.append(f'{descricao} tem os apoios todos paralelos ou concorrentes em um ponto ' +\
+                             'e não impede os movimentos de corpo rígido.')
+    return problemas
+
+def verificaEstabilidade(coords, conect, restritos, rotulosNos=None, rotulosElems=None, maxRelatados=10):
+    '''
+    Função para a verificação rápida da estabilidade da treliça antes da 
+    montagem (problemasEstabilidade), que lança um ValueError com todos os
+    problemas encontrados, indicados pelos rótulos dos nós e dos elementos.
+    '''
+    problemas = problemasEstabilidade(coords, conect, restritos, rotulosNos, rotulosElems, maxRelatados)
+    if problemas:
+        raise ValueError('A estrutura é instável (mecanismo ou apoios insuficientes)! ' +\
+                         ' '.join(problemas) + ' Verifique as entradas em incElems e apoios.')
+
 def visual_TP(coordNos, incElems, cargas, apoios, deslocamentos=None, deformacoes=None, tensoes=None, normais=None, 
               escala_carga=2, escala_apoio=5, escala_desloc=1000, escala_deform=1e6, escala_tensao=100, escala_normal=1):
     '''
@@ -190,3 +738,148 @@ def visual_TP(coordNos, incElems, cargas, apoios, deslocamentos=None, deformacoe
     
     return None
 
+def visual_TP_colecoes(coordNos, incElems, cargas, apoios, deslocamentos=None, deformacoes=None, tensoes=None,
+                       normais=None, escala_carga=2, escala_apoio=5, escala_desloc=1000, escala_deform=1e6,
+                       escala_tensao=100, escala_normal=1, arquivo=None, maxRotulos=200, dpi=100):
+    '''
+    Versão vetorizada da função visual_TP para treliças grandes: os elementos, a
+    estrutura deformada, os apoios e os diagramas de resultados são desenhados 
+    como uma única LineCollection ou PolyCollection cada, com a geometria 
+    calculada em arrays, os nós e as cargas em uma única chamada cada, e os 
+    rótulos são omitidos automaticamente acima de maxRotulos nós + elementos.
+    
+    Com arquivo, a figura é criada diretamente no backend Agg, sem pyplot e sem
+    tela, e gravada no formato da extensão (PNG, SVG, PDF...), o que permite o 
+    uso em servidores sem interface gráfica. Nos formatos vetoriais, as coleções
+    e os nós são rasterizados, e só os eixos, os textos e a legenda ficam em
+    vetores. Sem arquivo, a figura é exibida com plt.show() como em visual_TP.
+    
+    Entrada
+    -------
+        coordNos, incElems, cargas, apoios, deslocamentos, deformacoes, tensoes, normais
+        e as escalas: como em visual_TP. Os resultados dos elementos também podem
+        ser arrays na ordem de incElems e os deslocamentos um array (nNos, 2) na
+        ordem de coordNos.
+        arquivo: str, opcional, caminho do arquivo de saída. Padrão é None.
+        maxRotulos: int, opcional, quantidade máxima de nós + elementos com rótulos. Padrão é 200.
+        dpi: int, opcional, resolução da figura. Padrão é 100.
+    
+    Saída
+    -----
+        * fig: a figura do matplotlib gerada.
+    '''
+    # Dados da malha em arrays
+    posNos = numeracaoNos(coordNos)
+    coords = np.array(list(coordNos.values()), dtype=float).reshape(-1, 2)
+    conect, _ = indexadoresElems(posNos, incElems)
+    rotulos = len(coordNos) + len(incElems) <= maxRotulos
+    tamanhoNos = 64 if rotulos else 4 #área dos marcadores em pontos², ms=8 e ms=2
+    
+    # Figura sem pyplot para a gravação em arquivo e com pyplot para a exibição
+    if arquivo is not None:
+        fig = Figure(figsize=(19.2, 10.8), dpi=dpi)
+        FigureCanvasAgg(fig)
+        rasterizar = str(arquivo).lower().endswith(('.svg', '.svgz', '.pdf', '.eps', '.ps'))
+    else:
+        fig = plt.figure(figsize=(19.2, 10.8), dpi=dpi)
+        rasterizar = False
+    ax = fig.add_subplot()
+    temDesloc = deslocamentos is not None and len(deslocamentos) > 0
+    alpha = 0.3 if temDesloc else 1.0
+    
+    # Estrutura indeformada: elementos e nós
+    segmentos = coords[conect] #(nElems, 2, 2)
+    ax.add_collection(LineCollection(segmentos, colors='b', linewidths=2, alpha=alpha, label='Elementos',
+                                     rasterized=rasterizar))
+    ax.scatter(coords[:, 0], coords[:, 1], s=tamanhoNos, c='k', alpha=alpha, label='Nós', rasterized=rasterizar)
+    if rotulos:
+        meios = segmentos.mean(axis=1) + 5
+        for elem, (x, y) in zip(incElems, meios):
+            ax.text(x, y, f'E{elem}', color='b', fontsize=10, alpha=alpha)
+        if not temDesloc:
+            for no, (x, y) in zip(coordNos, coords):
+                ax.text(x + 5, y + 5, f'N{no}', fontsize=10, alpha=alpha)
+    
+    # Cargas nos nós em uma única chamada
+    if cargas:
+        pc = coords[[posNos[no] for no in cargas]]
+        fc = np.array(list(cargas.values()), dtype=float).reshape(-1, 2)*escala_carga
+        ax.quiver(pc[:, 0], pc[:, 1], fc[:, 0], fc[:, 1], color='r', angles='xy', scale_units='xy',
+                  scale=1, width=0.002, alpha=alpha, label='Cargas', rasterized=rasterizar)
+    
+    # Apoios como triângulos em uma única coleção
+    if apoios:
+        pa = coords[[posNos[no] for no in apoios]]
+        ra = np.array(list(apoios.values())).reshape(-1, 2)
+        b, h = escala_apoio*0.5, escala_apoio*0.75
+        x, y = pa[ra[:, 0] == 1].T
+        triX = np.stack([np.stack([x - h, y - b], 1), np.stack([x - h, y + b], 1), np.stack([x, y], 1)], 1)
+        x, y = pa[ra[:, 1] == 1].T
+        triY = np.stack([np.stack([x - b, y - h], 1), np.stack([x + b, y - h], 1), np.stack([x, y], 1)], 1)
+        ax.add_collection(PolyCollection(np.concatenate([triX, triY]), facecolors='none', edgecolors='c',
+                                         linewidths=2, alpha=alpha, label='Apoios', rasterized=rasterizar))
+    
+    # Estrutura deformada
+    if temDesloc:
+        if isinstance(deslocamentos, dict):
+            desloc = np.zeros_like(coords)
+            desloc[[posNos[no] for no in deslocamentos]] = np.array(list(deslocamentos.values()), dtype=float)
+        else:
+            desloc = np.asarray(deslocamentos, dtype=float).reshape(-1, 2)
+        coordsDesloc = coords + desloc*escala_desloc
+        ax.add_collection(LineCollection(coordsDesloc[conect], colors='g', linewidths=2,
+                                         label='Elementos Deslocados', rasterized=rasterizar))
+        ax.scatter(coordsDesloc[:, 0], coordsDesloc[:, 1], s=tamanhoNos, c='g', label='Nós Deslocados',
+                   rasterized=rasterizar)
+        if rotulos:
+            for no, (x, y), (dx, dy) in zip(coordNos, coordsDesloc, desloc):
+                ax.text(x + 5, y + 5, f'N{no}\n({dx:.3e}, {dy:.3e})', fontsize=8, color='g')
+    
+    # Resultados: diagramas de deformações, tensões e esforços normais
+    resultado = None
+    if deformacoes is not None and len(deformacoes):
+        resultado = (deformacoes, 'red', 'Deformações', escala_deform)
+    elif tensoes is not None and len(tensoes):
+        resultado = (tensoes, 'orange', 'Tensões', escala_tensao)
+    elif normais is not None and len(normais):
+        resultado = (normais, 'blue', 'Esforços Normais', escala_normal)
+    
+    if resultado:
+        valores, cor, label, escala = resultado
+        if isinstance(valores, dict):
+            valores = np.fromiter((valores[elem] for elem in incElems), dtype=float, count=len(incElems))
+        valores = np.asarray(valores, dtype=float)
+        
+        # Retângulos de todos os elementos de uma só vez, com a mesma geometria
+        # de visual_TP: largura |valor|·escala, sempre do lado da normal da barra
+        # (nos negativos, lado e origem trocam de sinal e o retângulo coincide);
+        # o sinal aparece só no rótulo
+        pi, pf = segmentos[:, 0], segmentos[:, 1]
+        vBarra = pf - pi
+        uBarra = vBarra/np.linalg.norm(vBarra, axis=1)[:, None]
+        vNormal = np.stack([-uBarra[:, 1], uBarra[:, 0]], axis=1)
+        lado = np.where(valores[:, None] >= 0, vNormal, -vNormal)*(np.abs(valores)*escala)[:, None]
+        p0 = np.where(valores[:, None] >= 0, pi, pi - lado)
+        p1 = p0 + vBarra
+        retangulos = np.stack([p0, p1, p1 + lado, p0 + lado], axis=1)
+        ax.add_collection(PolyCollection(retangulos, facecolors=cor, edgecolors=cor, alpha=0.5, label=label,
+                                         rasterized=rasterizar))
+        if rotulos:
+            for (x, y), valor in zip((p0 + p1 + lado)/2, valores):
+                ax.text(x, y, f'{valor:.3e}', color=cor, fontsize=8, ha='center', va='center')
+    
+    # Configurações finais da visualização
+    ax.autoscale_view()
+    ax.grid(True)
+    ax.legend(loc="upper right")
+    ax.set_title("Visualização da Treliça Plana")
+    ax.set_xlabel("X")
+    ax.set_ylabel("Y")
+    ax.set_aspect('equal', adjustable='datalim')
+    
+    if arquivo is not None:
+        fig.savefig(arquivo)
+    else:
+        plt.show()
+    
+    return fig
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Módulo para a geração paramétrica de treliças planas, de dezenas a milhões de
+barras, com a geometria criada em arrays:
+    - pratt(nPaineis, ...): viga Pratt, diagonais descendo para o centro de cada vão;
+    - howe(nPaineis, ...): viga Howe, diagonais subindo para o centro de cada vão;
+    - warren(nPaineis, ...): viga Warren, diagonais alternadas e sem montantes;
+    - torre(nNiveis, ...): torre de transmissão com os pés das pernas apoiados em X e Y,
+      com travamento em X e estais a cada niveisPorEstai níveis;
+    - grade(nx, ny, ...): grade retangular com as duas diagonais em cada célula;
+    - geraTrelica(tipo, nBarras): a treliça do tipo com aproximadamente nBarras barras.
+
+As vigas são contínuas, com apoios a cada paineisPorVao painéis, e as torres 
+estaiadas, para que o condicionamento de Ku não cresça sem limite com o tamanho
+e a conferência com a solução de referência continue significativa.
+
+Todas as funções retornam um ModeloTrelica (modeloTrelica.py), com os nós e
+elementos numerados a partir de 1; use paraDicionarios() para as entradas de
+calculoTrelicaPlana.
+
+Unidades adotadas: kN e cm
+
+@autor: argenta
+"""
+import numpy as np
+from modeloTrelica import ModeloTrelica
+
+def _modelo(coords, conect, E, A, cargas, apoios):
+    return ModeloTrelica(coords, conect, E, A, cargas, apoios,
+                         np.arange(1, len(coords) + 1), np.arange(1, len(conect) + 1))
+
+def _viga(nPaineis, largura, altura, tipo, E, A, carga, paineisPorVao):
+    '''
+    Vigas de banzos paralelos: nós inferiores 0..n e superiores a partir de n+1,
+    nas mesmas abscissas (Pratt e Howe) ou no meio dos painéis (Warren).
+    '''
+    n = int(nPaineis)
+    if n < 2:
+        raise ValueError('A viga deve ter pelo menos 2 painéis!')
+    x = np.arange(n + 1)*largura
+    inf = np.arange(n + 1)
+    i = np.arange(n)
+    
+    #posição de cada painel no seu vão, para o sentido das diagonais
+    p = max(2, int(paineisPorVao))
+    esquerda = i % p < np.minimum(p, n - i//p*p)/2
+
+    if tipo == 'warren':
+        #nós superiores no meio dos painéis e diagonais alternadas, sem montantes
+        xs = (x[:-1] + x[1:])/2
+        sup = i + n + 1
+        conect = np.concatenate([np.column_stack([inf[:-1], inf[1:]]),
+                                 np.column_stack([sup[:-1], sup[1:]]),
+                                 np.column_stack([inf[:-1], sup]),
+                                 np.column_stack([sup, inf[1:]])])
+    else:
+        xs = x
+        sup = inf + n + 1
+        if tipo == 'pratt':
+            #diagonal do nó superior para o inferior mais próximo do centro
+            diagonais = np.where(esquerda[:, None], np.column_stack([sup[:-1], inf[1:]]),
+                                 np.column_stack([inf[:-1], sup[1:]]))
+        else:
+            #diagonal do nó inferior para o superior mais próximo do centro
+            diagonais = np.where(esquerda[:, None], np.column_stack([inf[:-1], sup[1:]]),
+                                 np.column_stack([sup[:-1], inf[1:]]))
+        conect = np.concatenate([np.column_stack([inf[:-1], inf[1:]]),
+                                 np.column_stack([sup[:-1], sup[1:]]),
+                                 np.column_stack([inf, sup]),
+                                 diagonais])
+    coords = np.concatenate([np.column_stack([x, np.zeros(n + 1)]),
+                             np.column_stack([xs, np.full(len(xs), altura)])])
+
+    #cargas verticais nos nós inferiores internos, apoio fixo na primeira
+    #extremidade e móveis no fim de cada vão
+    cargas = np.zeros((len(coords), 2))
+    cargas[inf[1:-1], 1] = -carga
+    apoios = np.zeros((len(coords), 2), dtype=np.int8)
+    apoios[np.r_[inf[p::p], inf[-1]], 1] = 1
+    apoios[inf[0]] = (1, 1)
+    return _modelo(coords, conect, E, A, cargas, apoios)
+
+def pratt(nPaineis, largura=200., altura=200., E=20000., A=20., carga=10., paineisPorVao=20):
+    '''
+    Viga Pratt contínua com nPaineis painéis (4·nPaineis + 1 barras) de largura e 
+    altura dadas e apoios a cada paineisPorVao painéis.
+    '''
+    return _viga(nPaineis, largura, altura, 'pratt', E, A, carga, paineisPorVao)
+
+def howe(nPaineis, largura=200., altura=200., E=20000., A=20., carga=10., paineisPorVao=20):
+    '''
+    Viga Howe contínua com nPaineis painéis (4·nPaineis + 1 barras) de largura e 
+    altura dadas e apoios a cada paineisPorVao painéis.
+    '''
+    return _viga(nPaineis, largura, altura, 'howe', E, A, carga, paineisPorVao)
+
+def warren(nPaineis, largura=200., altura=200., E=20000., A=20., carga=10., paineisPorVao=20):
+    '''
+    Viga Warren contínua com nPaineis painéis (4·nPaineis - 1 barras) de largura e 
+    altura dadas e apoios a cada paineisPorVao painéis.
+    '''
+    return _viga(nPaineis, largura, altura, 'warren', E, A, carga, paineisPorVao)
+
+def torre(nNiveis, largura=300., alturaNivel=250., E=20000., A=20., carga=5., niveisPorEstai=20):
+    '''
+    Torre de transmissão com nNiveis níveis (5·nNiveis + 1 barras): duas pernas,
+    horizontais em cada nível e travamento em X, com os pés das duas pernas
+    apoiados em X e Y (rótulas fixas, sem engaste), cargas laterais em todos os
+    níveis e estais horizontais (restrição em X da perna esquerda) a cada 
+    niveisPorEstai níveis.
+    '''
+    n = int(nNiveis)
+    if n < 1:
+        raise ValueError('A torre deve ter pelo menos 1 nível!')
+    #afunilamento linear das pernas até a metade da largura no topo
+    y = np.arange(n + 1)*alturaNivel
+    meia = largura/2*(1 - 0.5*np.arange(n + 1)/n)
+    e = max(1, int(niveisPorEstai))
+    coords = np.concatenate([np.column_stack([-meia, y]), np.column_stack([meia, y])])
+    esq = np.arange(n + 1)
+    direita = esq + n + 1
+
+    conect = np.concatenate([np.column_stack([esq[:-1], esq[1:]]),
+                             np.column_stack([direita[:-1], direita[1:]]),
+                             np.column_stack([esq[1:], direita[1:]]),
+                             np.column_stack([esq[:-1], direita[1:]]),
+                             np.column_stack([direita[:-1], esq[1:]]),
+                             np.column_stack([esq[:1], direita[:1]])])
+
+    cargas = np.zeros((len(coords), 2))
+    cargas[esq[1:], 0] = carga
+    apoios = np.zeros((len(coords), 2), dtype=np.int8)
+    apoios[esq[e::e], 0] = 1
+    apoios[[esq[0], direita[0]]] = 1
+    return _modelo(coords, conect, E, A, cargas, apoios)
+
+def grade(nx, ny, passo=100., E=20000., A=20., carga=10.):
+    '''
+    Grade retangular de nx por ny células com as duas diagonais em cada célula
+    (aproximadamente 4·nx·ny barras), com os nós da borda esquerda apoiados em X
+    e Y (rótulas fixas) e com cargas na borda direita.
+    '''
+    nx, ny = int(nx), int(ny)
+    if nx < 1 or ny < 1:
+        raise ValueError('A grade deve ter pelo menos 1 célula em cada direção!')
+    i, j = np.meshgrid(np.arange(nx + 1), np.arange(ny + 1), indexing='ij')
+    no = i*(ny + 1) + j
+    coords = np.column_stack([i.ravel()*passo, j.ravel()*passo])
+
+    conect = np.concatenate([np.column_stack([no[:-1, :].ravel(), no[1:, :].ravel()]),
+                             np.column_stack([no[:, :-1].ravel(), no[:, 1:].ravel()]),
+                             np.column_stack([no[:-1, :-1].ravel(), no[1:, 1:].ravel()]),
+                             np.column_stack([no[1:, :-1].ravel(), no[:-1, 1:].ravel()])])
+
+    cargas = np.zeros((len(coords), 2))
+    cargas[no[-1, :], 1] = -carga
+    apoios = np.zeros((len(coords), 2), dtype=np.int8)
+    apoios[no[0, :]] = 1
+    return _modelo(coords, conect, E, A, cargas, apoios)
+
+TIPOS = ('pratt', 'howe', 'warren', 'torre', 'grade')
+
+def geraTrelica(tipo, nBarras):
+    '''
+    Gera a treliça do tipo ('pratt', 'howe', 'warren', 'torre' ou 'grade') com
+    aproximadamente nBarras barras.
+    '''
+    nBarras = max(int(nBarras), 10)
+    if tipo in ('pratt', 'howe'):
+        return pratt(max(2, (nBarras - 1)//4)) if tipo == 'pratt' else howe(max(2, (nBarras - 1)//4))
+    elif tipo == 'warren':
+        return warren(max(2, (nBarras + 1)//4))
+    elif tipo == 'torre':
+        return torre(max(1, (nBarras - 1)//5))
+    elif tipo == 'grade':
+        #grade alongada na proporção 4:1
+        ny = max(1, int(round(np.sqrt(nBarras/16))))
+        return grade(max(1, nBarras//(4*ny)), ny)
+    raise ValueError(f'Tipo de treliça {tipo} desconhecido! Use um entre {TIPOS}.')
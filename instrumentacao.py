@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Módulo para a instrumentação opcional do cálculo de treliças planas:
+    - Estatisticas: coleta o tempo (e, opcionalmente, o pico de memória) de cada
+      fase, o tamanho dos arrays alocados, as quantidades de graus de liberdade e
+      de termos não nulos e o resíduo e a estimativa do número de condição da
+      solução, entregando cada fase a uma função de retorno, se dada;
+    - estatisticas(arg): normaliza o argumento estatisticas das funções de cálculo
+      (None, uma Estatisticas ou uma função de retorno).
+
+Sem instrumentação, as funções de cálculo recebem SEM_ESTATISTICAS, cujos métodos
+não fazem nada, e o custo fica restrito a algumas chamadas vazias por solução.
+
+Fases registradas por calculoTrelicaPlana (FASES): entrada, estabilidade, geometria,
+montagem, particao, forcas, fatoracao, solucao, reacoes, recuperacao e, fora do tempo da 
+solução, verificacao (resíduo e condição) e, com o cache em disco, cache (cacheTrelica.py).
+
+@autor: argenta
+"""
+import time
+import tracemalloc
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+FASES = ('entrada', 'estabilidade', 'geometria', 'montagem', 'particao', 'forcas', 'fatoracao', 'solucao',
+         'reacoes', 'recuperacao')
+
+def bytesArray(A):
+    '''
+    Memória ocupada (bytes) por um array NumPy ou por uma matriz esparsa.
+    '''
+    if sp.issparse(A):
+        return sum(getattr(A, nome).nbytes for nome in ('data', 'indices', 'indptr', 'row', 'col')
+                   if hasattr(A, nome))
+    return np.asarray(A).nbytes
+
+class Estatisticas:
+    '''
+    Classe que coleta as estatísticas de uma solução. As fases são marcadas em
+    sequência com marca(nome), que encerra a fase anterior.
+
+    Entrada
+    -------
+        * callback: função chamada como callback(fase, dados) ao fim de cada fase,
+          com dados = {'tempo': s, 'memoria': bytes ou None, ...} e as alocações e
+          contagens registradas na fase, e como callback('resumo', relatorio())
+          ao fim da solução;
+        * memoria: medição do pico de memória de cada fase com tracemalloc (custo
+          alto: use somente no diagnóstico);
+        * condicao: estimativa do número de condição de Ku na norma 1, opcional
+          (algumas substituições com a fatoração existente, cada uma um CG
+          completo com solucionador='gc'); sem ela, condicao fica None.
+
+    Atributos
+    ---------
+        * tempos: dicionário fase -> tempo acumulado em segundos;
+        * memoria: dicionário fase -> pico de memória em bytes (com memoria=True);
+        * alocacoes: dicionário array -> bytes;
+        * contagens: dicionário com nNos, nElems, nGLs, nGLsLivres, nGLsRestringidos,
+          nnzKu...;
+        * solucionador: relatório do Solucionador acrescido do residuo relativo e
+          da condicao.
+
+    '''
+    ativa = True
+
+    def __init__(self, callback=None, memoria=False, condicao=False):
+        self.callback = callback
+        self.medirMemoria = memoria
+        self.estimarCondicao = condicao
+        self.tempos = {}
+        self.memoria = {}
+        self.alocacoes = {}
+        self.contagens = {}
+        self.solucionador = {}
+        self._fase = None
+        self._inicio = 0.
+        self._dadosFase = {}
+        self._iniciouTracemalloc = False
+
+    def marca(self, fase=None):
+        '''
+        Encerra a fase atual e inicia a fase dada (None somente encerra).
+        '''
+        agora = time.perf_counter()
+        if self._fase is not None:
+            tempo = agora - self._inicio
+            self.tempos[self._fase] = self.tempos.get(self._fase, 0.) + tempo
+            pico = None
+            if self.medirMemoria:
+                pico = tracemalloc.get_traced_memory()[1]
+                self.memoria[self._fase] = max(self.memoria.get(self._fase, 0), pico)
+            if self.callback is not None:
+                self.callback(self._fase, {'tempo': tempo, 'memoria': pico, **self._dadosFase})
+
+        self._fase = fase
+        self._dadosFase = {}
+        if fase is not None and self.medirMemoria:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._iniciouTracemalloc = True
+            tracemalloc.reset_peak()
+        self._inicio = time.perf_counter()
+
+    def aloca(self, **arrays):
+        '''
+        Registra a memória dos arrays (densos ou esparsos) dados por nome.
+        '''
+        for nome, A in arrays.items():
+            self.alocacoes[nome] = self._dadosFase[nome] = bytesArray(A)
+
+    def conta(self, **contagens):
+        '''
+        Registra as quantidades dadas por nome.
+        '''
+        self.contagens.update(contagens)
+        self._dadosFase.update(contagens)
+
+    def verificaSolucao(self, Ku, Us, Fu, solver):
+        '''
+        Registra o relatório do solucionador, o resíduo relativo ‖Ku·Us - Fu‖/‖Fu‖
+        e, com condicao=True, a estimativa de Hager-Higham do número de condição
+        ‖Ku‖₁·‖Ku⁻¹‖₁, com Ku⁻¹ aplicada pela fatoração existente.
+        '''
+        self.marca('verificacao')
+        normaF = np.linalg.norm(Fu)
+        residuo = np.linalg.norm(Ku @ Us - Fu)/normaF if normaF > 0 else 0.
+        condicao = None
+        if self.estimarCondicao and Ku.shape[0]:
+            n = Ku.shape[0]
+            inversa = spla.LinearOperator((n, n), matvec=solver.resolver, rmatvec=solver.resolver,
+                                          matmat=solver.resolver, dtype=float)
+            tempoSolucao, iteracoes = solver.tempoSolucao, solver.iteracoes
+            condicao = float(spla.onenormest(Ku)*spla.onenormest(inversa))
+            #as substituições da estimativa não entram no relatório da solução
+            solver.tempoSolucao, solver.iteracoes = tempoSolucao, iteracoes
+        self.solucionador = {**solver.relatorio(), 'residuo': float(residuo), 'condicao': condicao}
+        self._dadosFase.update(residuo=float(residuo), condicao=condicao)
+
+    def finaliza(self):
+        '''
+        Encerra a última fase, para o tracemalloc iniciado aqui e envia o resumo.
+        '''
+        self.marca(None)
+        if self._iniciouTracemalloc:
+            tracemalloc.stop()
+            self._iniciouTracemalloc = False
+        if self.callback is not None:
+            self.callback('resumo', self.relatorio())
+
+    def relatorio(self):
+        '''
+        Dicionário com todas as estatísticas coletadas, pronto para JSON. O total
+        não inclui a verificação, que não faz parte da solução.
+        '''
+        return {'tempos': dict(self.tempos),
+                'total': sum(t for fase, t in self.tempos.items() if fase != 'verificacao'),
+                'memoria': dict(self.memoria) if self.medirMemoria else None,
+                'alocacoes': dict(self.alocacoes), 'contagens': dict(self.contagens),
+                'solucionador': dict(self.solucionador)}
+
+class _SemEstatisticas:
+    '''
+    Instrumentação desligada: todos os métodos são vazios.
+    '''
+    ativa = False
+
+    def marca(self, fase=None):
+        pass
+
+    def aloca(self, **arrays):
+        pass
+
+    def conta(self, **contagens):
+        pass
+
+    def verificaSolucao(self, Ku, Us, Fu, solver):
+        pass
+
+    def finaliza(self):
+        pass
+
+SEM_ESTATISTICAS = _SemEstatisticas()
+
+def estatisticas(arg):
+    '''
+    Normalização do argumento estatisticas das funções de cálculo: None desliga
+    a instrumentação, uma Estatisticas é usada como está e uma função é usada
+    como callback de uma nova Estatisticas.
+    '''
+    if arg is None:
+        return SEM_ESTATISTICAS
+    if isinstance(arg, (Estatisticas, _SemEstatisticas)):
+        return arg
+    if callable(arg):
+        return Estatisticas(callback=arg)
+    raise ValueError('O argumento estatisticas deve ser None, uma Estatisticas ou uma função! ' +\
+                     'Verifique as entradas.')
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Módulo para a solução em lote de milhares de amostras de uma mesma treliça
+pequena (Monte Carlo, confiabilidade), com a topologia fixa e os módulos de
+elasticidade e as áreas variando por amostra:
+    - preparaTopologia(modelo): dados fixos da topologia, com as matrizes de
+      espalhamento das rigidezes unitárias b·bᵀ nos graus de liberdade livres;
+    - calculoLote(modelo, Es, As, ...): solução de todas as amostras em arrays;
+    - calculoTrelicaPlanaLote(coordNos, incElems, cargas, apoios, Es, As, ...):
+      a mesma solução com os dicionários de entrada de calculoTrelicaPlana.
+
+As matrizes Ku de um bloco de amostras são montadas de uma só vez como a pilha
+(nAmostras, nLivres, nLivres) = (E·A/L) @ P, com P o espalhamento das rigidezes
+unitárias, e resolvidas com uma única chamada de np.linalg.solve, sem nenhum
+laço do Python por amostra. Os blocos podem ser divididos entre processos, com
+as entradas e as saídas em memória compartilhada (multiprocessing.shared_memory).
+
+@autor: argenta
+"""
+import numpy as np
+import scipy.sparse as sp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import funcoesAuxiliares as fa
+from modeloTrelica import ModeloTrelica
+
+CAMPOS = ('desloc', 'reacoes', 'deformacoes', 'tensoes', 'normais')
+
+def preparaTopologia(modelo):
+    '''
+    Função para os dados fixos da topologia de um ModeloTrelica, calculados uma
+    única vez para todas as amostras.
+
+    Saída
+    -----
+        * topologia: dicionário com a estrutura montada (indexadores, comprimentos,
+          senos, cossenos e partição dos graus de liberdade), as cargas F (nGLs,)
+          e as matrizes esparsas Pu (nElems, nLivres²) e Pr (nElems, nRest·nLivres)
+          que espalham as rigidezes unitárias de cada barra em Ku e Kr.
+    '''
+    estrutura = modelo.montar(esparsa=True) #com a verificação da estabilidade
+    GLslivr, GLsrest = estrutura['GLslivr'], estrutura['GLsrest']
+    nLivr = len(GLslivr)
+    mapaLivres = np.full(estrutura['nGLs'], -1)
+    mapaLivres[GLslivr] = np.arange(nLivr)
+    mapaRest = np.full(estrutura['nGLs'], -1)
+    mapaRest[GLsrest] = np.arange(len(GLsrest))
+
+    # Rigidezes unitárias b·bᵀ (EA/L = 1) e posições de cada uma das 16 entradas
+    uns = np.ones(len(estrutura['comps']))
+    unitarias = fa.matRig_TPLote(uns, uns, uns, estrutura['sens'], estrutura['coss']).reshape(-1)
+    indis = estrutura['indis']
+    lins = np.repeat(indis, 4, axis=1).ravel()
+    cols = np.tile(indis, (1, 4)).ravel()
+    elems = np.repeat(np.arange(len(indis)), 16)
+
+    def espalhamento(mapaLinhas, nLinhas):
+        validas = (mapaLinhas[lins] >= 0) & (mapaLivres[cols] >= 0)
+        posicoes = mapaLinhas[lins[validas]]*nLivr + mapaLivres[cols[validas]]
+        return sp.coo_matrix((unitarias[validas], (elems[validas], posicoes)),
+                             shape=(len(indis), nLinhas*nLivr)).tocsr()
+
+    topologia = {campo: estrutura[campo] for campo in ('indis', 'comps', 'sens', 'coss', 'nGLs',
+                                                       'GLslivr', 'GLsrest')}
+    topologia.update(F=modelo.cargas.ravel().copy(), Pu=espalhamento(mapaLivres, nLivr),
+                     Pr=espalhamento(mapaRest, len(GLsrest)))
+    return topologia
+
+def _resolveBloco(topologia, Es, As, F):
+    '''
+    Solução de um bloco de amostras: Es e As (n, nElems) e F (nGLs,) ou (n, nGLs).
+    '''
+    n = len(Es)
+    GLslivr, GLsrest = topologia['GLslivr'], topologia['GLsrest']
+    nLivr, nRest = len(GLslivr), len(GLsrest)
+    F = np.broadcast_to(F, (n, topologia['nGLs']))
+
+    # Pilhas de Ku e Kr: (E·A/L) @ P, calculado como (Pᵀ @ (E·A/L)ᵀ)ᵀ com P esparsa
+    kfac = Es*As/topologia['comps']
+    Ku = (topologia['Pu'].T @ kfac.T).T.reshape(n, nLivr, nLivr)
+    Kr = (topologia['Pr'].T @ kfac.T).T.reshape(n, nRest, nLivr)
+
+    # Solução de todas as amostras com uma única chamada do LAPACK em lote
+    Us = np.linalg.solve(Ku, F[:, GLslivr][:, :, None])[:, :, 0]
+    Ug = np.zeros((n, topologia['nGLs']))
+    Ug[:, GLslivr] = Us
+    Rg = np.zeros((n, topologia['nGLs']))
+    Rg[:, GLsrest] = np.einsum('sij,sj->si', Kr, Us) - F[:, GLsrest]
+
+    # Deformações, tensões e esforços normais
+    ue = Ug[:, topologia['indis']] #(n, nElems, 4)
+    alongs = topologia['coss']*(ue[:, :, 2] - ue[:, :, 0]) + topologia['sens']*(ue[:, :, 3] - ue[:, :, 1])
+    defos = alongs/topologia['comps']
+    tenss = Es*defos
+    return Ug, Rg, defos, tenss, As*tenss
+
+def calculoLote(modelo, Es, As, F=None, tamanhoBloco=1024, processos=None):
+    '''
+    Função para a solução de nAmostras da treliça do ModeloTrelica com os
+    módulos de elasticidade e as áreas de cada amostra.
+
+    Entrada
+    -------
+        * modelo: ModeloTrelica com a topologia, as coordenadas, os apoios e as
+          cargas (seus Es e As não são usados);
+        * Es, As: arrays (nAmostras, nElems) com os módulos de elasticidade e as
+          áreas de cada amostra, ou (nElems,) para valores fixos;
+        * F: forças nodais (nGLs,) ou (1, nGLs), as mesmas em todas as amostras,
+          ou (nAmostras, nGLs) (padrão: as cargas do modelo);
+        * tamanhoBloco: quantidade de amostras resolvidas de uma só vez, que
+          limita a memória a tamanhoBloco·nLivres² valores;
+        * processos: quantidade de processos para dividir os blocos (padrão:
+          sem processos, tudo no processo atual).
+
+    Saída
+    -----
+        * desloc, reacoes: arrays (nAmostras, nNos, 2);
+        * deformacoes, tensoes, normais: arrays (nAmostras, nElems).
+
+    '''
+    topologia = preparaTopologia(modelo)
+    nElems, nGLs = modelo.nElems, topologia['nGLs']
+    Es, As = np.atleast_2d(np.asarray(Es, dtype=float)), np.atleast_2d(np.asarray(As, dtype=float))
+    nAmostras = max(len(Es), len(As))
+    Es = np.ascontiguousarray(np.broadcast_to(Es, (nAmostras, nElems)))
+    As = np.ascontiguousarray(np.broadcast_to(As, (nAmostras, nElems)))
+    F = topologia['F'] if F is None else np.asarray(F, dtype=float)
+    if F.shape == (1, nGLs): #as mesmas forças em todas as amostras
+        F = F[0]
+    if F.shape not in ((nGLs,), (nAmostras, nGLs)):
+        raise ValueError(f'As forças devem ter a forma ({nGLs},), (1, {nGLs}) ou (nAmostras, nGLs) = ' +\
+                         f'({nAmostras}, {nGLs}), e não {F.shape}! Verifique F.')
+
+    formas = {'desloc': (nAmostras, nGLs), 'reacoes': (nAmostras, nGLs), 'deformacoes': (nAmostras, nElems),
+              'tensoes': (nAmostras, nElems), 'normais': (nAmostras, nElems)}
+    blocos = [(i, min(i + tamanhoBloco, nAmostras)) for i in range(0, nAmostras, max(1, int(tamanhoBloco)))]
+
+    if not processos or processos <= 1 or len(blocos) == 1:
+        saidas = {campo: np.empty(forma) for campo, forma in formas.items()}
+        for i0, i1 in blocos:
+            for campo, valores in zip(CAMPOS, _resolveBloco(topologia, Es[i0:i1], As[i0:i1],
+                                                            F if F.ndim == 1 else F[i0:i1])):
+                saidas[campo][i0:i1] = valores
+    else:
+        saidas = _calculoProcessos(topologia, Es, As, F, formas, blocos, processos)
+
+    return (saidas['desloc'].reshape(nAmostras, -1, 2), saidas['reacoes'].reshape(nAmostras, -1, 2),
+            saidas['deformacoes'], saidas['tensoes'], saidas['normais'])
+
+def calculoTrelicaPlanaLote(coordNos, incElems, cargas, apoios, Es, As, F=None, tamanhoBloco=1024,
+                            processos=None):
+    '''
+    Função de calculoLote com os dicionários de entrada de calculoTrelicaPlana:
+    as colunas de Es e As seguem a ordem de incElems e as linhas dos resultados
+    dos nós a ordem de coordNos.
+    '''
+    unitarios = dict.fromkeys(incElems, 1.)
+    modelo = ModeloTrelica.deDicionarios(coordNos, incElems, unitarios, unitarios, cargas, apoios)
+    return calculoLote(modelo, Es, As, F, tamanhoBloco, processos)
+
+### PROCESSOS COM MEMÓRIA COMPARTILHADA ---------------------------------------
+
+def _trabalhador(topologia, nomes, formas, i0, i1, F):
+    '''
+    Solução de um bloco em outro processo, anexado aos arrays compartilhados (o
+    rastreador de recursos é o do processo principal, que os apaga ao final).
+    '''
+    memorias = {campo: shared_memory.SharedMemory(name=nome) for campo, nome in nomes.items()}
+    try:
+        arrays = {campo: np.ndarray(formas[campo], dtype=float, buffer=memorias[campo].buf)
+                  for campo in memorias}
+        Fbloco = F if F is not None else arrays['F'][i0:i1]
+        for campo, valores in zip(CAMPOS, _resolveBloco(topologia, arrays['Es'][i0:i1],
+                                                        arrays['As'][i0:i1], Fbloco)):
+            arrays[campo][i0:i1] = valores
+        del arrays
+    finally:
+        for memoria in memorias.values():
+            memoria.close()
+
+def _calculoProcessos(topologia, Es, As, F, formas, blocos, processos):
+    '''
+    Divisão dos blocos entre os processos: Es, As (e F por amostra) são copiados
+    uma única vez para a memória compartilhada, e cada processo lê o seu bloco e
+    escreve os resultados diretamente nos arrays compartilhados de saída.
+    '''
+    entradas = {'Es': Es, 'As': As}
+    if F.ndim == 2:
+        entradas['F'] = np.ascontiguousarray(np.broadcast_to(F, (len(Es), F.shape[-1])))
+    formas = {**formas, **{campo: valores.shape for campo, valores in entradas.items()}}
+
+    memorias = {}
+    try:
+        for campo, forma in formas.items():
+            memorias[campo] = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(forma))*8))
+        for campo, valores in entradas.items():
+            np.ndarray(formas[campo], dtype=float, buffer=memorias[campo].buf)[:] = valores
+        nomes = {campo: memoria.name for campo, memoria in memorias.items()}
+
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            tarefas = [executor.submit(_trabalhador, topologia, nomes, formas, i0, i1,
+                                       F if F.ndim == 1 else None) for i0, i1 in blocos]
+            for tarefa in tarefas:
+                tarefa.result()
+
+        return {campo: np.ndarray(formas[campo], dtype=float, buffer=memorias[campo].buf).copy()
+                for campo in CAMPOS}
+    finally:
+        for memoria in memorias.values():
+            memoria.close()
+            memoria.unlink()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Módulo para o modelo compacto de treliça plana em arrays:
+    - MapaRotulos: mapa entre os rótulos (quaisquer) e as posições dos nós ou elementos;
+    - ModeloTrelica: entradas da treliça em arrays contíguos float64/int32, com
+      construção a partir dos seis dicionários de entrada e volta para eles;
+    - ResultadosTrelica: resultados em arrays NumPy, com os dicionários de
+      calculoTrelicaPlana gerados somente quando pedidos.
+
+Os dicionários de entrada e de saída custam centenas de bytes por item; aqui cada
+nó custa 2 coordenadas, 2 cargas e 2 condições de apoio e cada elemento 2 posições,
+o módulo de elasticidade e a área.
+
+@autor: argenta
+"""
+import numpy as np
+import funcoesAuxiliares as fa
+import calculoTrelica as cal
+import solucionadores as sol
+import instrumentacao as ins
+
+class MapaRotulos:
+    '''
+    Classe do mapa rótulo <-> posição. Para rótulos inteiros não é criado nenhum
+    dicionário: a busca é feita com a ordenação dos rótulos (np.searchsorted),
+    de forma vetorizada.
+
+    Entrada
+    -------
+        * rotulos: sequência com os rótulos, na ordem das posições.
+
+    '''
+    __slots__ = ('rotulos', '_ordem', '_ordenados', '_dic')
+
+    def __init__(self, rotulos):
+        arranjo = np.asarray(rotulos)
+        if arranjo.dtype.kind not in 'iu' or arranjo.ndim != 1:
+            #os próprios rótulos, sem a conversão dos rótulos mistos para texto
+            #(1 -> '1') nem dos rótulos em tuplas para um array 2D
+            arranjo = np.empty(len(arranjo), dtype=object)
+            arranjo[:] = list(rotulos)
+        rotulos = arranjo
+        self.rotulos = rotulos
+        self._ordem = self._ordenados = self._dic = None
+        if rotulos.dtype.kind in 'iu':
+            self._ordem = np.argsort(rotulos, kind='stable')
+            self._ordenados = rotulos[self._ordem]
+            if len(rotulos) > 1 and not np.all(np.diff(self._ordenados)):
+                raise ValueError('Existem rótulos repetidos! Verifique as entradas.')
+        else:
+            self._dic = {r: i for i, r in enumerate(rotulos.tolist())}
+            if len(self._dic) != len(rotulos):
+                raise ValueError('Existem rótulos repetidos! Verifique as entradas.')
+
+    def __len__(self):
+        return len(self.rotulos)
+
+    def indices(self, rotulos):
+        '''
+        Posições (array int) de uma sequência de rótulos.
+        '''
+        if self._dic is not None:
+            try:
+                return np.array([self._dic[r] for r in rotulos], dtype=np.intp)
+            except KeyError as erro:
+                raise ValueError(f'O rótulo {erro.args[0]} não existe! Verifique as entradas.') from None
+
+        rotulos = np.asarray(rotulos)
+        pos = np.searchsorted(self._ordenados, rotulos)
+        pos = np.minimum(pos, len(self._ordenados) - 1)
+        invalidos = self._ordenados[pos] != rotulos if len(self._ordenados) else np.ones(rotulos.shape, bool)
+        if np.any(invalidos):
+            raise ValueError(f'O rótulo {rotulos[invalidos].ravel()[0]} não existe! Verifique as entradas.')
+        return self._ordem[pos]
+
+    def indice(self, rotulo):
+        '''
+        Posição de um único rótulo.
+        '''
+        return int(self.indices([rotulo])[0])
+
+class ModeloTrelica:
+    '''
+    Classe do modelo de treliça plana em arrays contíguos.
+
+    Entrada
+    -------
+        * coords: array (nNos, 2) com as coordenadas dos nós;
+        * conect: array (nElems, 2) com as posições dos nós inicial e final;
+        * Es: array (nElems,) com os módulos de elasticidade;
+        * As: array (nElems,) com as áreas das seções transversais;
+        * cargas: array (nNos, 2) com as cargas X e Y de cada nó (padrão: zeros);
+        * apoios: array (nNos, 2) com 1 para restringido e 0 para livre (padrão: zeros);
+        * rotulosNos: rótulos dos nós (padrão: 0, 1, 2...);
+        * rotulosElems: rótulos dos elementos (padrão: 0, 1, 2...).
+
+    '''
+    __slots__ = ('coords', 'conect', 'Es', 'As', 'cargas', 'apoios', 'mapaNos', 'mapaElems')
+
+    def __init__(self, coords, conect, Es, As, cargas=None, apoios=None, rotulosNos=None,
+                 rotulosElems=None):
+        self.coords = np.ascontiguousarray(coords, dtype=np.float64).reshape(-1, 2)
+        self.conect = np.ascontiguousarray(conect, dtype=np.int32).reshape(-1, 2)
+        nNos, nElems = len(self.coords), len(self.conect)
+        self.Es = np.ascontiguousarray(np.broadcast_to(np.asarray(Es, dtype=np.float64), (nElems,)))
+        self.As = np.ascontiguousarray(np.broadcast_to(np.asarray(As, dtype=np.float64), (nElems,)))
+        self.cargas = np.zeros((nNos, 2)) if cargas is None else \
+                      np.ascontiguousarray(cargas, dtype=np.float64).reshape(nNos, 2)
+        self.apoios = np.zeros((nNos, 2), dtype=np.int8) if apoios is None else \
+                      np.ascontiguousarray(apoios, dtype=np.int8).reshape(nNos, 2)
+
+        if nElems and (self.conect.min() < 0 or self.conect.max() >= nNos):
+            raise ValueError('A conectividade possui nós inexistentes! Verifique as entradas em conect.')
+        if not np.isin(self.apoios, (0, 1)).all():
+            raise ValueError('Somente graus de liberdade livres ou restringidos! Verifique as entradas em apoios.')
+
+        self.mapaNos = MapaRotulos(np.arange(nNos) if rotulosNos is None else rotulosNos)
+        self.mapaElems = MapaRotulos(np.arange(nElems) if rotulosElems is None else rotulosElems)
+        if len(self.mapaNos) != nNos or len(self.mapaElems) != nElems:
+            raise ValueError('A quantidade de rótulos não confere com a de nós ou de elementos!')
+
+    @classmethod
+    def deDicionarios(cls, coordNos, incElems, materiais, secoes, cargas, apoios):
+        '''
+        Criação do modelo a partir dos seis dicionários de entrada de calculoTrelicaPlana.
+        '''
+        posNos = fa.numeracaoNos(coordNos)
+        nGLs = 2*len(coordNos)
+        conect, _ = fa.indexadoresElems(posNos, incElems)
+        _, GLsrest = fa.particionaGLs(posNos, apoios, nGLs)
+        restricoes = np.zeros(nGLs, dtype=np.int8)
+        restricoes[GLsrest] = 1
+        return cls(np.array(list(coordNos.values()), dtype=float),
+                   conect,
+                   [materiais[elem] for elem in incElems],
+                   [secoes[elem] for elem in incElems],
+                   fa.vetorForcas(posNos, cargas, nGLs),
+                   restricoes,
+                   list(coordNos), list(incElems))
+
+    def paraDicionarios(self):
+        '''
+        Conversão do modelo de volta para os seis dicionários de entrada.
+        '''
+        nos = self.rotulosNos.tolist()
+        elems = self.rotulosElems.tolist()
+        coordNos = dict(zip(nos, map(tuple, self.coords.tolist())))
+        incElems = {elem: (nos[i], nos[j]) for elem, (i, j) in zip(elems, self.conect.tolist())}
+        materiais = dict(zip(elems, self.Es.tolist()))
+        secoes = dict(zip(elems, self.As.tolist()))
+        comCarga = np.flatnonzero(np.any(self.cargas != 0, axis=1))
+        cargas = {nos[p]: tuple(self.cargas[p].tolist()) for p in comCarga}
+        comApoio = np.flatnonzero(np.any(self.apoios != 0, axis=1))
+        apoios = {nos[p]: tuple(self.apoios[p].tolist()) for p in comApoio}
+        return coordNos, incElems, materiais, secoes, cargas, apoios
+
+    @property
+    def rotulosNos(self):
+        return self.mapaNos.rotulos
+
+    @property
+    def rotulosElems(self):
+        return self.mapaElems.rotulos
+
+    @property
+    def nNos(self):
+        return len(self.coords)
+
+    @property
+    def nElems(self):
+        return len(self.conect)
+
+    def glsLivresRestringidos(self):
+        '''
+        Graus de liberdade livres e restringidos, já pythonizados.
+        '''
+        restrito = self.apoios.ravel() == 1
+        return np.flatnonzero(~restrito), np.flatnonzero(restrito)
+
+    def verificarEstabilidade(self):
+        '''
+        Verificação rápida de mecanismos e apoios insuficientes (fa.verificaEstabilidade).
+        '''
+        fa.verificaEstabilidade(self.coords, self.conect, self.apoios, self.rotulosNos, self.rotulosElems)
+
+    def montar(self, esparsa=False, renumerar=False, estatisticas=None, guardaKrr=False):
+        '''
+        Montagem da estrutura (dicionário de cal.montaEstruturaArrays), após a
+        verificação da estabilidade.
+        '''
+        est = ins.estatisticas(estatisticas)
+        est.marca('estabilidade')
+        self.verificarEstabilidade()
+        GLslivr, GLsrest = self.glsLivresRestringidos()
+        return cal.montaEstruturaArrays(self.coords, self.conect, self.Es, self.As,
+                                        GLslivr, GLsrest, esparsa, renumerar, est, guardaKrr)
+
+    def calcular(self, esparsa=None, solucionador=None, opcoesSolucionador=None, info=None,
+                 renumerar=None, estatisticas=None):
+        '''
+        Solução do modelo com as opções de calculoTrelicaPlana, retornando um
+        ResultadosTrelica.
+        '''
+        esparsa, solucionador, renumerar = cal.escolheSolucionador(esparsa, solucionador, renumerar)
+        est = ins.estatisticas(estatisticas)
+        estrutura = self.montar(esparsa, renumerar, est)
+        F = self.cargas.ravel()
+
+        est.marca('fatoracao')
+        solver = sol.Solucionador(estrutura['Ku'], solucionador, **(opcoesSolucionador or {}))
+        est.marca('solucao')
+        Fu = F[estrutura['GLslivr']]
+        Us = solver.resolver(Fu)
+        est.verificaSolucao(estrutura['Ku'], Us, Fu, solver)
+        est.marca('reacoes')
+        Re = estrutura['Kr'] @ Us - F[estrutura['GLsrest']]
+        if info is not None:
+            info.update(solver.relatorio(), **estrutura.get('banda', {}))
+
+        est.marca('recuperacao')
+        resultados = ResultadosTrelica(self, *cal.recuperaResultados(estrutura, Us, Re))
+        est.finaliza()
+        return resultados
+
+class ResultadosTrelica:
+    '''
+    Classe dos resultados de um ModeloTrelica em arrays.
+
+    Atributos
+    ---------
+        * modelo: o ModeloTrelica resolvido;
+        * desloc: array (nNos, 2) com os deslocamentos X e Y;
+        * reacoes: array (nNos, 2) com as reações X e Y;
+        * deformacoes, tensoes, normais: arrays (nElems,) com os resultados dos elementos.
+
+    '''
+    __slots__ = ('modelo', 'desloc', 'reacoes', 'deformacoes', 'tensoes', 'normais')
+
+    def __init__(self, modelo, Ug, Rg, defos, tenss, norms):
+        self.modelo = modelo
+        self.desloc = np.asarray(Ug).reshape(-1, 2)
+        self.reacoes = np.asarray(Rg).reshape(-1, 2)
+        self.deformacoes = np.asarray(defos)
+        self.tensoes = np.asarray(tenss)
+        self.normais = np.asarray(norms)
+
+    def dicDeslocamentos(self):
+        return dict(zip(self.modelo.rotulosNos.tolist(), map(tuple, self.desloc.tolist())))
+
+    def dicReacoes(self):
+        return dict(zip(self.modelo.rotulosNos.tolist(), map(tuple, self.reacoes.tolist())))
+
+    def dicDeformacoes(self):
+        return dict(zip(self.modelo.rotulosElems.tolist(), self.deformacoes.tolist()))
+
+    def dicTensoes(self):
+        return dict(zip(self.modelo.rotulosElems.tolist(), self.tensoes.tolist()))
+
+    def dicNormais(self):
+        return dict(zip(self.modelo.rotulosElems.tolist(), self.normais.tolist()))
+
+    def paraDicionarios(self):
+        '''
+        Os resultados no formato de calculoTrelicaPlana:
+        (deslocamentos, RXY, deformacoes, tensoes, normais).
+        '''
+        return (self.dicDeslocamentos(), self.dicReacoes(), self.dicDeformacoes(),
+                self.dicTensoes(), self.dicNormais())
+
+# nomes usados pelos scripts de projeto
+TrussModel = ModeloTrelica
+TrussResults = ResultadosTrelica
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Módulo para o dimensionamento ótimo das seções das barras de treliças planas:
+mínimo peso com limites de tensão e de deslocamento.
+
+As sensibilidades em relação às áreas A das barras são analíticas, pelo método
+adjunto: para uma função g(U) com K·U = F,
+
+    dg/dAₑ = -ψₑᵀ·(∂K/∂Aₑ)·Uₑ = -(Eₑ/Lₑ)·(bₑᵀψₑ)·(bₑᵀUₑ),  com K·ψ = ∂g/∂U,
+
+e a solução adjunta ψ reaproveita a fatoração de Ku da análise: o gradiente
+custa uma substituição a mais por função, qualquer que seja o número de barras.
+    - sensibilidadeFlexibilidade: flexibilidade Fᵀ·U, autoadjunta (sem solução extra);
+    - sensibilidadeDeslocamento: combinação linear dos deslocamentos;
+    - sensibilidadeTensoesKS: agregação de Kreisselmeier-Steinhauser das razões
+      |σ|/σadm de todas as barras;
+    - sensibilidadeDeslocamentosKS: a mesma agregação das razões |u|/ulim;
+    - otimizaSecoes: laço de dimensionamento com a razão de tensões (barras
+      totalmente tensionadas) e o critério de otimalidade para o limite de
+      deslocamentos.
+
+@autor: argenta
+"""
+import numpy as np
+import funcoesAuxiliares as fa
+import calculoTrelica as cal
+import solucionadores as sol
+
+### SENSIBILIDADES ------------------------------------------------------------
+
+def _alongamentos(estrutura, Ug):
+    '''
+    Alongamentos bᵀ·Uₑ de todas as barras para os deslocamentos Ug (nGLs,).
+    '''
+    ue = Ug[estrutura['indis']]
+    return estrutura['coss']*(ue[:, 2] - ue[:, 0]) + estrutura['sens']*(ue[:, 3] - ue[:, 1])
+
+def _adjunta(estrutura, solver, Ug, dgdU):
+    '''
+    Derivadas dg/dA de todas as barras a partir do gradiente dgdU (nGLs,) de uma
+    função dos deslocamentos, com uma solução adjunta pela fatoração de solver.
+    '''
+    psi = np.zeros(estrutura['nGLs'])
+    psi[estrutura['GLslivr']] = solver.resolver(dgdU[estrutura['GLslivr']])
+    return -estrutura['Es']/estrutura['comps']*_alongamentos(estrutura, psi)*_alongamentos(estrutura, Ug)
+
+def _ks(g, rho):
+    '''
+    Agregação de Kreisselmeier-Steinhauser de g e os seus pesos dKS/dg.
+    '''
+    gmax = g.max()
+    expo = np.exp(rho*(g - gmax))
+    return gmax + np.log(expo.sum())/rho, expo/expo.sum()
+
+def sensibilidadeFlexibilidade(estrutura, Ug):
+    '''
+    Flexibilidade C = Fᵀ·U = Uᵀ·K·U e as suas derivadas dC/dAₑ = -Eₑ·δₑ²/Lₑ,
+    com os alongamentos δ, sem nenhuma solução extra.
+
+    Entrada
+    -------
+        * estrutura: dicionário de cal.montaEstrutura ou cal.montaEstruturaArrays;
+        * Ug: deslocamentos de todos os graus de liberdade (nGLs,).
+
+    Saída
+    -----
+        * C: a flexibilidade;
+        * dC: array (nElems,) com as derivadas em relação às áreas.
+    '''
+    alongs = _alongamentos(estrutura, Ug)
+    C = float(np.sum(estrutura['Es']*estrutura['As']/estrutura['comps']*alongs**2))
+    return C, -estrutura['Es']/estrutura['comps']*alongs**2
+
+def sensibilidadeDeslocamento(estrutura, solver, Ug, gls, pesos=None):
+    '''
+    Combinação linear dos deslocamentos u = Σ wⱼ·U[glⱼ] e as suas derivadas em
+    relação às áreas, com uma única solução adjunta.
+
+    Entrada
+    -------
+        * estrutura, Ug: como em sensibilidadeFlexibilidade;
+        * solver: o sol.Solucionador com a fatoração de Ku da análise;
+        * gls: graus de liberdade (de 0 a nGLs - 1) da combinação;
+        * pesos: pesos wⱼ (padrão: 1 para todos).
+
+    Saída
+    -----
+        * u: o valor da combinação;
+        * du: array (nElems,) com as derivadas em relação às áreas.
+    '''
+    gls = np.atleast_1d(np.asarray(gls, dtype=np.intp))
+    pesos = np.ones(len(gls)) if pesos is None else np.atleast_1d(np.asarray(pesos, dtype=float))
+    dgdU = np.bincount(gls, weights=pesos, minlength=estrutura['nGLs'])
+    return float(dgdU @ Ug), _adjunta(estrutura, solver, Ug, dgdU)
+
+def sensibilidadeTensoesKS(estrutura, solver, Ug, tensaoAdm, rho=50.):
+    '''
+    Agregação KS das razões |σₑ|/σadmₑ de todas as barras (≈ a maior razão,
+    por cima) e as suas derivadas em relação às áreas, com uma única solução
+    adjunta: as tensões não dependem diretamente das áreas, somente pelos
+    deslocamentos.
+
+    Entrada
+    -------
+        * estrutura, solver, Ug: como em sensibilidadeDeslocamento;
+        * tensaoAdm: tensão admissível, única ou array (nElems,);
+        * rho: parâmetro da agregação (maior, mais próxima do máximo).
+
+    Saída
+    -----
+        * ks: a razão agregada;
+        * dks: array (nElems,) com as derivadas em relação às áreas.
+    '''
+    EL = estrutura['Es']/estrutura['comps']
+    tensoes = EL*_alongamentos(estrutura, Ug)
+    sadm = np.broadcast_to(np.asarray(tensaoAdm, dtype=float), tensoes.shape)
+    ks, pesos = _ks(np.abs(tensoes)/sadm, rho)
+
+    # Gradiente em U: Σ pesoₑ·sinal(σₑ)/σadmₑ·(Eₑ/Lₑ)·bₑ nos graus de liberdade de cada barra
+    fator = pesos*np.sign(tensoes)/sadm*EL
+    b = np.stack([-estrutura['coss'], -estrutura['sens'], estrutura['coss'], estrutura['sens']], axis=1)
+    dgdU = np.bincount(estrutura['indis'].ravel(), weights=(fator[:, None]*b).ravel(),
+                       minlength=estrutura['nGLs'])
+    return float(ks), _adjunta(estrutura, solver, Ug, dgdU)
+
+def sensibilidadeDeslocamentosKS(estrutura, solver, Ug, gls, limites, rho=50.):
+    '''
+    Agregação KS das razões |U[glⱼ]|/limiteⱼ dos deslocamentos limitados e as
+    suas derivadas em relação às áreas, com uma única solução adjunta.
+
+    Entrada
+    -------
+        * estrutura, solver, Ug: como em sensibilidadeDeslocamento;
+        * gls: graus de liberdade limitados;
+        * limites: deslocamentos máximos (em módulo) de cada grau de liberdade;
+        * rho: parâmetro da agregação.
+
+    Saída
+    -----
+        * ks: a razão agregada;
+        * dks: array (nElems,) com as derivadas em relação às áreas.
+    '''
+    gls = np.asarray(gls, dtype=np.intp)
+    limites = np.asarray(limites, dtype=float)
+    ks, pesos = _ks(np.abs(Ug[gls])/limites, rho)
+    dgdU = np.bincount(gls, weights=pesos*np.sign(Ug[gls])/limites, minlength=estrutura['nGLs'])
+    return float(ks), _adjunta(estrutura, solver, Ug, dgdU)
+
+### DIMENSIONAMENTO ---------------------------------------------------------
+
+def otimizaSecoes(coordNos, incElems, materiais, secoes, cargas, apoios, tensaoAdm, limitesDesloc=None,
+                  densidades=1., Amin=1e-3, Amax=None, maxIter=100, tol=1e-4, eta=0.5, limiteMovimento=2.,
+                  rhoKS=50., esparsa=None, solucionador=None, opcoesSolucionador=None, info=None):
+    '''
+    Função para o dimensionamento das áreas das barras com o mínimo peso
+    Σ ρ·L·A, as tensões limitadas a tensaoAdm e os deslocamentos a limitesDesloc.
+
+    Em cada iteração a estrutura é montada e Ku é fatorada uma única vez, para
+    a análise e para a solução adjunta:
+        - razão de tensões: Aₑ·|σₑ|/σadmₑ, que leva as barras à tensão admissível;
+        - critério de otimalidade para a agregação KS dos deslocamentos g ≤ 1:
+          Aₑ·(-ν·(dg/dAₑ)/(ρₑ·Lₑ))^eta, com o multiplicador ν da bisseção que
+          anula a aproximação recíproca de g - 1, e Aₑ entre Aₑ/limiteMovimento
+          e Aₑ·limiteMovimento;
+        - a nova área é a maior das duas, entre Amin e Amax.
+
+    Entrada
+    -------
+        * coordNos, incElems, materiais, secoes, cargas, apoios: como em
+          calculoTrelicaPlana, com secoes as áreas iniciais;
+        * tensaoAdm: tensão admissível (tração e compressão), única ou
+          dicionário com o número do elemento como chave;
+        * limitesDesloc (opcional): dicionário com o número do nó como chave e a
+          tupla (limite X, limite Y) dos deslocamentos em módulo como valor, com
+          None nas direções sem limite;
+        * densidades: massa específica única ou dicionário por elemento;
+        * Amin, Amax: áreas mínima e máxima;
+        * maxIter, tol: iterações máximas e a variação relativa máxima das
+          áreas na convergência;
+        * eta, limiteMovimento, rhoKS: expoente e limite de movimento do
+          critério de otimalidade e parâmetro da agregação KS;
+        * esparsa, solucionador, opcoesSolucionador: como em calculoTrelicaPlana;
+        * relatório (opcional): info, dicionário preenchido com o histórico do
+          peso, da maior razão de tensões e da razão de deslocamentos, as
+          iterações e a convergência.
+
+    Saída
+    -----
+        * secoesOtimas: dicionário com o número do elemento como chave e a área
+          dimensionada como valor;
+        * resultados: a tupla (deslocamentos, RXY, deformacoes, tensoes, normais)
+          de calculoTrelicaPlana com as áreas dimensionadas.
+
+    '''
+    esparsa, solucionador, _ = cal.escolheSolucionador(esparsa, solucionador, False)
+    opcoesSolucionador = opcoesSolucionador or {}
+
+    # Montagem inicial, com a verificação da estabilidade, e dados fixos
+    estrutura = cal.montaEstrutura(coordNos, incElems, materiais, secoes, apoios, esparsa)
+    coords = np.array(list(coordNos.values()), dtype=float).reshape(-1, 2)
+    elems = estrutura['elems']
+    Fest = fa.vetorForcas(estrutura['posNos'], cargas, estrutura['nGLs'])
+    porElemento = lambda valor: np.array([valor[elem] for elem in elems], dtype=float) \
+                                if isinstance(valor, dict) else np.full(len(elems), float(valor))
+    sadm = porElemento(tensaoAdm)
+    pesosEspecificos = porElemento(densidades)*estrutura['comps'] #dW/dA
+    Amax = np.inf if Amax is None else Amax
+
+    # Graus de liberdade com deslocamento limitado
+    gls, limites = [], []
+    for no, lims in (limitesDesloc or {}).items():
+        for direcao, lim in enumerate(lims):
+            if lim is not None:
+                gls.append(int(fa.glsNos(estrutura['posNos'], [no])[0, direcao]))
+                limites.append(float(lim))
+    if np.any(np.asarray(limites) <= 0):
+        raise ValueError('Os limites de deslocamento devem ser positivos! Verifique limitesDesloc.')
+
+    As = np.clip(estrutura['As'].copy(), Amin, Amax)
+    historico = {'peso': [], 'razaoTensoes': [], 'razaoDeslocamentos': []}
+    convergiu = False
+    for iteracao in range(1, maxIter + 1):
+        # Análise com as áreas atuais e uma única fatoração
+        estrutura = cal.montaEstruturaArrays(coords, estrutura['conect'], estrutura['Es'], As,
+                                             estrutura['GLslivr'], estrutura['GLsrest'], esparsa)
+        solver = sol.Solucionador(estrutura['Ku'], solucionador, **opcoesSolucionador)
+        Ug = np.zeros(estrutura['nGLs'])
+        Ug[estrutura['GLslivr']] = solver.resolver(Fest[estrutura['GLslivr']])
+
+        razoes = np.abs(estrutura['Es']/estrutura['comps']*_alongamentos(estrutura, Ug))/sadm
+        historico['peso'].append(float(pesosEspecificos @ As))
+        historico['razaoTensoes'].append(float(razoes.max()))
+
+        # Razão de tensões
+        Anovo = As*razoes
+
+        # Critério de otimalidade para os deslocamentos, com a adjunta pela mesma fatoração
+        if gls:
+            g, dg = sensibilidadeDeslocamentosKS(estrutura, solver, Ug, gls, limites, rhoKS)
+            historico['razaoDeslocamentos'].append(g)
+            Anovo = np.maximum(Anovo, _criterioOtimalidade(As, g - 1., dg, pesosEspecificos, eta,
+                                                           limiteMovimento, Amin, Amax))
+
+        Anovo = np.clip(Anovo, Amin, Amax)
+        variacao = np.abs(Anovo - As).max()/As.max()
+        As = Anovo
+        if variacao <= tol:
+            convergiu = True
+            break
+
+    if info is not None:
+        info.update(historico, iteracoes=iteracao, convergiu=convergiu)
+
+    secoesOtimas = dict(zip(elems, As.tolist()))
+    resultados = cal.calculoTrelicaPlana(coordNos, incElems, materiais, secoesOtimas, cargas, apoios,
+                                         esparsa, solucionador, opcoesSolucionador)
+    return secoesOtimas, resultados
+
+def _criterioOtimalidade(As, g, dg, dW, eta, limiteMovimento, Amin, Amax):
+    '''
+    Atualização do critério de otimalidade para a restrição g ≤ 0, com o
+    multiplicador da bisseção (em escala logarítmica) que anula a aproximação
+    recíproca g + Σ -Aₑ²·(dg/dAₑ)·(1/Aₑnovo - 1/Aₑ).
+    '''
+    q = np.clip(-dg, 0., None)/dW
+    inferior, superior = As/limiteMovimento, As*limiteMovimento
+    def atualiza(nu):
+        return np.clip(np.clip(As*(nu*q)**eta, inferior, superior), Amin, Amax)
+    def aproximacao(Anovo):
+        return g - np.sum(As**2*dg*(1./Anovo - 1./As))
+
+    if not np.any(q > 0):
+        return np.clip(inferior, Amin, Amax)
+    #intervalo inicial com os valores de ν que levam todas as barras aos limites
+    escala = 1./q[q > 0]
+    a, b = np.log(escala.min()/limiteMovimento**(2/eta)), np.log(escala.max()*limiteMovimento**(2/eta))
+    for _ in range(100):
+        meio = (a + b)/2
+        if aproximacao(atualiza(np.exp(meio))) > 0:
+            a = meio
+        else:
+            b = meio
+        if b - a < 1e-10:
+            break
+    return atualiza(np.exp(b))
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Módulo para os solucionadores do sistema Ku·Us = Fu das treliças planas:
+    - 'densa': fatoração LU densa do LAPACK, a mesma de np.linalg.solve, para estruturas pequenas;
+    - 'cholesky': fatoração direta esparsa de Cholesky (CHOLMOD do scikit-sparse, se
+      instalado) ou LDLᵀ/LU esparsa simétrica do SuperLU com ordenação de grau mínimo;
+    - 'lu': LU esparsa do SuperLU com pivoteamento parcial, para as matrizes 
+      simétricas indefinidas (rigidez tangente após os pontos limite);
+    - 'gc': gradientes conjugados precondicionados (Jacobi ou fatoração incompleta),
+      sem fatoração, para as estruturas que não cabem na memória com os métodos diretos;
+    - 'banda': Cholesky em banda do LAPACK, O(n·b²), para as matrizes renumeradas 
+      com banda b pequena (treliças longas com a ordem de Cuthill-McKee).
+
+A fatoração é feita uma única vez na criação do Solucionador e pode ser reutilizada
+para quantos vetores (ou matrizes) de forças forem necessários. Com Ku singular,
+os métodos diretos lançam np.linalg.LinAlgError, como o np.linalg.solve original
+(pivô nulo ou não finito, negativo no 'cholesky' e, com a opção tolPivo, pequeno
+em relação ao maior).
+
+@autor: argenta
+"""
+import time
+import warnings
+import numpy as np
+import scipy.linalg as sla
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+try:
+    from sksparse.cholmod import cholesky as _cholmod
+except ImportError:
+    _cholmod = None
+
+METODOS = ('densa', 'cholesky', 'lu', 'gc', 'banda')
+
+class Solucionador:
+    '''
+    Classe que prepara (fatora) a matriz de rigidez dos graus de liberdade livres
+    com o método escolhido e resolve o sistema para um ou vários vetores de forças.
+
+    Entradas
+    --------
+        * Ku: matriz de rigidez dos graus de liberdade livres, densa ou esparsa;
+        * metodo: 'densa', 'cholesky', 'lu', 'gc' ou 'banda';
+        * tol: tolerância relativa do resíduo dos gradientes conjugados;
+        * maxiter: quantidade máxima de iterações dos gradientes conjugados;
+        * precondicionador: 'jacobi' ou 'ic' para os gradientes conjugados. O 'ic'
+          usa a fatoração incompleta do SuperLU (spilu), pois o SciPy não possui
+          Cholesky incompleto;
+        * tolPivo: nos métodos diretos, os pivôs com módulo até tolPivo vezes o
+          maior indicam Ku singular (padrão: 0, somente os pivôs nulos, pois as
+          matrizes válidas mal escaladas, como as de cabos e banzos rígidos com
+          E·A em mais de 15 ordens de grandeza, têm pivôs muito menores que o
+          maior; 1e-14 detecta também as matrizes singulares com arredondamento).
+
+    Atributos
+    ---------
+        * metodo: o método escolhido;
+        * backend: a biblioteca que efetivamente executou a solução;
+        * tempoFatoracao: tempo da fatoração (ou do precondicionador) em segundos;
+        * tempoSolucao: tempo acumulado das soluções em segundos;
+        * iteracoes: iterações da última chamada de resolver com gradientes
+          conjugados, somadas sobre as colunas de uma matriz de forças.
+
+    '''
+    def __init__(self, Ku, metodo='densa', tol=1e-10, maxiter=None, precondicionador='jacobi', tolPivo=0.):
+        if metodo not in METODOS:
+            raise ValueError(f'Solucionador {metodo} desconhecido! Use um entre {METODOS}.')
+
+        self.metodo = metodo
+        self.tol = tol
+        self.maxiter = maxiter
+        self.precondicionador = precondicionador
+        self.tolPivo = float(tolPivo)
+        self.nGLs = Ku.shape[0]
+        self.tempoSolucao = 0.
+        self.iteracoes = 0
+
+        t0 = time.perf_counter()
+        if metodo == 'densa':
+            Ku = Ku.toarray() if sp.issparse(Ku) else np.asarray(Ku, dtype=float)
+            with warnings.catch_warnings(): #o pivô nulo é tratado em _verificaPivos
+                warnings.simplefilter('ignore', sla.LinAlgWarning)
+                self._lu = sla.lu_factor(Ku, check_finite=False)
+            self.backend = 'lapack-getrf'
+            _verificaPivos(np.diag(self._lu[0]), self.backend, self.tolPivo)
+        elif metodo == 'cholesky':
+            Ku = sp.csc_matrix(Ku)
+            if _cholmod is not None:
+                self.backend = 'cholmod'
+                try:
+                    self._fator = _cholmod(Ku)
+                except Exception as erro: #CholmodNotPositiveDefiniteError
+                    raise np.linalg.LinAlgError(_mensagemSingular(self.backend)) from erro
+                if self.tolPivo > 0:
+                    _verificaPivos(self._fator.D(), self.backend, self.tolPivo)
+            else:
+                #modo simétrico do SuperLU: pivôs na diagonal e ordenação de A + Aᵀ
+                self.backend = 'superlu-simetrico'
+                try:
+                    self._fator = spla.splu(Ku, permc_spec='MMD_AT_PLUS_A', diag_pivot_thresh=0.,
+                                            options=dict(SymmetricMode=True))
+                except RuntimeError as erro: #Factor is exactly singular
+                    raise np.linalg.LinAlgError(_mensagemSingular(self.backend)) from erro
+                #pivôs de LDLᵀ: os negativos indicam Ku indefinida, rejeitada como no CHOLMOD
+                _verificaPivos(self._fator.U.diagonal(), self.backend, self.tolPivo, positivos=True)
+        elif metodo == 'lu':
+            self.backend = 'superlu'
+            try:
+                self._fator = spla.splu(sp.csc_matrix(Ku), permc_spec='COLAMD')
+            except RuntimeError as erro: #Factor is exactly singular
+                raise np.linalg.LinAlgError(_mensagemSingular(self.backend)) from erro
+            _verificaPivos(self._fator.U.diagonal(), self.backend, self.tolPivo)
+        elif metodo == 'banda':
+            self.backend = 'lapack-pbtrf'
+            try:
+                self._fator = sla.cholesky_banded(matrizBanda(Ku), lower=False, check_finite=False)
+            except np.linalg.LinAlgError as erro: #pivô não positivo
+                raise np.linalg.LinAlgError(_mensagemSingular(self.backend)) from erro
+            _verificaPivos(self._fator[-1]**2, self.backend, self.tolPivo) #pivôs de LDLᵀ: quadrados da diagonal de U
+        else:
+            self._Ku = sp.csr_matrix(Ku)
+            self._M = self._precondicionador(self._Ku, precondicionador)
+            self.backend = f'scipy-cg+{precondicionador}'
+        self.tempoFatoracao = time.perf_counter() - t0
+
+    @staticmethod
+    def _precondicionador(Ku, tipo):
+        n = Ku.shape[0]
+        if tipo == 'jacobi':
+            diag = Ku.diagonal()
+            if np.any(diag <= 0):
+                raise ValueError('A matriz Ku possui termos nulos ou negativos na diagonal! ' +\
+                                 'Verifique os apoios da estrutura.')
+            invDiag = 1./diag
+            return spla.LinearOperator((n, n), matvec=lambda x: invDiag*x, dtype=float)
+        elif tipo == 'ic':
+            fator = spla.spilu(Ku.tocsc(), drop_tol=1e-5, fill_factor=10)
+            return spla.LinearOperator((n, n), matvec=fator.solve, dtype=float)
+        raise ValueError(f'Precondicionador {tipo} desconhecido! Use jacobi ou ic.')
+
+    def resolver(self, F):
+        '''
+        Resolve Ku·U = F para um vetor (nGLs,) ou uma matriz (nGLs, nCasos) de forças.
+        '''
+        F = np.asarray(F, dtype=float)
+        t0 = time.perf_counter()
+        if self.metodo == 'densa':
+            U = sla.lu_solve(self._lu, F, check_finite=False)
+        elif self.metodo in ('cholesky', 'lu'):
+            U = self._fator(F) if self.backend == 'cholmod' else self._fator.solve(F)
+        elif self.metodo == 'banda':
+            U = sla.cho_solve_banded((self._fator, False), F, check_finite=False)
+        else:
+            U = self._gc(F)
+        self.tempoSolucao += time.perf_counter() - t0
+        return U
+
+    def _gc(self, F):
+        #uma solução por coluna; as iterações são somadas sobre os casos de carga
+        contador = [0]
+        def conta(xk):
+            contador[0] += 1
+
+        colunas = [F[:, j] for j in range(F.shape[1])] if F.ndim == 2 else [F]
+        Us = []
+        for Fj in colunas:
+            U, situacao = spla.cg(self._Ku, Fj, rtol=self.tol, atol=0., maxiter=self.maxiter,
+                                  M=self._M, callback=conta)
+            if situacao > 0:
+                raise RuntimeError(f'Os gradientes conjugados não convergiram em {situacao} iterações! ' +\
+                                   'Aumente maxiter, mude o precondicionador ou verifique os apoios.')
+            Us.append(U)
+        self.iteracoes = contador[0]
+        return np.column_stack(Us) if F.ndim == 2 else Us[0]
+
+    def relatorio(self):
+        '''
+        Dicionário com o método, o backend, os tempos e as iterações.
+        '''
+        return {'solucionador': self.metodo,
+                'backend': self.backend,
+                'tempoFatoracao': self.tempoFatoracao,
+                'tempoSolucao': self.tempoSolucao,
+                'iteracoes': self.iteracoes}
+
+def _mensagemSingular(backend):
+    return f'A matriz Ku é singular (fatoração {backend})! Verifique os apoios e as barras da estrutura.'
+
+def _verificaPivos(pivos, backend, tolPivo=0., positivos=False):
+    '''
+    Verificação dos pivôs da fatoração: um pivô não finito, nulo (ou até tolPivo
+    vezes o maior) ou, com positivos, negativo indica Ku singular ou indefinida,
+    cuja solução seria NaN ou sem sentido. Lança np.linalg.LinAlgError, como o
+    np.linalg.solve original.
+    '''
+    pivos = np.asarray(pivos)
+    if not len(pivos):
+        return
+    modulos = np.abs(pivos)
+    if not np.all(np.isfinite(pivos)) or modulos.min() <= tolPivo*modulos.max():
+        raise np.linalg.LinAlgError(_mensagemSingular(backend))
+    if positivos and pivos.min() < 0:
+        raise np.linalg.LinAlgError(f'A matriz Ku não é positiva definida (fatoração {backend})! ' +\
+                                    'Use o solucionador lu ou densa, ou verifique os apoios e as barras da estrutura.')
+
+def matrizBanda(K):
+    '''
+    Função para converter a matriz simétrica K (densa ou esparsa) para o 
+    armazenamento em banda superior do LAPACK: ab[b + i - j, j] = K[i, j] para
+    i <= j, com b a semibanda.
+    '''
+    K = sp.coo_matrix(K)
+    sup = K.row <= K.col
+    lins, cols, vals = K.row[sup], K.col[sup], K.data[sup]
+    b = int((cols - lins).max()) if len(vals) else 0
+    ab = np.zeros((b + 1, K.shape[0]))
+    np.add.at(ab, (b + lins - cols, cols), vals)
+    return ab
+
+def perfilBanda(K, posicoes=None):
+    '''
+    Função para calcular a semibanda e o perfil (envelope, soma das alturas das
+    colunas do skyline) da matriz simétrica K.
+    
+    Entradas
+    --------
+        * K: matriz simétrica, densa ou esparsa;
+        * posicoes: posição de cada linha/coluna de K na numeração em que a 
+          banda deve ser avaliada (padrão: a própria ordem de K).
+    
+    Saída
+    -----
+        * banda: a maior distância |i - j| dos termos não nulos;
+        * perfil: a soma de i - min(j) dos termos não nulos de cada linha i, com j <= i.
+    
+    '''
+    K = sp.coo_matrix(K)
+    n = K.shape[0]
+    lins, cols = K.row[K.data != 0], K.col[K.data != 0]
+    if posicoes is not None:
+        posicoes = np.asarray(posicoes)
+        lins, cols = posicoes[lins], posicoes[cols]
+    if len(lins) == 0:
+        return 0, 0
+    
+    inf = cols <= lins
+    primeiras = np.arange(n)
+    np.minimum.at(primeiras, lins[inf], cols[inf])
+    return int(np.abs(lins - cols).max()), int((np.arange(n) - primeiras).sum())
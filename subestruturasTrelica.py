@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Módulo para a análise de treliças planas por subestruturas (superelementos),
+para as torres e as vigas longas formadas por dezenas de painéis idênticos:
+    - ModuloTrelica: um painel definido uma única vez no formato de dicionários
+      de calculoTrelicaPlana, com os nós de fronteira, cuja condensação estática
+      é calculada uma única vez e guardada no próprio módulo;
+    - InstanciaModulo: a posição (origem e ângulo) de uma cópia do módulo e a
+      ligação dos seus nós de fronteira aos nós globais;
+    - condensaModulos(modulos, processos): condensação dos módulos distintos,
+      opcionalmente em processos separados;
+    - calculoSubestruturas(instancias, cargas, apoios, ...): montagem dos
+      superelementos posicionados e solução somente nos nós de fronteira;
+    - ResultadosSubestruturas: deslocamentos e reações dos nós globais e, sob
+      demanda, os resultados completos de cada instância.
+
+A condensação elimina os graus de liberdade internos i em favor dos de
+fronteira b pelo complemento de Schur:
+    K* = Kbb - Kbi·Kii⁻¹·Kib,    F* = Fb - Kbi·Kii⁻¹·Fi,
+e guarda X = Kii⁻¹·Kib e y = Kii⁻¹·Fi, de modo que os deslocamentos internos
+ui = y - X·ub de uma instância são recuperados sem nova fatoração.
+
+@autor: argenta
+"""
+import time
+import numpy as np
+import scipy.sparse as sp
+from concurrent.futures import ProcessPoolExecutor
+import funcoesAuxiliares as fa
+import calculoTrelica as cal
+import solucionadores as sol
+from modeloTrelica import ModeloTrelica, ResultadosTrelica
+
+def condensaModelo(modelo, solucionador='cholesky'):
+    '''
+    Função para a condensação estática de um ModeloTrelica cujos apoios marcam
+    os nós de fronteira (os dois graus de liberdade restringidos).
+
+    Entrada
+    -------
+        * modelo: ModeloTrelica do módulo, com os nós de fronteira restringidos;
+        * solucionador: método do sol.Solucionador para fatorar Kii.
+
+    Saída
+    -----
+        * condensado: dicionário com a rigidez K (2nb, 2nb) e as forças F (2nb,)
+          condensadas, as matrizes X (ni, 2nb) e y (ni,) da recuperação e a
+          estrutura montada do módulo.
+
+    '''
+    #Ku, Kr e Krr da estrutura com a fronteira restringida são Kii, Kbi e Kbb
+    estrutura = modelo.montar(esparsa=True, guardaKrr=True)
+    GLslivr, GLsrest = estrutura['GLslivr'], estrutura['GLsrest']
+    Kbb = estrutura['Krr'].toarray()
+    Kbi = estrutura['Kr']
+    F = modelo.cargas.ravel()
+
+    if len(GLslivr):
+        solver = sol.Solucionador(estrutura['Ku'], solucionador)
+        X = solver.resolver(Kbi.T.toarray()).reshape(len(GLslivr), len(GLsrest))
+        y = solver.resolver(F[GLslivr])
+        K = Kbb - Kbi @ X
+    else:
+        X, y, K = np.zeros((0, len(GLsrest))), np.zeros(0), Kbb
+    return {'K': (K + K.T)/2., 'F': F[GLsrest] - Kbi @ y, 'X': X, 'y': y,
+            'estrutura': {campo: valor for campo, valor in estrutura.items() if campo not in ('Ku', 'Kr', 'Krr')}}
+
+class ModuloTrelica:
+    '''
+    Classe de um módulo (painel) repetido da treliça.
+
+    Entrada
+    -------
+        * coordNos, incElems, materiais, secoes: como em calculoTrelicaPlana, nas
+          coordenadas locais do módulo;
+        * fronteira: rótulos dos nós de fronteira, ligados às outras instâncias
+          e aos apoios (somente os nós de fronteira podem ter apoios);
+        * cargas: dicionário das cargas nodais locais aplicadas em todas as
+          instâncias (padrão: sem cargas), giradas com a instância.
+
+    Atributos
+    ---------
+        * modelo: ModeloTrelica do módulo com a fronteira restringida;
+        * rotulosFronteira: rótulos dos nós de fronteira na ordem dos graus de
+          liberdade condensados;
+        * posFronteira: posições desses nós no modelo.
+
+    '''
+    def __init__(self, coordNos, incElems, materiais, secoes, fronteira, cargas=None):
+        fronteira = list(fronteira)
+        faltantes = [no for no in fronteira if no not in coordNos]
+        if faltantes:
+            raise ValueError(f'Os nós de fronteira {faltantes} não existem no módulo! ' +\
+                             'Verifique as entradas em fronteira.')
+        apoios = dict.fromkeys(fronteira, (1, 1))
+        self.modelo = ModeloTrelica.deDicionarios(coordNos, incElems, materiais, secoes, cargas or {}, apoios)
+        self.posFronteira = np.flatnonzero(self.modelo.apoios[:, 0] == 1)
+        self.rotulosFronteira = self.modelo.rotulosNos[self.posFronteira].tolist()
+        self._condensado = None
+
+    def condensar(self, solucionador='cholesky'):
+        '''
+        Condensação estática do módulo, calculada somente na primeira chamada.
+        '''
+        if self._condensado is None:
+            self._condensado = condensaModelo(self.modelo, solucionador)
+        return self._condensado
+
+    @property
+    def condensado(self):
+        return self._condensado is not None
+
+class InstanciaModulo:
+    '''
+    Classe de uma cópia posicionada de um ModuloTrelica.
+
+    Entrada
+    -------
+        * modulo: o ModuloTrelica;
+        * nos: dicionário com o rótulo do nó de fronteira do módulo como chave e
+          o rótulo do nó global como valor (nós globais iguais ligam instâncias);
+        * origem: posição da origem local do módulo nas coordenadas globais;
+        * angulo: rotação do módulo em graus, anti-horária.
+
+    '''
+    __slots__ = ('modulo', 'nos', 'origem', 'angulo')
+
+    def __init__(self, modulo, nos, origem=(0., 0.), angulo=0.):
+        #os próprios rótulos pelo mapa do modelo, sem confundir 1 com '1'
+        try:
+            posicoes = set(modulo.modelo.mapaNos.indices(list(nos)).tolist())
+        except ValueError:
+            posicoes = None
+        if len(nos) != len(modulo.posFronteira) or posicoes != set(modulo.posFronteira.tolist()):
+            raise ValueError('Todos os nós de fronteira do módulo, e somente eles, devem ser ligados a ' +\
+                             'nós globais! Verifique as entradas em nos.')
+        self.modulo = modulo
+        self.nos = dict(nos)
+        self.origem = np.asarray(origem, dtype=float)
+        self.angulo = float(angulo)
+
+    def rotacao(self):
+        '''
+        Matriz de rotação (2, 2) dos eixos locais para os globais.
+        '''
+        c, s = np.cos(np.radians(self.angulo)), np.sin(np.radians(self.angulo))
+        return np.array([[c, -s], [s, c]])
+
+    def coordenadas(self):
+        '''
+        Coordenadas globais (nNos, 2) de todos os nós do módulo.
+        '''
+        return self.origem + self.modulo.modelo.coords @ self.rotacao().T
+
+def condensaModulos(modulos, processos=None, solucionador='cholesky'):
+    '''
+    Função para a condensação dos módulos distintos ainda não condensados. Com
+    processos > 1, cada módulo é condensado em um processo separado e o resultado
+    é guardado no módulo do processo principal.
+    '''
+    pendentes = list({id(modulo): modulo for modulo in modulos if not modulo.condensado}.values())
+    if processos and processos > 1 and len(pendentes) > 1:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            condensados = list(executor.map(condensaModelo, [modulo.modelo for modulo in pendentes],
+                                            [solucionador]*len(pendentes)))
+        for modulo, condensado in zip(pendentes, condensados):
+            modulo._condensado = condensado
+    else:
+        for modulo in pendentes:
+            modulo.condensar(solucionador)
+    return len(pendentes)
+
+def calculoSubestruturas(instancias, cargas, apoios, solucionador='cholesky', opcoesSolucionador=None,
+                         processos=None, info=None, tol=1e-6):
+    '''
+    Função para a análise de uma treliça plana formada por instâncias de módulos
+    condensados, resolvida somente nos graus de liberdade dos nós globais.
+
+    Entrada
+    -------
+        * instancias: lista de InstanciaModulo;
+        * cargas, apoios: dicionários de calculoTrelicaPlana com os rótulos dos
+          nós globais;
+        * solucionador, opcoesSolucionador: método e opções do sol.Solucionador
+          da fatoração dos módulos e do sistema global;
+        * processos: quantidade de processos para a condensação dos módulos;
+        * info (opcional): dicionário preenchido com as quantidades de graus de
+          liberdade e os tempos;
+        * tol: tolerância da coincidência das posições dos nós globais
+          compartilhados.
+
+    Saída
+    -----
+        * resultados: ResultadosSubestruturas.
+
+    '''
+    t0 = time.perf_counter()
+    nCondensados = condensaModulos([instancia.modulo for instancia in instancias], processos, solucionador)
+    tempoCondensacao = time.perf_counter() - t0
+
+    # Numeração dos nós globais, na ordem em que aparecem nas instâncias
+    t1 = time.perf_counter()
+    posNos = {}
+    coords = []
+    posInstancias = []
+    for k, instancia in enumerate(instancias):
+        modulo = instancia.modulo
+        xy = instancia.coordenadas()[modulo.posFronteira]
+        posicoes = []
+        for rotulo, ponto in zip(modulo.rotulosFronteira, xy):
+            no = instancia.nos[rotulo]
+            if no not in posNos:
+                posNos[no] = len(coords)
+                coords.append(ponto)
+            elif np.linalg.norm(coords[posNos[no]] - ponto) > tol*max(1., np.abs(ponto).max()):
+                raise ValueError(f'O nó global {no} está em posições diferentes nas instâncias (instância {k})! ' +\
+                                 'Verifique as origens e os ângulos das instâncias.')
+            posicoes.append(posNos[no])
+        posInstancias.append(np.array(posicoes))
+    nGLs = 2*len(coords)
+
+    # Superelementos girados para os eixos globais, montados por módulo
+    indis, kegs = [], []
+    Fg = fa.vetorForcas(posNos, cargas, nGLs)
+    porModulo = {}
+    for k, instancia in enumerate(instancias):
+        porModulo.setdefault(id(instancia.modulo), []).append(k)
+    for ks in porModulo.values():
+        condensado = instancias[ks[0]].modulo._condensado
+        nb = len(condensado['F'])//2
+        Rs = np.array([instancias[k].rotacao() for k in ks])
+        K4 = condensado['K'].reshape(nb, 2, nb, 2)
+        kegs.append(np.einsum('sab,pbqc,sdc->spaqd', Rs, K4, Rs).reshape(len(ks), 2*nb, 2*nb))
+        idx = (2*np.array([posInstancias[k] for k in ks])[:, :, None] + np.arange(2)).reshape(len(ks), -1)
+        indis.append(idx)
+        np.add.at(Fg, idx, np.einsum('sab,pb->spa', Rs, condensado['F'].reshape(nb, 2)).reshape(len(ks), -1))
+
+    Kest = sp.csr_matrix((nGLs, nGLs))
+    for idx, k in zip(indis, kegs):
+        Kest = Kest + fa.montaRigidezEsparsa(idx, k, nGLs)
+    GLslivr, GLsrest = fa.particionaGLs(posNos, apoios, nGLs)
+    Ku, Kr = fa.particionaRigidezEsparsa(Kest, GLslivr, GLsrest)
+    tempoMontagem = time.perf_counter() - t1
+
+    # Solução nos nós globais
+    t2 = time.perf_counter()
+    solver = sol.Solucionador(Ku, solucionador, **(opcoesSolucionador or {}))
+    Us = solver.resolver(Fg[GLslivr])
+    Ug = np.zeros(nGLs)
+    Ug[GLslivr] = Us
+    Rg = np.zeros(nGLs)
+    Rg[GLsrest] = Kr @ Us - Fg[GLsrest]
+    tempoSolucao = time.perf_counter() - t2
+
+    if info is not None:
+        nInternos = sum(len(instancia.modulo._condensado['y']) for instancia in instancias)
+        info.update({'nInstancias': len(instancias), 'nModulos': len(porModulo),
+                     'nModulosCondensados': nCondensados, 'nGLs': nGLs, 'nGLsLivres': len(GLslivr),
+                     'nGLsInternos': nInternos, 'tempoCondensacao': tempoCondensacao,
+                     'tempoMontagem': tempoMontagem, 'tempoSolucao': tempoSolucao,
+                     'solucionador': solver.relatorio()})
+    return ResultadosSubestruturas(instancias, list(posNos), posInstancias, Ug, Rg)
+
+class ResultadosSubestruturas:
+    '''
+    Classe dos resultados da análise por subestruturas.
+
+    Atributos
+    ---------
+        * instancias: as instâncias resolvidas;
+        * rotulosNos: rótulos dos nós globais;
+        * desloc, reacoes: arrays (nNosGlobais, 2) com os deslocamentos e as
+          reações X e Y dos nós globais.
+
+    '''
+    __slots__ = ('instancias', 'rotulosNos', 'posInstancias', 'desloc', 'reacoes')
+
+    def __init__(self, instancias, rotulosNos, posInstancias, Ug, Rg):
+        self.instancias = instancias
+        self.rotulosNos = rotulosNos
+        self.posInstancias = posInstancias
+        self.desloc = Ug.reshape(-1, 2)
+        self.reacoes = Rg.reshape(-1, 2)
+
+    def dicDeslocamentos(self):
+        return dict(zip(self.rotulosNos, map(tuple, self.desloc.tolist())))
+
+    def dicReacoes(self):
+        return dict(zip(self.rotulosNos, map(tuple, self.reacoes.tolist())))
+
+    def recuperar(self, k):
+        '''
+        Recuperação sob demanda dos resultados completos da instância k: os
+        deslocamentos internos ui = y - X·ub, sem nova fatoração, e as
+        deformações, tensões e esforços normais de todas as barras.
+
+        Saída
+        -----
+            * resultados: ResultadosTrelica do modelo do módulo, com os
+              deslocamentos nos eixos globais e, nos nós de fronteira, as forças
+              que a instância recebe do restante da estrutura no lugar das reações.
+
+        '''
+        instancia = self.instancias[k]
+        modulo = instancia.modulo
+        condensado = modulo._condensado
+        estrutura = condensado['estrutura']
+        R = instancia.rotacao()
+
+        # Deslocamentos de fronteira nos eixos locais e deslocamentos internos
+        ub = (self.desloc[self.posInstancias[k]] @ R).ravel()
+        ui = condensado['y'] - condensado['X'] @ ub
+
+        # Forças de fronteira: K*·ub - F*, a parcela da instância no equilíbrio dos nós globais
+        Rb = condensado['K'] @ ub - condensado['F']
+        todos = {**estrutura, 'GLslivr': np.r_[estrutura['GLslivr'], estrutura['GLsrest']]}
+        Ug, Rg, defos, tenss, norms = cal.recuperaResultados(todos, np.r_[ui, ub], Rb)
+        return ResultadosTrelica(modulo.modelo, Ug.reshape(-1, 2) @ R.T, Rg.reshape(-1, 2) @ R.T,
+                                 defos, tenss, norms)